@@ -0,0 +1,22 @@
+"""
+Implementations the pipelines used before they were optimised, kept so the
+suite can report the old and new paths side by side.
+"""
+
+
+def map_airport_codes(df, source_col, target_col, airport_ref_df):
+    result = df.copy()
+    icao_matches = df.merge(
+        airport_ref_df[["icao_code", "dev_id"]],
+        how="left",
+        left_on=source_col,
+        right_on="icao_code",
+    )
+    iata_matches = df.merge(
+        airport_ref_df[["iata_code", "dev_id"]],
+        how="left",
+        left_on=source_col,
+        right_on="iata_code",
+    )
+    result[target_col] = icao_matches["dev_id"].combine_first(iata_matches["dev_id"])
+    return result
@@ -0,0 +1,258 @@
+"""
+Benchmarks the transforms and load paths on synthetic data.
+
+    python -m benchmarks.run --sizes 10000 100000 1000000 --output results.json
+
+Loads go to an in-memory SQLite stand-in (see benchmarks.standin); nothing
+touches the network. Results are JSON with one record per (benchmark, rows)
+so runs from different versions can be diffed.
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+# Settings refuse to load without these; the benchmarks never connect.
+os.environ.setdefault("POSTGRES_DB_URL", "postgresql://bench@localhost/bench")
+for key in [
+    "SSH_HOST",
+    "SSH_USERNAME",
+    "SSH_PASSWORD",
+    "MYSQL_USERNAME",
+    "MYSQL_PASSWORD",
+    "MYSQL_DB_NAME",
+]:
+    os.environ.setdefault(key, "bench")
+os.environ["IS_DEBUGGING"] = "false"
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import legacy
+from benchmarks.standin import StandInConnection
+from benchmarks.synthetic import generate_dimensions, generate_raw_flight_log
+from src.db.bulk import _to_load_data_csv
+from src.config.settings import settings
+from src.db.connections import db_manager
+from src.pipelines.compact import compact_dtypes
+from src.pipelines.dimensions import build_lookups, resolve_airport_codes
+from src.pipelines.extract import add_sheet_keys
+from src.pipelines.logbook_entry import (
+    build_note,
+    build_notes,
+    load_entries_and_schedules,
+    timedelta_to_hhmmss,
+    transform_entry_data,
+)
+from src.pipelines.logbook_sheet import load_logbook_sheets, transform_logbook_data
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@contextlib.contextmanager
+def _mysql_standin():
+    standin = StandInConnection()
+    original = db_manager.mysql_connection
+    db_manager.mysql_connection = standin.as_mysql_connection
+    try:
+        yield standin
+    finally:
+        db_manager.mysql_connection = original
+        standin.close()
+
+
+def _with_engine(engine, func):
+    def run():
+        original = settings.TRANSFORM_ENGINE
+        settings.TRANSFORM_ENGINE = engine
+        try:
+            return func()
+        finally:
+            settings.TRANSFORM_ENGINE = original
+
+    return run
+
+
+def _time(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run_benchmarks(n_rows, repeat=1, legacy_max_rows=200_000, seed=0):
+    dimensions = generate_dimensions(seed)
+    lookups = build_lookups(dimensions)
+    raw = add_sheet_keys(generate_raw_flight_log(n_rows, dimensions, seed))
+
+    sheets = _with_engine(
+        "pandas",
+        lambda: transform_logbook_data(
+            raw, dimensions["aircraft_detail"], lookups["aircraft_detail"]
+        ),
+    )()
+    logbook_sheet_df = pd.DataFrame(
+        {
+            "logsheet_id": np.arange(1, len(sheets) + 1),
+            "formatted_serial_number": sheets["formatted_serial_number"],
+            "flight_date": sheets["flight_date"],
+        }
+    )
+    no_existing = pd.DataFrame({"formatted_serial_number": []})
+
+    def transform_entries():
+        return transform_entry_data(
+            raw,
+            no_existing,
+            dimensions["aircraft_detail"],
+            dimensions["customer"],
+            dimensions["pilot"],
+            dimensions["airport"],
+            logbook_sheet_df,
+            lookups,
+        )
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        entries = _with_engine("pandas", transform_entries)()
+    airport_columns = raw[["from", "to"]].reset_index(drop=True)
+
+    def resolve_airports():
+        resolve_airport_codes(
+            airport_columns.copy(),
+            {"from": "departure_id", "to": "arrival_id"},
+            lookups["airport"],
+        )
+
+    def map_airports_legacy():
+        df = legacy.map_airport_codes(
+            airport_columns, "from", "departure_id", dimensions["airport"]
+        )
+        legacy.map_airport_codes(df, "to", "arrival_id", dimensions["airport"])
+
+    def load_sheets():
+        with _mysql_standin():
+            load_logbook_sheets(sheets)
+
+    def load_entries():
+        with _mysql_standin():
+            load_entries_and_schedules(entries)
+
+    def transform_sheets():
+        return transform_logbook_data(
+            raw, dimensions["aircraft_detail"], lookups["aircraft_detail"]
+        )
+
+    benchmarks = {
+        "transform_logbook_data": (_with_engine("pandas", transform_sheets), len(raw)),
+        "transform_logbook_data[duckdb]": (
+            _with_engine("duckdb", transform_sheets),
+            len(raw),
+        ),
+        "transform_entry_data": (_with_engine("pandas", transform_entries), len(raw)),
+        "transform_entry_data[duckdb]": (
+            _with_engine("duckdb", transform_entries),
+            len(raw),
+        ),
+        "resolve_airport_codes": (resolve_airports, len(raw)),
+        "compact_dtypes": (lambda: compact_dtypes(raw), len(raw)),
+        "build_notes": (lambda: build_notes(entries), len(entries)),
+        "timedelta_to_hhmmss": (
+            lambda: timedelta_to_hhmmss(raw["take_off_utc"]),
+            len(raw),
+        ),
+        "load_logbook_sheets[sqlite]": (load_sheets, len(sheets)),
+        "load_entries_and_schedules[sqlite]": (load_entries, len(entries)),
+        "render_load_data_csv": (lambda: _to_load_data_csv(entries), len(entries)),
+    }
+    if n_rows <= legacy_max_rows:
+        benchmarks["legacy.map_airport_codes"] = (map_airports_legacy, len(raw))
+        benchmarks["legacy.build_note"] = (
+            lambda: entries.apply(build_note, axis=1),
+            len(entries),
+        )
+
+    results = []
+    for name, (func, rows) in benchmarks.items():
+        seconds = _time(func, repeat)
+        results.append(
+            {
+                "benchmark": name,
+                "input_rows": n_rows,
+                "rows": rows,
+                "seconds": round(seconds, 4),
+                "rows_per_second": round(rows / seconds, 1) if seconds else None,
+            }
+        )
+        print(f"{n_rows:>9} {name:<38} {seconds:9.4f}s", file=sys.stderr)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=1, help="Best of N runs")
+    parser.add_argument(
+        "--legacy-max-rows",
+        type=int,
+        default=200_000,
+        help="Skip the (slow) legacy implementations above this many rows",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = {
+        "meta": {
+            "git_revision": _git_revision(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": [
+            result
+            for n_rows in args.sizes
+            for result in run_benchmarks(
+                n_rows, args.repeat, args.legacy_max_rows, args.seed
+            )
+        ],
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
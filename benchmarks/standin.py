@@ -0,0 +1,374 @@
+"""
+Local SQLite stand-in for the itxda MySQL database, so the load paths can
+be benchmarked without a network: it speaks enough of the pymysql
+connection/cursor interface (`%s` placeholders, context-managed cursors,
+commit, savepoints) for bulk_insert, bulk_insert_returning_ids and
+fetch_existing_rows, and enough of MySQL's dialect (multi-table UPDATE and
+DELETE, TIME_TO_SEC/SEC_TO_TIME/MOD) for the post-processing updates.
+LOAD DATA LOCAL INFILE reads the CSV the way MySQL does for the options
+bulk_insert uses.
+"""
+
+import datetime
+import math
+import re
+import sqlite3
+from contextlib import contextmanager
+
+import pymysql
+
+sqlite3.register_adapter(datetime.date, lambda d: d.isoformat())
+
+TABLES = {
+    "itxda_logbook_sheet": [
+        "flight_date",
+        "hobbs_start",
+        "hobbs_end",
+        "total_flight_hours_decimal",
+        "total_legs",
+        "raw_serial_number",
+        "formatted_serial_number",
+        "aircraft_id",
+        "is_verified DEFAULT 0",
+    ],
+    "itxda_logbook_entry": [
+        "raw_serial_number",
+        "formatted_serial_number",
+        "flight_date",
+        "pax_adult",
+        "pax_child",
+        "pax_infant",
+        "pax_crew",
+        "cargo_kg",
+        "total_weight_kg",
+        "take_off_utc",
+        "land_utc",
+        "block_on_utc",
+        "block_off_utc",
+        "hobbs_before",
+        "hobbs_after",
+        "flight_hours_decimal",
+        "taxi_time",
+        "legs",
+        "eng1_cycle",
+        "eng2_cycle",
+        "tach_time",
+        "fuel_depart",
+        "fuel_arrive",
+        "fuel_uplift",
+        "is_refueled",
+        "refuel_before_departure",
+        "refuel_after_arrival",
+        "logsheet_id",
+        "pilot_id",
+        "aircraft_id",
+        "departure_id",
+        "arrival_id",
+        "flight_type_id",
+        "verified_by_id",
+        "copilot_id",
+        "created_by_user_id",
+        "notes",
+        "is_locked DEFAULT 0",
+        "is_verified DEFAULT 0",
+    ],
+    "itxda_schedule": [
+        "flight_date_lt",
+        "etd_utc",
+        "eta_utc",
+        "flight_time_decimal",
+        "flight_type_id",
+        "departure_id",
+        "arrival_id",
+        "aircraft_id",
+        "pilot_id",
+        "copilot_id",
+        "notes",
+        "etd_lt",
+        "eta_lt",
+        "base_id",
+        "area_id",
+        "flight_status_id",
+    ],
+    "flight_airport": ["tz_offset", "base", "area"],
+    "flight_pilot_schedule": [
+        "pilot",
+        "duty_date",
+        "base",
+        "status",
+        "notes",
+        "created",
+    ],
+}
+
+_PLACEHOLDER = re.compile(r"%s")
+# UPDATE t [AS] a [JOIN ...] SET ... [WHERE ...]
+_MULTI_TABLE_UPDATE = re.compile(
+    r"^\s*UPDATE\s+(\w+)\s+(?:AS\s+)?(?!SET\b)(\w+)\s+(.*?)\bSET\s+(.*?)"
+    r"(?:\s+WHERE\s+(.*?))?\s*;?\s*$",
+    re.DOTALL | re.IGNORECASE,
+)
+# DELETE a FROM t [AS] a JOIN ... [WHERE ...]
+_MULTI_TABLE_DELETE = re.compile(
+    r"^\s*DELETE\s+(\w+)\s+FROM\s+(\w+)\s+(?:AS\s+)?\1\s+(.*?)"
+    r"(?:\s+WHERE\s+(.*?))?\s*;?\s*$",
+    re.DOTALL | re.IGNORECASE,
+)
+
+
+def _number_placeholders(query):
+    # Numbered ?NNN parameters can be repeated when a clause is duplicated
+    counter = iter(range(1, len(_PLACEHOLDER.findall(query)) + 1))
+    return _PLACEHOLDER.sub(lambda m: f"?{next(counter)}", query)
+
+
+def _split_assignments(assignments):
+    # Splits `a.x = f(y, z), a.w = 1` on the commas outside parentheses
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(assignments):
+        depth += {"(": 1, ")": -1}.get(char, 0)
+        if char == "," and depth == 0:
+            parts.append(assignments[start:i])
+            start = i + 1
+    parts.append(assignments[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+# MySQL-only syntax of the dedup staging table, and its SQLite equivalent
+_REWRITES = [
+    (re.compile(r"\)\s*ENGINE\s*=\s*\w+", re.IGNORECASE), ")"),
+    (re.compile(r"\bINSERT\s+IGNORE\b", re.IGNORECASE), "INSERT OR IGNORE"),
+    (re.compile(r"\bDROP\s+TEMPORARY\s+TABLE\b", re.IGNORECASE), "DROP TABLE"),
+]
+
+
+def _translate(query):
+    """
+    Rewrites MySQL's multi-table UPDATE/DELETE into SQLite: the joined rows
+    are selected by rowid, and each assigned value is a correlated subquery
+    over the same joins.
+    """
+    for pattern, replacement in _REWRITES:
+        query = pattern.sub(replacement, query)
+    match = _MULTI_TABLE_DELETE.match(query)
+    if match:
+        alias, table, joins, where = match.groups()
+        rows = f"SELECT {alias}.rowid FROM {table} AS {alias} {joins}"
+        if where:
+            rows += f" WHERE {where}"
+        return f"DELETE FROM {table} WHERE rowid IN ({rows})"
+
+    match = _MULTI_TABLE_UPDATE.match(query)
+    if not match:
+        return query
+    table, alias, joins, assignments, where = match.groups()
+    source = f"FROM {table} AS {alias} {joins}"
+    sets = []
+    for assignment in _split_assignments(assignments):
+        column, value = assignment.split("=", 1)
+        column = column.strip().split(".")[-1]
+        sets.append(
+            f"{column} = (SELECT {value.strip()} {source} "
+            f"WHERE {alias}.rowid = {table}.rowid)"
+        )
+    rows = f"SELECT {alias}.rowid {source}"
+    if where:
+        rows += f" WHERE {where}"
+    return f"UPDATE {table} SET {', '.join(sets)} WHERE rowid IN ({rows})"
+
+
+_LOAD_DATA = re.compile(
+    r"^\s*LOAD\s+DATA\s+LOCAL\s+INFILE\s+\?1\s+INTO\s+TABLE\s+(\w+).*?"
+    r"ENCLOSED\s+BY\s+'(.)'\s+ESCAPED\s+BY\s+''.*?\(([^()]*)\)\s*$",
+    re.DOTALL | re.IGNORECASE,
+)
+_INTEGER = re.compile(r"^-?\d+$")
+
+
+def _bare_value(text):
+    # Types the bare (unenclosed) fields, which the tables here don't declare
+    if text == "NULL":
+        return None
+    if _INTEGER.match(text):
+        return int(text)
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def _read_load_data(data, quote):
+    """
+    Parses LOAD DATA input with FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED
+    BY `quote` ESCAPED BY '' and LINES TERMINATED BY '\\n', as MySQL does:
+    an enclosed field may hold commas, newlines and doubled quotes and is
+    always a string; a bare NULL is NULL.
+    """
+    rows, row, i = [], [], 0
+    while i < len(data):
+        if data[i] == quote:
+            value, i = [], i + 1
+            while True:
+                end = data.index(quote, i)
+                value.append(data[i:end])
+                if data[end + 1 : end + 2] == quote:
+                    value.append(quote)
+                    i = end + 2
+                else:
+                    i = end + 1
+                    break
+            row.append("".join(value))
+        else:
+            end = min(
+                (j for j in (data.find(",", i), data.find("\n", i)) if j != -1),
+                default=len(data),
+            )
+            row.append(_bare_value(data[i:end]))
+            i = end
+        if i >= len(data) or data[i] == "\n":
+            rows.append(row)
+            row = []
+        i += 1
+    return rows
+
+
+def _time_to_sec(value):
+    if value is None:
+        return None
+    hours, minutes, seconds = str(value).split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def _sec_to_time(value):
+    if value is None:
+        return None
+    sign = "-" if value < 0 else ""
+    minutes, seconds = divmod(int(round(abs(value))), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{sign}{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def _mod(a, b):
+    # MySQL's MOD keeps the sign of the dividend, like fmod
+    if a is None or b is None or b == 0:
+        return None
+    return math.fmod(a, b)
+
+
+class StandInCursor:
+    def __init__(self, cursor, dict_rows=False):
+        self._cursor = cursor
+        self.dict_rows = dict_rows
+        self.lastrowid = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def execute(self, query, params=None):
+        if "@@SESSION.auto_increment_increment" in query:
+            self._cursor.execute("SELECT 1 AS step")
+            return 1
+        if query.lstrip().upper().startswith("SAVEPOINT"):
+            # With autocommit off MySQL always has a transaction open; an
+            # outermost SQLite savepoint would commit on RELEASE instead
+            if not self._cursor.connection.in_transaction:
+                self._cursor.execute("BEGIN")
+        query = _translate(_number_placeholders(query))
+        load_data = _LOAD_DATA.match(query)
+        if load_data:
+            return self._load_data(*load_data.groups(), params[0])
+        self._cursor.execute(query, params or ())
+        if query.lstrip().upper().startswith("INSERT"):
+            # MySQL reports the first id of a multi-row insert, SQLite the last
+            self.lastrowid = self._cursor.lastrowid - self._cursor.rowcount + 1
+        return self._cursor.rowcount
+
+    def _load_data(self, table, quote, columns, path):
+        with open(path, encoding="utf-8", newline="") as f:
+            rows = _read_load_data(f.read(), quote)
+        columns = [c.strip() for c in columns.split(",")]
+        self._cursor.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(['?'] * len(columns))})",
+            rows,
+        )
+        return len(rows)
+
+    def _row(self, row):
+        # Keyed by column name, like pymysql's DictCursor
+        if row is None or not self.dict_rows:
+            return row
+        names = [column[0] for column in self._cursor.description]
+        return dict(zip(names, row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+
+class StandInConnection:
+    """
+    One connection to the stand-in database. Connections opened on the same
+    file share its tables, like pooled connections to one MySQL server.
+    With `dict_rows` its cursors return dicts, as the DictCursor the
+    production connections use does.
+    """
+
+    def __init__(self, path=":memory:", dict_rows=False):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self.dict_rows = dict_rows
+        self.open = True
+        self._conn.create_function("TIME_TO_SEC", 1, _time_to_sec)
+        self._conn.create_function("SEC_TO_TIME", 1, _sec_to_time)
+        self._conn.create_function("MOD", 2, _mod)
+        for table, columns in TABLES.items():
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                + ", ".join(columns)
+                + ")"
+            )
+            if "formatted_serial_number" in columns:
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {table}_fsn ON {table} (formatted_serial_number)"
+                )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS itxda_entry_x_schedule "
+            "(log_entry_id, schedule_id)"
+        )
+        self._conn.commit()
+
+    def cursor(self):
+        return StandInCursor(self._conn.cursor(), self.dict_rows)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def count(self, table):
+        return self._conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+
+    def ping(self, reconnect=False):
+        if not self.open:
+            raise pymysql.err.InterfaceError(0, "Connection closed")
+        self._conn.execute("SELECT 1")
+
+    def close(self):
+        self.open = False
+        self._conn.close()
+
+    @contextmanager
+    def as_mysql_connection(self):
+        # Drop-in for db_manager.mysql_connection(), whose pool rolls back
+        # what a failed transaction left uncommitted
+        try:
+            yield self
+        except BaseException:
+            self.rollback()
+            raise
@@ -0,0 +1,182 @@
+"""
+Synthetic raw_flight_log and analytics dimensions with the shape of the
+production data: a few dozen aircraft flying sheets of 1-10 legs, a few
+hundred pilots and airports (ICAO codes, most with an IATA code too), and
+a small share of codes/names that don't resolve.
+"""
+
+import datetime
+import string
+
+import numpy as np
+import pandas as pd
+
+N_AIRCRAFT = 70
+N_PILOTS = 350
+N_AIRPORTS = 250
+N_CUSTOMERS = 40
+
+UNKNOWN_AIRPORT_RATE = 0.01
+UNKNOWN_PILOT_RATE = 0.005
+MISSING_SIC_RATE = 0.2
+
+
+def _codes(rng, count, length, prefix=""):
+    letters = np.array(list(string.ascii_uppercase))
+    codes = set()
+    while len(codes) < count:
+        codes.add(prefix + "".join(rng.choice(letters, length - len(prefix))))
+    return sorted(codes)
+
+
+def generate_dimensions(seed=0):
+    rng = np.random.default_rng(seed)
+
+    registrations = _codes(rng, N_AIRCRAFT, 5, prefix="PK")
+    aircraft = pd.DataFrame(
+        {
+            "aircraft_registration": registrations,
+            "dev_id": np.arange(1, N_AIRCRAFT + 1),
+        }
+    )
+
+    first = ["Anton", "Budi", "Christofer", "Dewi", "Eka", "Jeremy", "Rizal", "Sari"]
+    last = _codes(rng, N_PILOTS, 6)
+    names = [f"{rng.choice(first)} {surname.title()}" for surname in last]
+    pilots = pd.DataFrame(
+        {
+            "name": names,
+            "dev_id": np.arange(1, N_PILOTS + 1),
+            "p_id": np.arange(1001, 1001 + N_PILOTS),
+        }
+    )
+
+    icao = _codes(rng, N_AIRPORTS, 4, prefix="W")
+    iata = _codes(rng, N_AIRPORTS, 3)
+    has_iata = rng.random(N_AIRPORTS) < 0.7
+    airports = pd.DataFrame(
+        {
+            "dev_id": np.arange(1, N_AIRPORTS + 1),
+            "iata_code": np.where(has_iata, iata, None),
+            "icao_code": icao,
+        }
+    )
+
+    customers = pd.DataFrame(
+        {
+            "customer": [f"Customer {i}" for i in range(N_CUSTOMERS)],
+            "dev_id": np.arange(1, N_CUSTOMERS + 1),
+        }
+    )
+
+    return {
+        "aircraft_detail": aircraft,
+        "pilot": pilots,
+        "airport": airports,
+        "customer": customers,
+    }
+
+
+def _hhmmss(seconds):
+    seconds = pd.Series(seconds.astype(np.int64))
+
+    def two_digits(values):
+        return values.astype(str).str.zfill(2)
+
+    return (
+        two_digits(seconds // 3600)
+        + ":"
+        + two_digits(seconds % 3600 // 60)
+        + ":"
+        + two_digits(seconds % 60)
+    )
+
+
+def generate_raw_flight_log(n_rows, dimensions, seed=0):
+    """
+    Returns `n_rows` legs of raw_flight_log (sheet keys not added, like
+    get_raw_flight_logs before add_sheet_keys).
+    """
+    rng = np.random.default_rng(seed)
+
+    # Sheets of 1-10 legs (about 5 on average) until n_rows legs exist
+    max_sheets = n_rows // 2 + 1
+    legs_per_sheet = rng.integers(1, 8, max_sheets) + rng.integers(0, 4, max_sheets)
+    last_sheet = np.searchsorted(np.cumsum(legs_per_sheet), n_rows)
+    legs_per_sheet = legs_per_sheet[: last_sheet + 1]
+    sheet_of_leg = np.repeat(np.arange(len(legs_per_sheet)), legs_per_sheet)[:n_rows]
+    n_sheets = sheet_of_leg[-1] + 1 if n_rows else 0
+
+    registrations = dimensions["aircraft_detail"]["aircraft_registration"].to_numpy()
+    sheet_ac = rng.choice(registrations, n_sheets)
+    sheet_year = rng.integers(2019, 2026, n_sheets)
+    sheet_serial = rng.permutation(n_sheets) + 1
+    start = datetime.date(2019, 1, 1)
+    days = rng.integers(0, 2500, n_sheets)
+    sheet_date = np.array(
+        [start + datetime.timedelta(days=int(d)) for d in days], dtype=object
+    )
+    sheet_hobbs = rng.uniform(100, 20000, n_sheets).round(1)
+
+    hours = rng.uniform(0.2, 2.5, n_rows).round(1)
+    leg_in_sheet = np.arange(n_rows) - np.repeat(
+        np.cumsum(legs_per_sheet) - legs_per_sheet, legs_per_sheet
+    )[:n_rows]
+    hobbs_start = sheet_hobbs[sheet_of_leg] + leg_in_sheet * 2.5
+
+    def airport_codes():
+        airports = dimensions["airport"]
+        codes = np.where(
+            airports["iata_code"].notna() & (rng.random(len(airports)) < 0.5),
+            airports["iata_code"],
+            airports["icao_code"],
+        )
+        chosen = rng.choice(codes, n_rows).astype(object)
+        unknown = rng.random(n_rows) < UNKNOWN_AIRPORT_RATE
+        suffixes = pd.Series(rng.integers(0, 99, unknown.sum())).astype(str)
+        chosen[unknown] = ("XX" + suffixes).to_numpy()
+        return chosen
+
+    def pilot_names(missing_rate=0.0):
+        names = dimensions["pilot"]["name"].to_numpy()
+        chosen = rng.choice(names, n_rows).astype(object)
+        unknown = rng.random(n_rows) < UNKNOWN_PILOT_RATE
+        chosen[unknown] = "Unknown Pilot"
+        chosen[rng.random(n_rows) < missing_rate] = None
+        return chosen
+
+    take_off = rng.integers(0, 86400 - 3 * 3600, n_rows)
+    refuelling = np.where(
+        rng.random(n_rows) < 0.3, rng.uniform(50, 400, n_rows).round(), np.nan
+    )
+
+    return pd.DataFrame(
+        {
+            "year": sheet_year[sheet_of_leg],
+            "ac": sheet_ac[sheet_of_leg],
+            "fl_serial": sheet_serial[sheet_of_leg].astype(str),
+            "date": sheet_date[sheet_of_leg],
+            "start": hobbs_start,
+            "end": hobbs_start + hours,
+            "hours": hours,
+            "landings": 1,
+            "pic": pilot_names(),
+            "sic": pilot_names(MISSING_SIC_RATE),
+            "from": airport_codes(),
+            "to": airport_codes(),
+            "dep": "Departure Name",
+            "arr": "Arrival Name",
+            "customer": rng.choice(
+                dimensions["customer"]["customer"].to_numpy(), n_rows
+            ),
+            "adult": rng.integers(0, 12, n_rows),
+            "child": rng.integers(0, 3, n_rows),
+            "infant": rng.integers(0, 2, n_rows),
+            "crew": 2,
+            "kg": rng.integers(0, 800, n_rows),
+            "fuel_return": rng.uniform(100, 600, n_rows).round(),
+            "refuelling": refuelling,
+            "take_off_utc": _hhmmss(take_off),
+            "land_utc": _hhmmss(take_off + hours * 3600),
+        }
+    )
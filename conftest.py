@@ -0,0 +1,271 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Settings refuse to load without these; nothing in the tests connects to a
+# database.
+os.environ.setdefault("POSTGRES_DB_URL", "postgresql://test@localhost/test")
+for key in [
+    "SSH_HOST",
+    "SSH_USERNAME",
+    "SSH_PASSWORD",
+    "MYSQL_USERNAME",
+    "MYSQL_PASSWORD",
+    "MYSQL_DB_NAME",
+]:
+    os.environ.setdefault(key, "test")
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks.standin import StandInConnection  # noqa: E402
+from benchmarks.synthetic import (  # noqa: E402
+    generate_dimensions,
+    generate_raw_flight_log,
+)
+from src.config.settings import settings  # noqa: E402
+from src.db.connections import db_manager  # noqa: E402
+from src.pipelines import (  # noqa: E402
+    extract,
+    logbook_entry,
+    logbook_sheet,
+)
+from src.pipelines.context import PipelineRunContext  # noqa: E402
+from src.pipelines.dimensions import CachedDimension, build_lookups  # noqa: E402
+from src.pipelines.extract import add_formatted_serial_number  # noqa: E402
+
+
+class StandIn(StandInConnection):
+    """
+    The benchmark's SQLite stand-in, plus what the tests read back. Its
+    cursors return dicts, like the production DictCursor.
+    """
+
+    def __init__(self, path=":memory:", dict_rows=True):
+        super().__init__(path, dict_rows)
+
+    def contents(self, table, exclude=("id",)):
+        """
+        The rows of `table` without the `exclude` columns (surrogate keys,
+        which depend on insertion order), sorted on every column, so two
+        loads of the same data compare equal.
+        """
+        columns = [
+            row[1]
+            for row in self._conn.execute(f"PRAGMA table_info({table})")
+            if row[1] not in exclude
+        ]
+        listed = ", ".join(columns)
+        rows = self._conn.execute(
+            f"SELECT {listed} FROM {table} ORDER BY {listed}"
+        ).fetchall()
+        return pd.DataFrame(rows, columns=columns)
+
+    def loaded(self):
+        """
+        The sheet, entry and schedule tables. Entries are compared through
+        their sheet's serial, not its id, after checking every one links to
+        the sheet of its serial.
+        """
+        linked = self._conn.execute(
+            """
+            SELECT count(*) FROM itxda_logbook_entry e
+            JOIN itxda_logbook_sheet s ON s.id = e.logsheet_id
+            WHERE s.formatted_serial_number = e.formatted_serial_number
+            """
+        ).fetchone()[0]
+        assert linked == self.count("itxda_logbook_entry")
+        return {
+            "itxda_logbook_sheet": self.contents("itxda_logbook_sheet"),
+            "itxda_logbook_entry": self.contents(
+                "itxda_logbook_entry", exclude=("id", "logsheet_id")
+            ),
+            "itxda_schedule": self.contents("itxda_schedule"),
+        }
+
+    def seed_airports(self, dimensions):
+        # Local time offsets, bases and areas for the post-processing updates
+        airports = dimensions["airport"]["dev_id"].astype(int)
+        self._conn.executemany(
+            "INSERT INTO flight_airport (id, tz_offset, base, area) "
+            "VALUES (?, ?, ?, ?)",
+            [(i, i % 5 - 2, i % 7 + 1, 1) for i in airports],
+        )
+        self.commit()
+
+    def pilot_days(self):
+        return pd.read_sql(
+            "SELECT pilot, duty_date, base FROM flight_pilot_schedule "
+            "ORDER BY pilot, duty_date",
+            self._conn,
+        )
+
+    def rebuilt_pilot_days(self):
+        # What a full rebuild would leave, rolled back afterwards
+        with self.cursor() as cursor:
+            logbook_entry.rebuild_flight_pilot_schedule(cursor)
+        rebuilt = self.pilot_days()
+        self.rollback()
+        return rebuilt
+
+
+@pytest.fixture(autouse=True)
+def pipeline_state_dir(tmp_path, monkeypatch):
+    # Watermarks, staged fetches, fingerprints and checkpoints of each test
+    # stay in its own directory
+    state_dir = tmp_path / "state"
+    state_dir.mkdir()
+    monkeypatch.setattr(settings, "PIPELINE_STATE_DIR", str(state_dir))
+    return state_dir
+
+
+@pytest.fixture
+def mysql_standin(monkeypatch, tmp_path_factory):
+    """
+    Opens a fresh stand-in database, with a pipeline state directory of its
+    own, and routes db_manager.mysql_connection to it. Every stand-in opened
+    is closed at teardown.
+    """
+    opened = []
+
+    def open_standin(*args, **kwargs):
+        standin = StandIn(*args, **kwargs)
+        opened.append(standin)
+        monkeypatch.setattr(
+            db_manager, "mysql_connection", standin.as_mysql_connection
+        )
+        monkeypatch.setattr(
+            settings, "PIPELINE_STATE_DIR", str(tmp_path_factory.mktemp("state"))
+        )
+        return standin
+
+    yield open_standin
+    for standin in opened:
+        standin.close()
+
+
+@pytest.fixture
+def without_post_process(monkeypatch):
+    # Loads leave the inserted rows as they are
+    monkeypatch.setattr(settings, "INCREMENTAL_POST_PROCESS", True)
+    def skip(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(logbook_entry, "post_process_rows", skip)
+    monkeypatch.setattr(logbook_sheet, "verify_sheets", skip)
+
+
+class FakeContext(PipelineRunContext):
+    """
+    Serves `raw` instead of reading Postgres (sheet-ordered chunks of
+    EXTRACT_CHUNK_SIZE legs when streaming) and `dimensions` instead of the
+    dimension cache. Counts the extractions and the legs they read.
+    """
+
+    raw = None
+    dimensions = None
+    lookups = None
+    extractions = 0
+    legs_read = 0
+
+    def __init__(self, since=None, until="2100-01-01"):
+        super().__init__(since=since, until=until)
+        self._frames.update(
+            (name, CachedDimension(frame, self.lookups[name], None))
+            for name, frame in self.dimensions.items()
+        )
+
+    def _window(self):
+        dates = self.raw["date"].astype(str)
+        in_window = dates < self.until
+        if self.since is not None:
+            in_window &= dates >= self.since
+        type(self).extractions += 1
+        type(self).legs_read += int(in_window.sum())
+        # Without the serial string, as the extract returns the legs
+        legs = self.raw[in_window].drop(columns="formatted_serial_number")
+        return legs.sort_values(["year", "ac", "fl_serial"])
+
+    def _extract_raw_flight_logs(self):
+        if self.raw is None:
+            return super()._extract_raw_flight_logs()
+        return self._compact(self._window())
+
+    def _iter_raw_flight_log_chunks(self):
+        if self.raw is None or settings.EXTRACT_CHUNK_SIZE <= 0:
+            yield from super()._iter_raw_flight_log_chunks()
+            return
+        df = self._window()
+        size = settings.EXTRACT_CHUNK_SIZE
+        yield from extract.regroup_by_sheet(
+            df.iloc[i : i + size] for i in range(0, len(df), size)
+        )
+
+
+@pytest.fixture
+def fake_context():
+    """
+    Returns a FakeContext class serving `raw` and `dimensions`; with no
+    `raw` the legs are read through the extract module.
+    """
+
+    def bind(dimensions, raw=None):
+        return type(
+            "FakeContext",
+            (FakeContext,),
+            {
+                "raw": raw,
+                "dimensions": dimensions,
+                "lookups": build_lookups(dimensions),
+            },
+        )
+
+    return bind
+
+
+@pytest.fixture(scope="session")
+def synthetic_entries():
+    dimensions = generate_dimensions(seed=6)
+    raw = add_formatted_serial_number(
+        generate_raw_flight_log(400, dimensions, seed=6)
+    )
+    logbook_sheet_df = pd.DataFrame(
+        {
+            "logsheet_id": np.arange(raw["formatted_serial_number"].nunique()),
+            "formatted_serial_number": raw["formatted_serial_number"].unique(),
+            "flight_date": None,
+        }
+    )
+    return logbook_entry.transform_entry_data(
+        raw,
+        pd.DataFrame({"formatted_serial_number": []}),
+        dimensions["aircraft_detail"],
+        dimensions["customer"],
+        dimensions["pilot"],
+        dimensions["airport"],
+        logbook_sheet_df,
+        build_lookups(dimensions),
+    )
+
+
+@pytest.fixture
+def entries(synthetic_entries):
+    # Transformed entries ready to load, with logsheet ids of their own
+    return synthetic_entries.copy()
+
+
+@pytest.fixture
+def load_entries(monkeypatch):
+    """
+    Loads entries with their schedules through `mysql_connection`, committed
+    every 50 entries.
+    """
+    monkeypatch.setattr(settings, "LOAD_COMMIT_ROWS", 50)
+
+    def load(mysql_connection, entries):
+        monkeypatch.setattr(db_manager, "mysql_connection", mysql_connection)
+        return logbook_entry.load_entries_and_schedules(entries)
+
+    return load
@@ -0,0 +1,140 @@
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from src.metrics import metrics_registry
+from src.pipelines.runner import new_run_context, run_all_pipelines
+from src.pipelines.state import file_lock, state_path
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# Held by the running job, shared by every process on PIPELINE_STATE_DIR
+RUN_LOCK = "pipeline_job.lock"
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class PipelineJob:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = QUEUED
+        self.created_at = _now()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.context = None
+        # Triggers that arrived while this job was in flight and joined it
+        self.coalesced_triggers = 0
+        self._finished = threading.Event()
+
+    @property
+    def in_flight(self):
+        return self.status in (QUEUED, RUNNING)
+
+    def wait(self, timeout=None):
+        # True once the job has finished, either way
+        return self._finished.wait(timeout)
+
+    def to_dict(self):
+        job = {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "coalesced_triggers": self.coalesced_triggers,
+            "error": self.error,
+        }
+        if self.context is not None:
+            job["since"] = self.context.since
+            job["until"] = self.context.until
+            job.update(self.context.progress_snapshot())
+            job["metrics"] = self.context.metrics.to_dict()
+        return job
+
+
+class PipelineJobManager:
+    """
+    Runs pipeline jobs on a single background worker thread.
+
+    `submit()` is single-flight: while a job is queued or running, further
+    triggers are coalesced onto it and get its id back instead of starting
+    a second run that would race it on inserts. The last `max_history` jobs
+    are kept for status lookups.
+
+    Coalescing only sees the jobs of this process. Across processes (several
+    API workers, or a reload) runs are serialized instead: a job holds
+    RUN_LOCK in PIPELINE_STATE_DIR while it runs and stays queued until it
+    gets it, so two runs never race on inserts.
+    """
+
+    def __init__(
+        self, run=run_all_pipelines, new_context=new_run_context, max_history=50
+    ):
+        self._run = run
+        self._new_context = new_context
+        self._max_history = max_history
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="pipeline-job"
+        )
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._active = None
+
+    def submit(self):
+        """
+        Returns `(job, created)`; `created` is False when the trigger was
+        coalesced onto the job already in flight.
+        """
+        with self._lock:
+            if self._active is not None and self._active.in_flight:
+                self._active.coalesced_triggers += 1
+                return self._active, False
+
+            job = PipelineJob()
+            self._jobs[job.id] = job
+            while len(self._jobs) > self._max_history:
+                self._jobs.popitem(last=False)
+            self._active = job
+            self._executor.submit(self._execute, job)
+            return job, True
+
+    def _execute(self, job):
+        try:
+            with file_lock(state_path(RUN_LOCK)):
+                job.status = RUNNING
+                job.started_at = _now()
+                logger.info(f"Pipeline job {job.id} started.")
+                job.context = self._new_context()
+                self._run(job.context)
+            job.status = SUCCEEDED
+            logger.info(f"Pipeline job {job.id} completed successfully.")
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+            logger.exception(f"Pipeline job {job.id} failed: {e}")
+        finally:
+            job.finished_at = _now()
+            if job.context is not None:
+                metrics_registry.observe_run(job.context.metrics, job.status)
+            job._finished.set()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self):
+        # Let a running job finish before connections are torn down
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+job_manager = PipelineJobManager()
@@ -1,13 +1,26 @@
-from fastapi import FastAPI, HTTPException, Header, status
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Header, Query, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse
 from sqlalchemy import text
-from src.pipelines.logbook_sheet import run_logbook_sheet_pipeline
-from src.pipelines.logbook_entry import run_logbook_entry_pipeline
+from src.pipelines.dimensions import dimension_cache
+from src.api.jobs import SUCCEEDED, job_manager
+from src.metrics import metrics_registry
 from src.db.connections import db_manager
 import logging
 
 from src.config.settings import settings
 
-app = FastAPI(title="ITXDA Pipeline API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    job_manager.shutdown()
+    # Tear down the shared SSH tunnel and pooled connections
+    db_manager.close()
+
+
+app = FastAPI(title="ITXDA Pipeline API", lifespan=lifespan)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,8 +37,7 @@ def caesar_cipher(text: str, shift: int) -> str:
     return result
 
 
-@app.get("/afl")
-def execute_pipeline(x_secret_key: str = Header(..., alias="X-Key")):
+def verify_secret_key(x_secret_key: str):
     expected_key = (
         caesar_cipher(settings.SECRET_KEY, settings.CAESAR_SHIFT)
         if settings.SECRET_KEY
@@ -36,15 +48,60 @@ def execute_pipeline(x_secret_key: str = Header(..., alias="X-Key")):
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid Secret Key",
         )
-    try:
-        logger.info("Starting pipeline execution...")
-        run_logbook_sheet_pipeline()
-        run_logbook_entry_pipeline()
-        logger.info("Pipeline execution completed successfully.")
-        return {"status": "success", "message": "All pipelines executed successfully."}
-    except Exception as e:
-        logger.error(f"Pipeline execution failed: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/afl", status_code=status.HTTP_202_ACCEPTED)
+def execute_pipeline(
+    x_secret_key: str = Header(..., alias="X-Key"),
+    wait: float = Query(0, ge=0, description="Seconds to wait for the job to finish"),
+):
+    verify_secret_key(x_secret_key)
+    # Runs in the background; a trigger while a run is in flight joins it
+    job, created = job_manager.submit()
+    if created:
+        logger.info(f"Queued pipeline job {job.id}.")
+    else:
+        logger.info(f"Pipeline job {job.id} already in flight, trigger coalesced.")
+    finished = wait > 0 and job.wait(wait)
+
+    def respond(outcome, status_code, **extra):
+        # `status` is the outcome of this trigger; the job's own status and
+        # per-stage metrics so far are under `job`, as /afl/jobs returns them
+        body = {
+            "status": outcome,
+            "job_id": job.id,
+            "coalesced": not created,
+            "status_url": f"/afl/jobs/{job.id}",
+            **extra,
+            "job": job.to_dict(),
+        }
+        return JSONResponse(jsonable_encoder(body), status_code=status_code)
+
+    if not finished:
+        return respond("accepted", status.HTTP_202_ACCEPTED)
+
+    # The job ended within `wait`: answer with its outcome, like a synchronous run
+    if job.status == SUCCEEDED:
+        return respond("success", status.HTTP_200_OK)
+    logger.error(f"Pipeline job {job.id} failed: {job.error}")
+    return respond("failed", status.HTTP_500_INTERNAL_SERVER_ERROR, detail=job.error)
+
+
+@app.get("/afl/jobs/{job_id}")
+def get_pipeline_job(job_id: str, x_secret_key: str = Header(..., alias="X-Key")):
+    verify_secret_key(x_secret_key)
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return job.to_dict()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Prometheus text exposition of the per-stage totals of finished runs
+    return PlainTextResponse(
+        metrics_registry.render(), media_type="text/plain; version=0.0.4"
+    )
 
 
 @app.get("/health")
@@ -70,4 +127,5 @@ def health_check():
         health_status["mysql"] = f"error: {str(e)}"
         health_status["status"] = "degraded"
 
+    health_status["dimension_cache"] = dimension_cache.stats()
     return health_status
@@ -17,18 +17,57 @@ class Settings:
         "127.0.0.1",
         int(os.getenv("SSH_REMOTE_BIND_PORT", "3306")),
     )
+    SSH_KEEPALIVE_SECONDS = float(os.getenv("SSH_KEEPALIVE_SECONDS", "30"))
 
     # MySQL Configuration
     MYSQL_HOST = os.getenv("MYSQL_HOST", "localhost")
     MYSQL_USERNAME = os.getenv("MYSQL_USERNAME")
     MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD")
     MYSQL_DB_NAME = os.getenv("MYSQL_DB_NAME")
+    MYSQL_POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "4"))
+    MYSQL_POOL_TIMEOUT = float(os.getenv("MYSQL_POOL_TIMEOUT", "30"))
 
     # Application Settings
     IS_TESTING = os.getenv("IS_TESTING", "true").lower() == "true"
     IS_DEBUGGING = os.getenv("IS_DEBUGGING", "False").lower() == "true"
     DATA_ANALYST_USER_ID = int(os.getenv("DATA_ANALYST_USER_ID", "41"))
 
+    # Pipeline Settings
+    PIPELINE_STATE_DIR = os.getenv("PIPELINE_STATE_DIR", ".pipeline_state")
+    INCREMENTAL_EXTRACT = os.getenv("INCREMENTAL_EXTRACT", "true").lower() == "true"
+    EXTRACT_LOOKBACK_DAYS = int(os.getenv("EXTRACT_LOOKBACK_DAYS", "7"))
+    EXTRACT_CHUNK_SIZE = int(os.getenv("EXTRACT_CHUNK_SIZE", "50000"))
+    # "read_sql" or "copy": default backend for Postgres extraction reads
+    EXTRACT_BACKEND = os.getenv("EXTRACT_BACKEND", "read_sql").lower()
+    EXTRACT_MAX_WORKERS = int(os.getenv("EXTRACT_MAX_WORKERS", "4"))
+    DEDUP_MODE = os.getenv("DEDUP_MODE", "in").lower()
+    DEDUP_CHUNK_SIZE = int(os.getenv("DEDUP_CHUNK_SIZE", "1000"))
+    INCREMENTAL_POST_PROCESS = (
+        os.getenv("INCREMENTAL_POST_PROCESS", "true").lower() == "true"
+    )
+    BULK_LOAD_MODE = os.getenv("BULK_LOAD_MODE", "insert").lower()
+    BULK_INSERT_BATCH_SIZE = int(os.getenv("BULK_INSERT_BATCH_SIZE", "500"))
+    # Rows per load transaction, and retries of a transaction that hit a
+    # deadlock, lock wait timeout or lost connection
+    LOAD_COMMIT_ROWS = int(os.getenv("LOAD_COMMIT_ROWS", "5000"))
+    LOAD_MAX_RETRIES = int(os.getenv("LOAD_MAX_RETRIES", "3"))
+    LOAD_RETRY_BACKOFF_SECONDS = float(os.getenv("LOAD_RETRY_BACKOFF_SECONDS", "1"))
+    DIMENSION_CACHE_TTL_SECONDS = float(
+        os.getenv("DIMENSION_CACHE_TTL_SECONDS", "300")
+    )
+    # Categoricals and narrow integers for the extracted raw frames
+    COMPACT_DTYPES = os.getenv("COMPACT_DTYPES", "true").lower() == "true"
+    # Local Parquet copy of extracted raw_flight_log windows
+    STAGING_ENABLED = os.getenv("STAGING_ENABLED", "false").lower() == "true"
+    STAGING_RETENTION_HOURS = float(os.getenv("STAGING_RETENTION_HOURS", "72"))
+    # Fingerprint the extracted sheets to update corrected and deleted ones
+    DETECT_CHANGES = os.getenv("DETECT_CHANGES", "false").lower() == "true"
+    # Aggregate sheets in Postgres; only the standalone sheet pipeline
+    # (python -m src.pipelines.logbook_sheet) reads it, not the /afl jobs
+    SHEET_PUSHDOWN = os.getenv("SHEET_PUSHDOWN", "false").lower() == "true"
+    # "pandas" or "duckdb": engine for the sheet aggregation and entry joins
+    TRANSFORM_ENGINE = os.getenv("TRANSFORM_ENGINE", "pandas").lower()
+
     SECRET_KEY = os.getenv("SECRET_KEY")
 
     CAESAR_SHIFT = int(os.getenv("CAESAR_SHIFT", "3"))
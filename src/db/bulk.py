@@ -0,0 +1,138 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from src.config.settings import settings
+
+
+def column_arrays(df):
+    """
+    Converts each column to an object array of native Python values with
+    None for NaN/NA, one vectorized pass per column instead of per row.
+    """
+    arrays = []
+    for column in df.columns:
+        values = df[column].astype(object).to_numpy(copy=True)
+        values[df[column].isna().to_numpy()] = None
+        arrays.append(values)
+    return arrays
+
+
+def _insert_values(cursor, table, df, batch_size, on_batch=None):
+    columns = list(df.columns)
+    row_placeholder = f"({', '.join(['%s'] * len(columns))})"
+    values = np.column_stack(column_arrays(df)) if len(df) else None
+
+    for start in range(0, len(df), batch_size):
+        batch = values[start : start + batch_size]
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+            + ", ".join([row_placeholder] * len(batch)),
+            batch.ravel().tolist(),
+        )
+        if on_batch is not None:
+            on_batch(start, len(batch))
+    return len(df)
+
+
+def _load_data_field(series):
+    # Whole-number float columns (ids that went through a NaN) are written
+    # as integers so MySQL doesn't have to truncate "513.0" into an INT.
+    if pd.api.types.is_bool_dtype(series):
+        series = series.astype("Int64")
+    elif pd.api.types.is_float_dtype(series):
+        non_null = series.dropna()
+        if (non_null == non_null.round()).all():
+            series = series.astype("Int64")
+
+    null = series.isna()
+    if pd.api.types.is_numeric_dtype(series):
+        fields = series.astype(object).astype(str)
+    else:
+        # Every other value is enclosed, so a string that reads "NULL" (or
+        # is empty) stays a string; only the bare NULL below loads as NULL.
+        fields = '"' + series.astype(str).str.replace('"', '""', regex=False) + '"'
+    return fields.mask(null, "NULL")
+
+
+def _to_load_data_csv(df):
+    if df.empty:
+        return b""
+    fields = [_load_data_field(df[column]).tolist() for column in df.columns]
+    return ("\n".join(map(",".join, zip(*fields))) + "\n").encode("utf-8")
+
+
+def _load_data_infile(cursor, table, df):
+    if df.empty:
+        return 0
+
+    # pymysql streams LOAD DATA LOCAL from a path, so the in-memory CSV is
+    # handed over through a tmpfs-backed file when one is available.
+    tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    with tempfile.NamedTemporaryFile(dir=tmp_dir, suffix=".csv") as f:
+        f.write(_to_load_data_csv(df))
+        f.flush()
+        cursor.execute(
+            f"""
+            LOAD DATA LOCAL INFILE %s
+            INTO TABLE {table}
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+            LINES TERMINATED BY '\\n'
+            ({", ".join(df.columns)})
+            """,
+            (f.name,),
+        )
+    return len(df)
+
+
+def bulk_insert(cursor, table, df, mode=None, batch_size=None):
+    """
+    Inserts every row of `df` into `table` (columns taken from the frame) and
+    returns the number of rows written.
+
+    BULK_LOAD_MODE picks the write path:
+      - "insert": multi-row `INSERT ... VALUES` statements of
+        BULK_INSERT_BATCH_SIZE rows each (default).
+      - "infile": a single `LOAD DATA LOCAL INFILE` fed from a CSV rendered
+        in memory; requires `local_infile` on the MySQL server.
+    Either way NaN/NA become NULL and the round-trips no longer scale with the
+    number of rows.
+    """
+    mode = mode or settings.BULK_LOAD_MODE
+    if mode == "insert":
+        return _insert_values(
+            cursor, table, df, batch_size or settings.BULK_INSERT_BATCH_SIZE
+        )
+    if mode == "infile":
+        return _load_data_infile(cursor, table, df)
+    raise ValueError(f"Unknown BULK_LOAD_MODE: {mode}")
+
+
+def bulk_insert_returning_ids(cursor, table, df, batch_size=None):
+    """
+    Inserts `df` like bulk_insert's "insert" mode and returns the generated
+    auto-increment ids as an array aligned with the rows of `df`.
+
+    A multi-row `INSERT ... VALUES` is a "simple insert" for InnoDB, which
+    allocates its ids as one consecutive block in every autoinc lock mode,
+    so each batch's ids follow from LAST_INSERT_ID() (the first id of the
+    statement) and the session's auto_increment_increment.
+    """
+    cursor.execute("SELECT @@SESSION.auto_increment_increment AS step")
+    row = cursor.fetchone()
+    step = int(row["step"] if isinstance(row, dict) else row[0])
+
+    ids = np.empty(len(df), dtype=np.int64)
+
+    def capture_ids(start, count):
+        ids[start : start + count] = cursor.lastrowid + step * np.arange(count)
+
+    _insert_values(
+        cursor,
+        table,
+        df,
+        batch_size or settings.BULK_INSERT_BATCH_SIZE,
+        on_batch=capture_ids,
+    )
+    return ids
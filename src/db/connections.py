@@ -1,54 +1,199 @@
+import logging
+import queue
+import threading
 import pymysql
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sshtunnel import SSHTunnelForwarder
 from src.config.settings import settings
+from src.metrics import record_bytes_fetched, record_round_trips
 from contextlib import contextmanager
 
+logger = logging.getLogger(__name__)
+
+
+class MySQLConnectionPool:
+    """
+    Bounded pool of MySQL connections with checkout/return semantics.
+
+    At most `max_size` connections exist at once; `checkout()` blocks up to
+    `timeout` seconds when all of them are in use. Idle connections are
+    pinged before being handed out and silently replaced if they died (for
+    example because the SSH tunnel they went through was restarted).
+    """
+
+    def __init__(self, connect, max_size, timeout):
+        self._connect = connect
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._timeout = timeout
+
+    def checkout(self):
+        if not self._slots.acquire(timeout=self._timeout):
+            raise TimeoutError(
+                f"No MySQL connection available after {self._timeout}s"
+            )
+        try:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if self._is_alive(conn):
+                    return conn
+                self._discard(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn, discard=False):
+        try:
+            if discard or not conn.open:
+                self._discard(conn)
+            else:
+                # Never hand an open transaction to the next borrower
+                conn.rollback()
+                self._idle.put(conn)
+        except pymysql.err.Error:
+            self._discard(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    @staticmethod
+    def _is_alive(conn):
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except pymysql.err.Error:
+            return False
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except pymysql.err.Error:
+            pass
+
+
+class InstrumentedMySQLConnection(pymysql.connections.Connection):
+    """
+    pymysql connection that reports every command sent to the server (query,
+    commit, rollback, ping...) as a round-trip and every byte read back to
+    the metrics stage that issued it.
+    """
+
+    def _execute_command(self, command, sql):
+        record_round_trips()
+        return super()._execute_command(command, sql)
+
+    def _read_bytes(self, num_bytes):
+        data = super()._read_bytes(num_bytes)
+        record_bytes_fetched(len(data))
+        return data
+
+
+def _record_postgres_round_trip(*args, **kwargs):
+    record_round_trips()
+
+
 class DatabaseManager:
     def __init__(self):
         self.postgres_engine = create_engine(settings.POSTGRES_DB_URL)
+        event.listen(
+            self.postgres_engine, "before_cursor_execute", _record_postgres_round_trip
+        )
         self.tunnel = None
+        self._tunnel_lock = threading.Lock()
+        self.mysql_pool = MySQLConnectionPool(
+            self._connect_mysql,
+            max_size=settings.MYSQL_POOL_SIZE,
+            timeout=settings.MYSQL_POOL_TIMEOUT,
+        )
 
     def get_postgres_engine(self):
         return self.postgres_engine
 
-    @contextmanager
-    def mysql_connection(self):
+    def _ensure_tunnel(self):
         """
-        Context manager that establishes an SSH tunnel (if not testing)
-        and yields a MySQL connection.
+        Returns the long-lived SSH tunnel, (re)starting it if it was never
+        opened or has dropped since the last checkout.
         """
+        with self._tunnel_lock:
+            if self.tunnel is not None and self.tunnel.is_active:
+                self.tunnel.check_tunnels()
+                if all(self.tunnel.tunnel_is_up.values()):
+                    return self.tunnel
+                logger.warning("SSH tunnel is down, reconnecting...")
+                self._stop_tunnel()
+
+            self.tunnel = SSHTunnelForwarder(
+                (settings.SSH_HOST, settings.SSH_PORT),
+                ssh_username=settings.SSH_USERNAME,
+                ssh_password=settings.SSH_PASSWORD,
+                remote_bind_address=settings.SSH_REMOTE_BIND_ADDRESS,
+                local_bind_address=("127.0.0.1", 0),  # Let OS pick a random port
+                set_keepalive=settings.SSH_KEEPALIVE_SECONDS,
+            )
+            self.tunnel.start()
+            return self.tunnel
+
+    def _stop_tunnel(self):
+        if self.tunnel is not None:
+            try:
+                self.tunnel.stop()
+            finally:
+                self.tunnel = None
+
+    def _connect_mysql(self):
         if settings.IS_TESTING:
-            conn = pymysql.connect(
-                host='localhost',
+            return InstrumentedMySQLConnection(
+                host="localhost",
                 user=settings.MYSQL_USERNAME,
                 port=3306,
-                password="susiair", # From notebook logic
+                password="susiair",  # From notebook logic
                 database="itxda",
+                local_infile=settings.BULK_LOAD_MODE == "infile",
             )
-            try:
-                yield conn
-            finally:
-                conn.close()
-        else:
-            with SSHTunnelForwarder(
-                (settings.SSH_HOST, settings.SSH_PORT),
-                ssh_username=settings.SSH_USERNAME,
-                ssh_password=settings.SSH_PASSWORD,
-                remote_bind_address=settings.SSH_REMOTE_BIND_ADDRESS,
-                local_bind_address=('127.0.0.1', 0) # Let OS pick a random port
-            ) as tunnel:
-                conn = pymysql.connect(
-                    host='127.0.0.1',
-                    user=settings.MYSQL_USERNAME,
-                    port=tunnel.local_bind_port,
-                    password=settings.MYSQL_PASSWORD,
-                    database=settings.MYSQL_DB_NAME,
-                    cursorclass=pymysql.cursors.DictCursor # Using DictCursor for easier access
-                )
-                try:
-                    yield conn
-                finally:
-                    conn.close()
+
+        tunnel = self._ensure_tunnel()
+        return InstrumentedMySQLConnection(
+            host="127.0.0.1",
+            user=settings.MYSQL_USERNAME,
+            port=tunnel.local_bind_port,
+            password=settings.MYSQL_PASSWORD,
+            database=settings.MYSQL_DB_NAME,
+            cursorclass=pymysql.cursors.DictCursor,  # Using DictCursor for easier access
+            local_infile=settings.BULK_LOAD_MODE == "infile",
+        )
+
+    @contextmanager
+    def mysql_connection(self):
+        """
+        Context manager that checks a MySQL connection out of the pool (going
+        through the shared SSH tunnel if not testing) and returns it on exit.
+        """
+        conn = self.mysql_pool.checkout()
+        discard = False
+        try:
+            yield conn
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            # Connection-level failure: don't put it back in the pool
+            discard = True
+            raise
+        finally:
+            self.mysql_pool.release(conn, discard=discard)
+
+    def close(self):
+        self.mysql_pool.close()
+        with self._tunnel_lock:
+            self._stop_tunnel()
+        self.postgres_engine.dispose()
+
 
 db_manager = DatabaseManager()
@@ -0,0 +1,237 @@
+import os
+import tempfile
+import threading
+import pandas as pd
+from src.metrics import record_bytes_fetched, record_round_trips
+
+# Postgres type OIDs, grouped by how their COPY text is turned into the
+# dtype pd.read_sql would give. Anything not listed stays a string.
+BOOL_OIDS = {16}
+INTEGER_OIDS = {20, 21, 23, 26}
+FLOAT_OIDS = {700, 701, 1700}
+DATE_OIDS = {1082}
+TIME_OIDS = {1083}
+TIMESTAMP_OIDS = {1114}
+TIMESTAMPTZ_OIDS = {1184}
+INTERVAL_OIDS = {1186}
+
+NULL_MARKER = "\\N"
+# Prefixed to text values that start with it, so none reads as NULL_MARKER
+ESCAPE = "\\"
+
+# Keep COPY's in-memory buffer bounded; bigger results spill to disk
+SPOOL_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _describe(cursor, query):
+    # Column names and type OIDs, without running the query
+    cursor.execute(f"SELECT * FROM ({query}) q LIMIT 0")
+    return [(column.name, column.type_code) for column in cursor.description]
+
+
+def _is_text(oid):
+    return oid not in (
+        BOOL_OIDS
+        | INTEGER_OIDS
+        | FLOAT_OIDS
+        | DATE_OIDS
+        | TIME_OIDS
+        | TIMESTAMP_OIDS
+        | TIMESTAMPTZ_OIDS
+        | INTERVAL_OIDS
+    )
+
+
+def _quote(name):
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def _escape_text(query, columns):
+    # Selects `query` with an ESCAPE in front of every text value starting
+    # with one, so a real value equal to NULL_MARKER can't be read as NULL
+    # (pandas sees CSV fields after unquoting); _convert strips it again
+    selected = []
+    for name, oid in columns:
+        column = f"q.{_quote(name)}"
+        if _is_text(oid):
+            column = (
+                f"CASE WHEN left({column}::text, 1) = '{ESCAPE}' "
+                f"THEN '{ESCAPE}' || {column}::text ELSE {column}::text END"
+            )
+        selected.append(f"{column} AS {_quote(name)}")
+    return f"SELECT {', '.join(selected)} FROM ({query}) q"
+
+
+def _copy_to(cursor, query, file):
+    sql = (
+        f"COPY ({query}) TO STDOUT "
+        f"WITH (FORMAT csv, HEADER false, NULL '{NULL_MARKER}')"
+    )
+    if hasattr(cursor, "copy_expert"):
+        # psycopg2
+        cursor.copy_expert(sql, file)
+        return
+    with cursor.copy(sql) as copy:
+        for block in copy:
+            file.write(block)
+
+
+def _null_to_none(values):
+    return values.astype(object).where(values.notna(), None)
+
+
+def _convert(df, columns):
+    for name, oid in columns:
+        values = df[name]
+        if oid in BOOL_OIDS:
+            values = values.map({"t": True, "f": False})
+            df[name] = values.astype(bool) if values.notna().all() else values
+        elif oid in DATE_OIDS:
+            dates = pd.to_datetime(values, format="ISO8601").dt.date
+            df[name] = _null_to_none(dates)
+        elif oid in TIME_OIDS:
+            times = (pd.Timestamp(0) + pd.to_timedelta(values)).dt.time
+            df[name] = _null_to_none(times)
+        elif oid in TIMESTAMP_OIDS:
+            df[name] = pd.to_datetime(values, format="ISO8601")
+        elif oid in TIMESTAMPTZ_OIDS:
+            df[name] = pd.to_datetime(values, format="ISO8601", utc=True)
+        elif oid in INTERVAL_OIDS:
+            df[name] = pd.to_timedelta(values)
+        elif _is_text(oid):
+            escaped = values.str.startswith(ESCAPE, na=False)
+            if escaped.any():
+                values = values.where(~escaped, values[escaped].str[1:])
+            df[name] = _null_to_none(values)
+    return df
+
+
+def _csv_dtypes(columns):
+    return {
+        name: "float64" if oid in FLOAT_OIDS else object
+        for name, oid in columns
+        if oid not in INTEGER_OIDS
+    }
+
+
+def _read_csv(source, columns, chunksize=None):
+    return pd.read_csv(
+        source,
+        header=None,
+        names=[name for name, _ in columns],
+        dtype=_csv_dtypes(columns),
+        keep_default_na=False,
+        na_values=[NULL_MARKER],
+        chunksize=chunksize,
+    )
+
+
+def read_sql_copy(query, engine, chunksize=None):
+    """
+    Reads `query` with `COPY ... TO STDOUT` in CSV and parses it with the
+    C CSV reader, instead of building a Python object per cell like
+    pd.read_sql. Columns get the dtypes pd.read_sql would give them, based
+    on their Postgres type OIDs.
+
+    Without `chunksize` the COPY output is buffered in a spooled temporary
+    file and parsed at once. With `chunksize`, returns an iterator of
+    DataFrames like pd.read_sql does, parsed while the COPY is still
+    streaming (see _stream_copy). Works with both psycopg2 and psycopg 3
+    connections.
+    """
+    if chunksize is not None:
+        return _stream_copy(query, engine, chunksize)
+
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        columns = _describe(cursor, query)
+        _copy_to(cursor, _escape_text(query, columns), spool)
+        cursor.close()
+    except BaseException:
+        spool.close()
+        raise
+    finally:
+        connection.close()
+
+    record_round_trips(2)
+    record_bytes_fetched(spool.tell())
+    with spool:
+        if spool.tell() == 0:
+            return pd.DataFrame(columns=[name for name, _ in columns])
+        spool.seek(0)
+        return _convert(_read_csv(spool, columns), columns)
+
+
+class _CountingWriter:
+    def __init__(self, file):
+        self.file = file
+        self.bytes = 0
+
+    def write(self, data):
+        self.bytes += len(data)
+        return self.file.write(data)
+
+
+def _stream_copy(query, engine, chunksize):
+    """
+    Runs the COPY on a writer thread into a pipe and parses chunks from the
+    other end, so only about `chunksize` rows (plus the pipe and parser
+    buffers) are held at a time and the first chunk arrives before the COPY
+    has finished.
+
+    The last chunk parsed is held back until the COPY has ended: if it
+    fails midway the error is raised instead of a truncated final row.
+    Closing the iterator early closes the pipe, which cuts the COPY short.
+    """
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        columns = _describe(cursor, query)
+    except BaseException:
+        connection.close()
+        raise
+
+    read_fd, write_fd = os.pipe()
+    pipe = _CountingWriter(os.fdopen(write_fd, "wb"))
+    errors = []
+
+    def copy():
+        try:
+            _copy_to(cursor, _escape_text(query, columns), pipe)
+            cursor.close()
+        except BaseException as e:
+            errors.append(e)
+            # The COPY was cut short; don't return the connection to the pool
+            invalidate = getattr(connection, "invalidate", None)
+            if invalidate is not None:
+                invalidate()
+        finally:
+            try:
+                pipe.file.close()
+            except OSError:
+                pass
+            connection.close()
+
+    writer = threading.Thread(target=copy, name="pg-copy", daemon=True)
+    writer.start()
+    source = os.fdopen(read_fd, "rb")
+    try:
+        pending = None
+        for chunk in _read_csv(source, columns, chunksize):
+            if chunk.empty:
+                continue
+            if pending is not None:
+                yield _convert(pending, columns)
+            pending = chunk
+        writer.join()
+        if errors:
+            raise errors[0]
+        record_round_trips(2)
+        record_bytes_fetched(pipe.bytes)
+        if pending is not None:
+            yield _convert(pending, columns)
+    finally:
+        source.close()
+        writer.join()
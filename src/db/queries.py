@@ -0,0 +1,112 @@
+import pandas as pd
+from src.config.settings import settings
+
+DEDUP_STAGING_TABLE = "tmp_dedup_keys"
+
+
+def iter_chunks(values, chunk_size):
+    values = list(values)
+    for start in range(0, len(values), chunk_size):
+        yield values[start : start + chunk_size]
+
+
+def fetch_in_chunks(cursor, query_template, keys, chunk_size=1000):
+    """
+    Runs `query_template` once per chunk of `keys`, substituting `{placeholders}`
+    with the right number of `%s` markers, and returns all fetched rows.
+    """
+    rows = []
+    for chunk in iter_chunks(keys, chunk_size):
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cursor.execute(query_template.format(placeholders=placeholders), chunk)
+        rows.extend(cursor.fetchall())
+    return rows
+
+
+def execute_in_chunks(cursor, query_template, keys, chunk_size=1000):
+    # Like fetch_in_chunks, for statements that don't return rows
+    for chunk in iter_chunks(keys, chunk_size):
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cursor.execute(query_template.format(placeholders=placeholders), chunk)
+
+
+def derived_table(rows, columns):
+    # `SELECT %s AS a, ... UNION ALL SELECT %s, ...` usable as a derived table
+    selects = [
+        "SELECT " + ", ".join(f"%s AS {c}" for c in columns),
+        *["SELECT " + ", ".join(["%s"] * len(columns))] * (len(rows) - 1),
+    ]
+    params = [value for row in rows for value in row]
+    return " UNION ALL ".join(selects), params
+
+
+def rows_to_frame(rows, columns):
+    # DictCursor yields dicts, the plain cursor (testing mode) yields tuples
+    return pd.DataFrame(list(rows), columns=columns)
+
+
+def _fetch_existing_via_staging(cursor, table, key_column, keys, columns):
+    cursor.execute(
+        f"""
+        CREATE TEMPORARY TABLE IF NOT EXISTS {DEDUP_STAGING_TABLE} (
+            k VARCHAR(255) NOT NULL,
+            PRIMARY KEY (k)
+        ) ENGINE=MEMORY
+        """
+    )
+    try:
+        cursor.execute(f"DELETE FROM {DEDUP_STAGING_TABLE}")
+        for chunk in iter_chunks(keys, settings.DEDUP_CHUNK_SIZE):
+            cursor.execute(
+                f"INSERT IGNORE INTO {DEDUP_STAGING_TABLE} (k) VALUES "
+                + ", ".join(["(%s)"] * len(chunk)),
+                chunk,
+            )
+        cursor.execute(
+            f"""
+            SELECT DISTINCT {", ".join(f"t.{c}" for c in columns)}
+            FROM {table} AS t
+            JOIN {DEDUP_STAGING_TABLE} AS k ON k.k = t.{key_column}
+            """
+        )
+        return cursor.fetchall()
+    finally:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {DEDUP_STAGING_TABLE}")
+
+
+def fetch_existing_rows(cursor, table, key_column, keys, columns, mode=None):
+    """
+    Returns the rows of `table` whose `key_column` is one of `keys`, as a
+    DataFrame with `columns`.
+
+    DEDUP_MODE picks how the probe runs:
+      - "in": chunked `WHERE key IN (...)` probes (default).
+      - "staging": bulk-load the keys into an indexed temporary table and join.
+      - "client": legacy behaviour, download the whole table and filter here.
+    With "in" and "staging", transfer scales with the candidate batch instead
+    of the destination table.
+    """
+    mode = mode or settings.DEDUP_MODE
+    keys = pd.unique(pd.Series(keys, dtype=object).dropna())
+
+    if mode == "client":
+        cursor.execute(f"SELECT DISTINCT {', '.join(columns)} FROM {table}")
+        existing_df = rows_to_frame(cursor.fetchall(), columns)
+        return existing_df[existing_df[key_column].isin(keys)]
+
+    if len(keys) == 0:
+        return rows_to_frame([], columns)
+
+    if mode == "staging":
+        rows = _fetch_existing_via_staging(cursor, table, key_column, keys, columns)
+    elif mode == "in":
+        query = f"""
+        SELECT DISTINCT {", ".join(columns)}
+        FROM {table}
+        WHERE {key_column} IN ({{placeholders}})
+        """
+        rows = fetch_in_chunks(cursor, query, keys, settings.DEDUP_CHUNK_SIZE)
+    else:
+        raise ValueError(f"Unknown DEDUP_MODE: {mode}")
+
+    return rows_to_frame(rows, columns)
@@ -0,0 +1,165 @@
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pymysql
+from src.config.settings import settings
+from src.db.connections import db_manager
+from src.db.queries import fetch_in_chunks
+
+logger = logging.getLogger(__name__)
+
+# MySQL errors after which the same work can simply be run again
+RETRYABLE_ERRORS = {
+    1205: "lock wait timeout",
+    1213: "deadlock",
+    2006: "server has gone away",
+    2013: "lost connection",
+}
+LOCK_WAIT_TIMEOUT = 1205
+
+
+def error_code(error):
+    return error.args[0] if error.args and isinstance(error.args[0], int) else None
+
+
+def is_retryable(error):
+    # InterfaceError: the connection was already closed, e.g. by a tunnel drop
+    if isinstance(error, pymysql.err.InterfaceError):
+        return True
+    return isinstance(error, pymysql.err.MySQLError) and error_code(error) in (
+        RETRYABLE_ERRORS
+    )
+
+
+def _backoff(attempt):
+    delay = settings.LOAD_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)
+    return delay * random.uniform(0.5, 1.5)
+
+
+def _describe(error):
+    return RETRYABLE_ERRORS.get(error_code(error), type(error).__name__)
+
+
+@contextmanager
+def savepoint(cursor, name):
+    """
+    Runs the block under `SAVEPOINT name`: on error the transaction rolls
+    back to it, so what ran before the block is kept.
+    """
+    cursor.execute(f"SAVEPOINT {name}")
+    try:
+        yield
+    except BaseException:
+        # A deadlock or a dropped connection already ended the transaction
+        try:
+            cursor.execute(f"ROLLBACK TO SAVEPOINT {name}")
+        except pymysql.err.MySQLError:
+            pass
+        raise
+    cursor.execute(f"RELEASE SAVEPOINT {name}")
+
+
+def run_stage(cursor, name, work):
+    """
+    Runs `work()` as one stage of a transaction, under a savepoint. InnoDB
+    only rolls back the statement that hit a lock wait timeout, so the
+    stage is redone from its savepoint without losing the earlier ones;
+    other errors go up to run_in_transaction.
+    """
+    attempt = 0
+    while True:
+        try:
+            with savepoint(cursor, name):
+                return work()
+        except pymysql.err.OperationalError as error:
+            attempt += 1
+            if (
+                error_code(error) != LOCK_WAIT_TIMEOUT
+                or attempt > settings.LOAD_MAX_RETRIES
+            ):
+                raise
+            delay = _backoff(attempt)
+            logger.warning(
+                f"Stage {name}: lock wait timeout, retrying in {delay:.1f}s "
+                f"({attempt}/{settings.LOAD_MAX_RETRIES})"
+            )
+            time.sleep(delay)
+
+
+def run_in_transaction(work, verify=None):
+    """
+    Runs `work(cursor)` on a pooled connection and commits, as a single
+    transaction. Returns what `work` returned.
+
+    On a deadlock, lock wait timeout or lost connection the transaction is
+    rolled back and run again on a fresh connection, up to LOAD_MAX_RETRIES
+    times with exponential backoff. If the connection was lost during the
+    COMMIT itself, nobody knows whether it went through: `verify(cursor,
+    result)` is then asked first, and the work is only redone if it says
+    the previous attempt didn't commit. Without `verify`, `work` must be
+    safe to run twice.
+    """
+    attempt = 0
+    # (result,) of an attempt whose COMMIT may or may not have gone through
+    pending = None
+    while True:
+        committing = False
+        try:
+            with db_manager.mysql_connection() as conn:
+                with conn.cursor() as cursor:
+                    if pending is not None:
+                        if verify(cursor, pending[0]):
+                            return pending[0]
+                        pending = None
+                    result = work(cursor)
+                    committing = True
+                    conn.commit()
+                    return result
+        except pymysql.err.MySQLError as error:
+            attempt += 1
+            if not is_retryable(error) or attempt > settings.LOAD_MAX_RETRIES:
+                raise
+            if committing and verify is not None:
+                pending = (result,)
+            delay = _backoff(attempt)
+            logger.warning(
+                f"MySQL {_describe(error)}, retrying the transaction in "
+                f"{delay:.1f}s ({attempt}/{settings.LOAD_MAX_RETRIES})"
+            )
+            time.sleep(delay)
+
+
+def ids_exist(cursor, table, ids):
+    # Whether every row of `ids` is in `table`, e.g. to verify a commit
+    rows = fetch_in_chunks(
+        cursor,
+        f"SELECT COUNT(*) AS n FROM {table} WHERE id IN ({{placeholders}})",
+        [int(i) for i in ids],
+        settings.DEDUP_CHUNK_SIZE,
+    )
+    found = sum(row["n"] if isinstance(row, dict) else row[0] for row in rows)
+    return found == len(ids)
+
+
+def iter_frame_chunks(df, chunk_rows=None, key=None):
+    """
+    Splits `df` into chunks of about `chunk_rows` rows (LOAD_COMMIT_ROWS by
+    default). Rows sharing the same `key` value always land in the same
+    chunk, so a chunk can be committed or redone as a whole.
+    """
+    chunk_rows = chunk_rows or settings.LOAD_COMMIT_ROWS
+    if key is None:
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start : start + chunk_rows]
+        return
+    codes, uniques = pd.factorize(df[key])
+    sizes = np.bincount(codes, minlength=len(uniques))
+    # A key goes to the chunk in which its first row would fall
+    key_chunk = (np.cumsum(sizes) - sizes) // chunk_rows
+    row_chunk = key_chunk[codes]
+    for chunk in np.unique(row_chunk):
+        yield df[row_chunk == chunk]
@@ -0,0 +1,157 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Stage the current code runs under; copied into the extract worker threads
+# by src.pipelines.parallel so their queries are attributed to it too.
+_current_stage = contextvars.ContextVar("current_stage", default=None)
+
+COUNTERS = [
+    "duration_seconds",
+    "rows_in",
+    "rows_out",
+    "bytes_fetched",
+    "round_trips",
+]
+
+
+class StageMetrics:
+    def __init__(self):
+        self.counts = dict.fromkeys(COUNTERS + ["calls"], 0)
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for key, value in counts.items():
+                self.counts[key] += value
+
+    def to_dict(self):
+        with self._lock:
+            stage = dict(self.counts)
+        duration = stage["duration_seconds"]
+        stage["duration_seconds"] = round(duration, 3)
+        stage["rows_per_second"] = (
+            round(max(stage["rows_in"], stage["rows_out"]) / duration, 1)
+            if duration > 0
+            else None
+        )
+        return stage
+
+
+class RunMetrics:
+    """
+    Per-stage metrics of one pipeline run, keyed by (pipeline, stage).
+
+    Inside `stage()` the time spent is recorded, callers add their row
+    counts, and the database layer adds the round-trips and bytes of every
+    query issued from that stage (see record_round_trips/record_bytes_fetched).
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def get(self, pipeline, stage):
+        with self._lock:
+            return self.stages.setdefault((pipeline, stage), StageMetrics())
+
+    @contextmanager
+    def stage(self, pipeline, stage):
+        metrics = self.get(pipeline, stage)
+        token = _current_stage.set(metrics)
+        start = time.perf_counter()
+        try:
+            yield metrics
+        finally:
+            _current_stage.reset(token)
+            metrics.add(calls=1, duration_seconds=time.perf_counter() - start)
+
+    def iter_stage(self, pipeline, stage, iterable):
+        # Times every step of `iterable` (e.g. a streamed extract) as `stage`
+        iterator = iter(iterable)
+        while True:
+            with self.stage(pipeline, stage) as metrics:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                metrics.add(rows_out=len(item))
+            yield item
+
+    def to_dict(self):
+        with self._lock:
+            stages = list(self.stages.items())
+        result = {}
+        for (pipeline, stage), metrics in stages:
+            result.setdefault(pipeline, {})[stage] = metrics.to_dict()
+        return result
+
+
+def record_round_trips(count=1):
+    metrics = _current_stage.get()
+    if metrics is not None:
+        metrics.add(round_trips=count)
+
+
+def record_bytes_fetched(count):
+    metrics = _current_stage.get()
+    if metrics is not None:
+        metrics.add(bytes_fetched=count)
+
+
+def frame_nbytes(df):
+    return int(df.memory_usage(index=False, deep=True).sum())
+
+
+class MetricsRegistry:
+    """
+    Process-wide totals over every finished run, rendered in the Prometheus
+    text exposition format by `render()`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._runs = {}
+        self._totals = {}
+        self._last = {}
+
+    def observe_run(self, run_metrics, status):
+        with self._lock:
+            self._runs[status] = self._runs.get(status, 0) + 1
+            for (pipeline, stage), metrics in list(run_metrics.stages.items()):
+                stage_metrics = metrics.to_dict()
+                totals = self._totals.setdefault((pipeline, stage), {})
+                for key in COUNTERS:
+                    totals[key] = totals.get(key, 0) + metrics.counts[key]
+                self._last[(pipeline, stage)] = stage_metrics
+
+    def render(self):
+        lines = [
+            "# HELP itxda_pipeline_runs_total Finished pipeline runs by status.",
+            "# TYPE itxda_pipeline_runs_total counter",
+        ]
+        with self._lock:
+            for status, count in sorted(self._runs.items()):
+                lines.append(f'itxda_pipeline_runs_total{{status="{status}"}} {count}')
+
+            for key in COUNTERS:
+                name = f"itxda_stage_{key}_total"
+                lines.append(f"# HELP {name} Sum of {key} over all runs, per stage.")
+                lines.append(f"# TYPE {name} counter")
+                for (pipeline, stage), totals in sorted(self._totals.items()):
+                    labels = f'pipeline="{pipeline}",stage="{stage}"'
+                    lines.append(f"{name}{{{labels}}} {totals[key]}")
+
+            for key in ["duration_seconds", "rows_per_second"]:
+                name = f"itxda_stage_last_{key}"
+                lines.append(f"# HELP {name} {key} of the stage in the last run.")
+                lines.append(f"# TYPE {name} gauge")
+                for (pipeline, stage), last in sorted(self._last.items()):
+                    if last[key] is not None:
+                        labels = f'pipeline="{pipeline}",stage="{stage}"'
+                        lines.append(f"{name}{{{labels}}} {last[key]}")
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
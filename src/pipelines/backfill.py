@@ -0,0 +1,287 @@
+"""
+Backfills raw_flight_log into MySQL over a date range, one partition
+(one aircraft registration, or a calendar month) at a time.
+
+    python -m src.pipelines.backfill --since 2019-01-01 --partition-by ac --workers 4
+
+Partitions are extracted and transformed in a process pool; their loads run
+one after another in this process, so MySQL sees the same serialized
+inserts as a regular run. Every loaded partition is checkpointed under
+PIPELINE_STATE_DIR/backfill, and running the same command again resumes
+with the partitions that haven't finished. Watermarks are left alone.
+"""
+
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from src.config.settings import settings
+from src.pipelines import extract, logbook_entry, logbook_sheet
+from src.pipelines.compact import compact_dtypes
+from src.pipelines.dimensions import DIMENSIONS, dimension_cache
+from src.pipelines.keys import (
+    SHEET_KEY,
+    confirm_sheets,
+    isin_sheets,
+    sheet_lookup,
+    unique_serials,
+    with_sheet_keys,
+)
+from src.pipelines.state import read_json_state, write_json_state
+from src.pipelines.watermark import get_extract_cutoff
+
+PARTITION_BY = ["ac", "month"]
+
+# Entries are transformed before their sheets are loaded; existing entries
+# and sheet ids are resolved at load time (see load_partition).
+NO_EXISTING_ENTRIES = pd.DataFrame({"formatted_serial_number": []})
+NO_SHEETS = pd.DataFrame(
+    {
+        "logsheet_id": pd.Series(dtype="int64"),
+        "formatted_serial_number": pd.Series(dtype=object),
+        "flight_date": pd.Series(dtype=object),
+    }
+)
+
+# (frames, lookups) of the reference dimensions, set in every worker
+_dimensions = None
+
+
+def month_partitions(since, until):
+    partitions = []
+    month = pd.Timestamp(since).replace(day=1)
+    while month.strftime("%Y-%m-%d") < until:
+        next_month = month + pd.DateOffset(months=1)
+        partitions.append(
+            {
+                "key": month.strftime("%Y-%m"),
+                "since": max(since, month.strftime("%Y-%m-%d")),
+                "until": min(until, next_month.strftime("%Y-%m-%d")),
+                "aircraft": None,
+                "range": (since, until),
+            }
+        )
+        month = next_month
+    return partitions
+
+
+def aircraft_partitions(since, until):
+    # A sheet never spans two aircraft, so these never split one
+    return [
+        {"key": f"ac={ac}", "since": since, "until": until, "aircraft": ac}
+        for ac in extract.get_raw_flight_log_aircraft(since, until)
+    ]
+
+
+def whole_sheets(raw_logbook_df, partition):
+    """
+    Gives each sheet of a month partition to the month of its first leg in
+    the backfill range: sheets that started in an earlier month are left to
+    that partition, and those running on past this month get their later
+    legs, so no sheet is loaded with part of its legs.
+    """
+    if raw_logbook_df.empty:
+        return raw_logbook_df
+    outside = extract.get_raw_flight_logs_of_sheets(
+        unique_serials(raw_logbook_df),
+        *partition["range"],
+        exclude=(partition["since"], partition["until"]),
+    )
+    if outside.empty:
+        return raw_logbook_df
+    earlier = outside["date"].astype(str) < partition["since"]
+    started_before = unique_serials(outside[earlier])
+    return pd.concat(
+        [
+            raw_logbook_df[~isin_sheets(raw_logbook_df, started_before)],
+            outside[~isin_sheets(outside, started_before)],
+        ],
+        ignore_index=True,
+    )
+
+
+def _init_worker(dimensions):
+    global _dimensions
+    _dimensions = dimensions
+
+
+def transform_partition(partition):
+    """
+    Extracts and transforms one partition without touching MySQL. Returns
+    `(partition, raw rows, sheets, entries)`.
+    """
+    frames, lookups = _dimensions
+    raw_logbook_df = extract.get_raw_flight_logs(
+        partition["since"], partition["until"], aircraft=partition["aircraft"]
+    )
+    if partition["aircraft"] is None:
+        raw_logbook_df = whole_sheets(raw_logbook_df, partition)
+    if raw_logbook_df.empty:
+        return partition, 0, pd.DataFrame(), pd.DataFrame()
+    if settings.COMPACT_DTYPES:
+        raw_logbook_df = compact_dtypes(raw_logbook_df)
+
+    sheets = logbook_sheet.transform_logbook_data(
+        raw_logbook_df, frames["aircraft_detail"], lookups["aircraft_detail"]
+    )
+    entries = logbook_entry.transform_entry_data(
+        raw_logbook_df,
+        NO_EXISTING_ENTRIES,
+        frames["aircraft_detail"],
+        frames["customer"],
+        frames["pilot"],
+        frames["airport"],
+        NO_SHEETS,
+        lookups,
+    )
+    return partition, len(raw_logbook_df), sheets, entries
+
+
+def load_partition(sheets, entries):
+    """
+    Loads a transformed partition: the sheets first, then the entries that
+    aren't in MySQL yet, linked to the sheet ids. Returns `(sheet_ids,
+    entry_ids)`.
+    """
+    no_ids = np.empty(0, dtype=np.int64)
+    if sheets.empty:
+        return no_ids, no_ids
+    logbook_sheet_df, sheet_ids = logbook_sheet.load_logbook_sheets(sheets)
+    if entries.empty:
+        return sheet_ids, no_ids
+
+    existing = logbook_entry.fetch_existing_entries(unique_serials(entries))
+    entries = entries[
+        ~isin_sheets(entries, existing["formatted_serial_number"])
+    ].reset_index(drop=True)
+    sheets = logbook_sheet_df.drop_duplicates("formatted_serial_number")
+    entries = with_sheet_keys(entries.drop(columns="logsheet_id")).merge(
+        sheet_lookup(sheets[["formatted_serial_number", "logsheet_id"]]),
+        how="left",
+        on=SHEET_KEY,
+    )
+    entries = confirm_sheets(entries, ["logsheet_id"])
+    return sheet_ids, logbook_entry.load_entries_and_schedules(entries)
+
+
+def _checkpoint_file(partition_by, since, until):
+    return os.path.join("backfill", f"{partition_by}_{since}_{until}.json")
+
+
+def _finish_partition(result, checkpoint_file, done):
+    partition, rows, sheets, entries = result
+    # With INCREMENTAL_POST_PROCESS the rows are post-processed in the
+    # transactions that insert them, so a loaded partition is complete
+    sheet_ids, entry_ids = load_partition(sheets, entries)
+    done.add(partition["key"])
+    write_json_state(
+        checkpoint_file,
+        {
+            "done": sorted(done),
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+        },
+    )
+    print(
+        f"Partition {partition['key']} done: {rows} raw rows, "
+        f"{len(sheet_ids)} sheets and {len(entry_ids)} entries inserted."
+    )
+    return len(sheet_ids) + len(entry_ids)
+
+
+def run_backfill(since, until=None, partition_by="ac", workers=None, restart=False):
+    """
+    Backfills [since, until) partitioned by `partition_by` ("ac" or
+    "month"). `workers` extract/transform processes run at once (all cores by
+    default); with 1 everything runs in this process.
+
+    A sheet whose legs straddle a month boundary is loaded whole by the
+    month of its first leg (see whole_sheets).
+    """
+    until = until or get_extract_cutoff()
+    workers = workers or os.cpu_count()
+    if partition_by == "month":
+        partitions = month_partitions(since, until)
+    elif partition_by == "ac":
+        partitions = aircraft_partitions(since, until)
+    else:
+        raise ValueError(f"Unknown partitioning: {partition_by}")
+
+    checkpoint_file = _checkpoint_file(partition_by, since, until)
+    done = set() if restart else set(read_json_state(checkpoint_file).get("done", []))
+    pending = [p for p in partitions if p["key"] not in done]
+    print(
+        f"Backfilling {len(pending)} of {len(partitions)} {partition_by} "
+        f"partitions from {since} to {until} with {workers} workers..."
+    )
+    if not pending:
+        # A previous backfill may have loaded everything but failed to sweep
+        logbook_entry.finish_post_processing(0)
+        return
+
+    dimensions = (
+        {name: dimension_cache.get(name) for name in DIMENSIONS},
+        {name: dimension_cache.get_lookup(name) for name in DIMENSIONS},
+    )
+    inserted = 0
+    if workers <= 1:
+        _init_worker(dimensions)
+        for partition in pending:
+            result = transform_partition(partition)
+            inserted += _finish_partition(result, checkpoint_file, done)
+    else:
+        # Fresh interpreters: workers must not share the parent's connections
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(dimensions,),
+        ) as executor:
+            queue = iter(pending)
+            in_flight = set()
+            try:
+                while True:
+                    # Keep transformed-but-unloaded partitions bounded
+                    while len(in_flight) < 2 * workers:
+                        partition = next(queue, None)
+                        if partition is None:
+                            break
+                        in_flight.add(executor.submit(transform_partition, partition))
+                    if not in_flight:
+                        break
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        result = future.result()
+                        inserted += _finish_partition(result, checkpoint_file, done)
+            except BaseException:
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise
+
+    logbook_entry.finish_post_processing(inserted)
+    print("Backfill finished.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--since", required=True, help="First day, YYYY-MM-DD")
+    parser.add_argument(
+        "--until", help="Day after the last one (default: the extract cutoff)"
+    )
+    parser.add_argument("--partition-by", choices=PARTITION_BY, default="ac")
+    parser.add_argument("--workers", type=int, help="Default: all cores")
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Ignore the checkpoint and redo every partition",
+    )
+    args = parser.parse_args(argv)
+    run_backfill(
+        args.since, args.until, args.partition_by, args.workers, args.restart
+    )
+
+
+if __name__ == "__main__":
+    main()
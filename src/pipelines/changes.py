@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+from src.config.settings import settings
+from src.db.transactions import run_in_transaction
+from src.pipelines import extract, logbook_entry, logbook_sheet
+from src.pipelines.fingerprints import (
+    diff_fingerprints,
+    fingerprint_store,
+    sheet_fingerprints,
+)
+
+PIPELINE_NAME = "changes"
+
+
+class ChangeTracker:
+    """
+    Finds the sheets of a run's raw_flight_log window that were corrected
+    or deleted at the source since they were loaded, by comparing their
+    fingerprints with the fingerprint store.
+
+    `diff_chunk()` returns the changed serials of each chunk, which the
+    sheet and entry stages then update and replace. `finish()` deletes the
+    sheets that are gone and saves the new fingerprints; until then the
+    store is untouched, so a failed run is diffed again the next time.
+    """
+
+    def __init__(self, context, store=None):
+        self.context = context
+        self.store = store or fingerprint_store
+        self.fingerprints = []
+        self.upserted = []
+
+    def diff_chunk(self, raw_logs):
+        with self.context.metrics.stage(PIPELINE_NAME, "diff") as metrics:
+            current = sheet_fingerprints(raw_logs)
+            stored = self.store.lookup(current["formatted_serial_number"])
+            diff = diff_fingerprints(current, stored, self.context.since)
+            metrics.add(rows_in=len(current), rows_out=len(diff["changed"]))
+
+        self.fingerprints.append(current)
+        self.upserted.extend([diff["inserted"], diff["changed"]])
+        self.context.record_progress(
+            PIPELINE_NAME, inserted=len(diff["inserted"]), changed=len(diff["changed"])
+        )
+        if len(diff["changed"]):
+            print(f"Changed sheets found: {len(diff['changed'])}")
+        return diff["changed"]
+
+    def _deleted_serials(self):
+        current = pd.concat(self.fingerprints, ignore_index=True)
+        stored = self.store.window(self.context.since, self.context.until)
+        candidates = diff_fingerprints(current, stored, self.context.since)["deleted"]
+        if not len(candidates):
+            return candidates, candidates
+        # A sheet whose dates were corrected out of the window is still there
+        present = extract.get_raw_flight_log_serials(candidates)
+        deleted = np.array([s for s in candidates if s not in present], dtype=object)
+        return candidates, deleted
+
+    @staticmethod
+    def _delete(cursor, serials):
+        logbook_entry.delete_entries(cursor, serials)
+        logbook_sheet.delete_logbook_sheets(cursor, serials)
+
+    def finish(self):
+        if not self.fingerprints:
+            return
+        with self.context.metrics.stage(PIPELINE_NAME, "delete") as metrics:
+            candidates, deleted = self._deleted_serials()
+            if len(deleted):
+                print(f"Deleted sheets found: {len(deleted)}")
+                if not settings.IS_DEBUGGING:
+                    run_in_transaction(lambda cursor: self._delete(cursor, deleted))
+            metrics.add(rows_in=len(candidates), rows_out=len(deleted))
+        self.context.record_progress(PIPELINE_NAME, deleted=len(deleted))
+
+        # Debug runs don't write, so the changes must be found again
+        if settings.IS_DEBUGGING:
+            return
+        current = pd.concat(self.fingerprints, ignore_index=True)
+        upserted = current[
+            current["formatted_serial_number"].isin(np.concatenate(self.upserted))
+        ]
+        self.store.save(upserted, candidates)
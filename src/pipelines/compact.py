@@ -0,0 +1,81 @@
+import pandas as pd
+
+# Columns resolved against the same dimension share one set of categories,
+# so each distinct code is looked up once for the whole group. Categories
+# are only shared within the extracted frame, not with the dimension keys:
+# the lookups (Series.map, resolve_airport_codes) take the categories as
+# they are, so there is no join of category against object to align.
+CATEGORY_GROUPS = [
+    ["ac"],
+    ["customer"],
+    ["pic", "sic"],
+    ["from", "to"],
+    ["dep", "arr"],
+]
+# Categoricals only pay off when values repeat; formatted_serial_number and
+# the like are close to unique and stay plain strings.
+MAX_CATEGORY_RATIO = 0.5
+
+# Counts and cycles that are carried through to the load as they are. The
+# per-sheet sums (hours, landings) keep their width so they can't overflow,
+# and float measures stay float64 so hobbs and fuel values load unchanged.
+INTEGER_COLUMNS = [
+    "year",
+    "adult",
+    "child",
+    "infant",
+    "crew",
+    "kg",
+    "eng1_cycle",
+    "eng2_cycle",
+]
+# verified_by_id is the only id raw_flight_log carries; the dimension ids
+# are added by the transforms and keep the dtypes the load expects.
+ID_COLUMNS = ["verified_by_id"]
+
+
+def _shared_categorical(df, columns):
+    values = pd.concat([df[column] for column in columns], ignore_index=True)
+    categories = pd.Index(values.dropna().unique())
+    if len(categories) > MAX_CATEGORY_RATIO * len(values):
+        return
+    dtype = pd.CategoricalDtype(categories)
+    for column in columns:
+        df[column] = df[column].astype(dtype)
+
+
+def compact_dtypes(raw_logbook_df):
+    """
+    Returns `raw_logbook_df` with low-cardinality strings as categoricals,
+    integer counts downcast to the smallest width that holds them, and its
+    ids (verified_by_id) as nullable integers. The input frame is left
+    untouched.
+    """
+    df = raw_logbook_df.copy(deep=False)
+    if df.empty:
+        return df
+
+    for group in CATEGORY_GROUPS:
+        columns = [
+            c
+            for c in group
+            if c in df.columns and pd.api.types.is_string_dtype(df[c].dtype)
+        ]
+        if columns:
+            _shared_categorical(df, columns)
+
+    for column in INTEGER_COLUMNS:
+        if column in df.columns and pd.api.types.is_integer_dtype(df[column]):
+            df[column] = pd.to_numeric(df[column], downcast="integer")
+
+    for column in ID_COLUMNS:
+        if column not in df.columns:
+            continue
+        ids = df[column]
+        if pd.api.types.is_float_dtype(ids):
+            non_null = ids.dropna()
+            if not (non_null == non_null.round()).all():
+                continue
+        if pd.api.types.is_numeric_dtype(ids):
+            df[column] = ids.astype("Int64")
+    return df
@@ -0,0 +1,199 @@
+import threading
+from concurrent.futures import Future
+import numpy as np
+from src.config.settings import settings
+from src.metrics import RunMetrics, frame_nbytes
+from src.pipelines.compact import compact_dtypes
+from src.pipelines.dimensions import DIMENSIONS, dimension_cache
+from src.pipelines.extract import (
+    get_raw_flight_logs,
+    get_sheet_aggregates,
+    iter_raw_flight_logs,
+    iter_sheet_aggregates,
+)
+from src.pipelines.parallel import cancel_all, submit_all
+from src.pipelines.staging import raw_staging, staging_enabled
+from src.pipelines.watermark import get_extract_cutoff, get_extract_window
+
+
+# Metrics label of the extraction work shared by both pipelines
+SHARED_PIPELINE = "shared"
+
+
+class PipelineRunContext:
+    """
+    A single extraction snapshot shared by the pipelines of one run.
+
+    Each source is read from Postgres at most once, on first access, and the
+    same frame is handed to every pipeline that asks for it. The sheet stage
+    also publishes the logbook-sheet rows it resolved (existing + inserted)
+    on `logbook_sheet_df`, so the entry stage doesn't re-read
+    itxda_logbook_sheet. The ids of every row inserted during the run are
+    recorded per table so post-processing can be scoped to them.
+
+    Reference dimensions come from the process-wide dimension cache; the
+    first copy a run gets is kept for the rest of it, so every chunk sees
+    the same version even if the cache refreshes meanwhile.
+
+    `prefetch()` starts the independent Postgres reads concurrently; the
+    getters then wait on them instead of querying one after another.
+
+    Stages report what they processed through `record_progress()`, which a
+    background job can read at any time with `progress_snapshot()`, and
+    time themselves under `metrics` (durations, rows, bytes, round-trips).
+
+    Raw frames go through compact_dtypes() right after extraction, unless
+    COMPACT_DTYPES is off.
+
+    With EXTRACT_CHUNK_SIZE > 0 raw_flight_log is streamed instead of held in
+    memory; callers should then go through `iter_raw_flight_logs()` and run
+    every stage on a chunk before moving on to the next one.
+    """
+
+    def __init__(self, since=None, until=None):
+        self.since = since
+        self.until = until or get_extract_cutoff()
+        self.logbook_sheet_df = None
+        self.inserted_ids = {}
+        self.stage = None
+        self.progress = {}
+        self.metrics = RunMetrics()
+        self._frames = {}
+        self._progress_lock = threading.Lock()
+
+    @classmethod
+    def for_pipelines(cls, *pipeline_names):
+        # The snapshot has to cover the widest window any pipeline asks for.
+        windows = [get_extract_window(name) for name in pipeline_names]
+        sinces = [since for since, _ in windows]
+        since = None if None in sinces else min(sinces)
+        return cls(since=since, until=max(until for _, until in windows))
+
+    def _get_frame(self, name, extract):
+        frame = self._frames.get(name)
+        if frame is None:
+            frame = self._frames[name] = extract()
+        if isinstance(frame, Future):
+            frame = self._frames[name] = frame.result()
+        return frame
+
+    def prefetch(self):
+        """
+        Starts loading the reference dimensions, and raw_flight_log when it
+        isn't streamed, on a bounded thread pool. With streaming, the first
+        raw chunk is read while they load.
+        """
+        extracts = {
+            name: (lambda name=name: dimension_cache.get_entry(name))
+            for name in DIMENSIONS
+            if name not in self._frames
+        }
+        if settings.EXTRACT_CHUNK_SIZE <= 0 and "raw_flight_log" not in self._frames:
+            extracts["raw_flight_log"] = self._extract_raw_flight_logs
+        with self.metrics.stage(SHARED_PIPELINE, "extract"):
+            self._frames.update(submit_all(extracts))
+
+    def cancel_prefetch(self):
+        cancel_all(
+            {
+                name: frame
+                for name, frame in self._frames.items()
+                if isinstance(frame, Future)
+            }
+        )
+
+    def _compact(self, raw_logbook_df):
+        if not settings.COMPACT_DTYPES:
+            return raw_logbook_df
+        with self.metrics.stage(SHARED_PIPELINE, "compact") as metrics:
+            before = frame_nbytes(raw_logbook_df)
+            compacted = compact_dtypes(raw_logbook_df)
+            after = frame_nbytes(compacted)
+            metrics.add(rows_in=len(raw_logbook_df), rows_out=len(compacted))
+        self.record_progress("compact", bytes_before=before, bytes_after=after)
+        print(
+            f"Compacted {len(compacted)} raw_flight_log rows: "
+            f"{before / 2**20:.1f} MiB -> {after / 2**20:.1f} MiB"
+        )
+        return compacted
+
+    def _extract_raw_flight_logs(self):
+        if staging_enabled():
+            raw_logbook_df = raw_staging.get_raw_flight_logs(self.since, self.until)
+        else:
+            raw_logbook_df = get_raw_flight_logs(self.since, self.until)
+        return self._compact(raw_logbook_df)
+
+    def get_raw_flight_logs(self):
+        return self._get_frame("raw_flight_log", self._extract_raw_flight_logs)
+
+    def _iter_raw_flight_log_chunks(self):
+        if settings.EXTRACT_CHUNK_SIZE <= 0:
+            yield self.get_raw_flight_logs()
+        elif staging_enabled():
+            yield from raw_staging.iter_raw_flight_logs(self.since, self.until)
+        else:
+            yield from iter_raw_flight_logs(self.since, self.until)
+
+    def iter_raw_flight_logs(self):
+        chunks = self.metrics.iter_stage(
+            SHARED_PIPELINE, "extract", self._iter_raw_flight_log_chunks()
+        )
+        if settings.EXTRACT_CHUNK_SIZE <= 0:
+            # get_raw_flight_logs() already compacted the whole frame
+            yield from chunks
+        else:
+            for chunk in chunks:
+                yield self._compact(chunk)
+
+    def iter_sheet_aggregates(self):
+        # One row per sheet, aggregated by Postgres; bypasses staging
+        if settings.EXTRACT_CHUNK_SIZE <= 0:
+            chunks = iter([get_sheet_aggregates(self.since, self.until)])
+        else:
+            chunks = iter_sheet_aggregates(self.since, self.until)
+        yield from self.metrics.iter_stage(SHARED_PIPELINE, "extract", chunks)
+
+    def _get_dimension(self, name):
+        # The cached frame and lookup, kept together for the whole run
+        return self._get_frame(name, lambda: dimension_cache.get_entry(name))
+
+    def get_aircraft_details(self):
+        return self._get_dimension("aircraft_detail").frame
+
+    def get_pilots(self):
+        return self._get_dimension("pilot").frame
+
+    def get_airports(self):
+        return self._get_dimension("airport").frame
+
+    def get_customers(self):
+        return self._get_dimension("customer").frame
+
+    def get_lookups(self):
+        return {name: self._get_dimension(name).lookup for name in DIMENSIONS}
+
+    def set_stage(self, stage):
+        self.stage = stage
+
+    def record_progress(self, stage, **counts):
+        # Adds `counts` (e.g. rows=..., inserted=...) to the stage's totals
+        with self._progress_lock:
+            totals = self.progress.setdefault(stage, {})
+            for key, value in counts.items():
+                totals[key] = totals.get(key, 0) + int(value)
+
+    def progress_snapshot(self):
+        with self._progress_lock:
+            return {
+                "stage": self.stage,
+                "stages": {stage: dict(c) for stage, c in self.progress.items()},
+            }
+
+    def record_inserted_ids(self, table, ids):
+        self.inserted_ids.setdefault(table, []).append(np.asarray(ids, dtype=np.int64))
+
+    def get_inserted_ids(self, table):
+        return np.concatenate(
+            [np.empty(0, dtype=np.int64), *self.inserted_ids.get(table, [])]
+        )
@@ -0,0 +1,183 @@
+import threading
+import time
+import numpy as np
+import pandas as pd
+from src.config.settings import settings
+from src.pipelines.extract import (
+    AIRCRAFT_DETAIL_QUERY,
+    AIRPORT_QUERY,
+    CUSTOMER_QUERY,
+    PILOT_QUERY,
+    read_postgres,
+)
+
+
+def _read_sql(query):
+    return read_postgres(query)
+
+
+def build_lookup(df, key_column, value_column="dev_id"):
+    """
+    Maps each key of `df` to its first `value_column`. A left merge on the
+    whole dimension, as the original transforms did, gave an entry one row
+    per duplicate key, so it was inserted once per dev_id; with the lookup
+    every leg stays one entry, resolved to the first dev_id of its key.
+    """
+    return (
+        df.dropna(subset=[key_column])
+        .drop_duplicates(subset=[key_column])
+        .set_index(key_column)[value_column]
+    )
+
+
+def build_airport_lookup(airport_df):
+    """
+    Maps every ICAO and IATA code to its airport's dev_id. ICAO codes take
+    precedence: a code that is one airport's ICAO and another's IATA code
+    resolves to the first.
+    """
+    codes = pd.concat(
+        [build_lookup(airport_df, "icao_code"), build_lookup(airport_df, "iata_code")]
+    )
+    return codes[~codes.index.duplicated(keep="first")]
+
+
+def _code_positions(values, index):
+    # Categoricals (see compact_dtypes) are looked up once per category
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        positions = index.get_indexer(values.cat.categories)
+        codes = values.cat.codes.to_numpy()
+        return np.where(codes >= 0, positions[codes], -1)
+    return index.get_indexer(values.to_numpy(dtype=object))
+
+
+def resolve_airport_codes(df, column_map, airport_ids):
+    """
+    Resolves the codes of every `source column -> target column` pair in
+    `column_map` with a single lookup against `airport_ids` (see
+    build_airport_lookup) and writes the dev_ids into `df` in place.
+
+    Returns the set of non-null codes that didn't resolve.
+    """
+    sources = list(column_map)
+    codes = np.concatenate([df[column].to_numpy(dtype=object) for column in sources])
+    index = pd.Index(airport_ids.index)
+    positions = np.concatenate(
+        [_code_positions(df[column], index) for column in sources]
+    )
+    resolved = positions >= 0
+    ids = np.full(len(codes), np.nan)
+    ids[resolved] = airport_ids.to_numpy()[positions[resolved]]
+
+    for i, source in enumerate(sources):
+        df[column_map[source]] = ids[i * len(df) : (i + 1) * len(df)]
+
+    unresolved = codes[~resolved]
+    return set(unresolved[pd.notna(unresolved)])
+
+
+# name -> (extraction query, builder of its key -> dev_id lookup)
+DIMENSIONS = {
+    "aircraft_detail": (
+        AIRCRAFT_DETAIL_QUERY,
+        lambda df: build_lookup(df, "aircraft_registration"),
+    ),
+    "pilot": (PILOT_QUERY, lambda df: build_lookup(df, "name")),
+    "airport": (AIRPORT_QUERY, build_airport_lookup),
+    "customer": (CUSTOMER_QUERY, lambda df: build_lookup(df, "customer")),
+}
+
+
+def build_lookups(frames):
+    """
+    Builds the lookup of every dimension in `frames`, a dict of dimension
+    name -> DataFrame.
+    """
+    return {name: DIMENSIONS[name][1](frame) for name, frame in frames.items()}
+
+
+class CachedDimension:
+    def __init__(self, frame, lookup, signature):
+        self.frame = frame
+        self.lookup = lookup
+        self.signature = signature
+        self.checked_at = time.monotonic()
+
+
+class DimensionCache:
+    """
+    In-process cache of the analytics reference tables.
+
+    Within DIMENSION_CACHE_TTL_SECONDS of the last check a cached table is
+    served as is. After that a one-row signature query (row count + md5 of
+    the extraction query's rows, computed in Postgres) decides whether the
+    cached copy is still current; the full table is only re-read when the
+    signature changed. The key -> dev_id lookups used by the transforms are
+    built once per load.
+
+    Each table has its own lock, so different tables can be loaded
+    concurrently.
+    """
+
+    def __init__(self, ttl_seconds=None):
+        self.ttl_seconds = (
+            settings.DIMENSION_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        )
+        self._entries = {}
+        self._locks = {name: threading.Lock() for name in DIMENSIONS}
+        self._stats = {
+            name: {"hits": 0, "misses": 0, "revalidations": 0} for name in DIMENSIONS
+        }
+
+    @staticmethod
+    def _signature(query):
+        signature_df = _read_sql(
+            f"""
+            SELECT count(*) AS row_count,
+                   md5(string_agg(q::text, '|' ORDER BY q::text)) AS checksum
+            FROM ({query}) q
+            """
+        )
+        return tuple(signature_df.iloc[0])
+
+    def get_entry(self, name):
+        """Returns the CachedDimension (frame + lookup) of `name`."""
+        query, build = DIMENSIONS[name]
+        with self._locks[name]:
+            entry = self._entries.get(name)
+            stats = self._stats[name]
+            if entry is not None:
+                if time.monotonic() - entry.checked_at < self.ttl_seconds:
+                    stats["hits"] += 1
+                    return entry
+                signature = self._signature(query)
+                if signature == entry.signature:
+                    stats["hits"] += 1
+                    stats["revalidations"] += 1
+                    entry.checked_at = time.monotonic()
+                    return entry
+            else:
+                signature = self._signature(query)
+
+            stats["misses"] += 1
+            frame = _read_sql(query)
+            entry = CachedDimension(frame, build(frame), signature)
+            self._entries[name] = entry
+            return entry
+
+    def get(self, name):
+        return self.get_entry(name).frame
+
+    def get_lookup(self, name):
+        return self.get_entry(name).lookup
+
+    def invalidate(self, name=None):
+        for dimension in DIMENSIONS if name is None else [name]:
+            with self._locks[dimension]:
+                self._entries.pop(dimension, None)
+
+    def stats(self):
+        return {name: dict(stats) for name, stats in self._stats.items()}
+
+
+dimension_cache = DimensionCache()
@@ -0,0 +1,145 @@
+import duckdb
+import numpy as np
+import pandas as pd
+from src.pipelines.keys import (
+    SHEET_KEY,
+    SHEET_PARTS,
+    SHEET_SERIAL,
+    confirm_sheets,
+    sheet_lookup,
+    sheets_by_serial,
+    with_sheet_keys,
+)
+
+# Transform steps run as DuckDB SQL when TRANSFORM_ENGINE=duckdb. The
+# pandas frames are registered as views that DuckDB scans in place (no
+# Arrow conversion needed), and the results are converted back to the
+# dtypes the pandas path produces, so everything downstream is unchanged.
+
+
+def _connect(frames):
+    con = duckdb.connect()
+    for name, df in frames.items():
+        con.register(name, df)
+    return con
+
+
+def _like_pandas_ids(series):
+    # Left-joined integer ids come back as nullable Int64; Series.map and
+    # merge give float64 when some keys are missing and int64 otherwise.
+    if not pd.api.types.is_extension_array_dtype(series):
+        return series
+    if series.isna().any():
+        return series.astype("float64")
+    return series.astype("int64")
+
+
+def _like_source(result, source):
+    # DuckDB reads object columns of datetime.date as DATE and returns
+    # Timestamps; the pandas path keeps the source objects.
+    if source.dtype == object and pd.api.types.is_datetime64_any_dtype(result):
+        return pd.Series(result.dt.date, index=result.index, dtype=object).where(
+            result.notna(), None
+        )
+    return result
+
+
+def aggregate_sheets(raw_logbook_df):
+    """
+    DuckDB equivalent of the per-sheet groupby in transform_logbook_data;
+    the serial and its registration/raw serial split are added in pandas.
+    """
+    integer_legs = pd.api.types.is_integer_dtype(raw_logbook_df["landings"])
+    legs_type = "BIGINT" if integer_legs else "DOUBLE"
+    columns = SHEET_PARTS + ["date", "start", "end", "hours", "landings"]
+    with _connect({"raw": raw_logbook_df[columns]}) as con:
+        agg_df = con.execute(
+            f"""
+            SELECT
+                year, ac, fl_serial,
+                min(date) AS flight_date,
+                min(start) AS hobbs_start,
+                max("end") AS hobbs_end,
+                coalesce(sum(hours), 0) AS total_flight_hours_decimal,
+                CAST(coalesce(sum(landings), 0) AS {legs_type}) AS total_legs
+            FROM raw
+            GROUP BY year, ac, fl_serial
+            """
+        ).df()
+
+    # The serial is formatted like the pandas path, once per sheet
+    agg_df = sheets_by_serial(agg_df)
+    agg_df["flight_date"] = _like_source(agg_df["flight_date"], raw_logbook_df["date"])
+    return agg_df
+
+
+def resolve_entry_ids(entries_df, lookups, logbook_sheet_df):
+    """
+    DuckDB equivalent of logbook_entry.resolve_entry_ids: one query joins
+    the entries to every dimension lookup and to the logbook sheets.
+    Returns `(df, unresolved_airport_codes)` like the pandas path.
+    """
+    entries_df = with_sheet_keys(entries_df).reset_index(drop=True)
+    keys_df = entries_df[
+        ["ac", "customer", "pic", "sic", "from", "to", SHEET_KEY]
+    ].assign(row_idx=np.arange(len(entries_df)))
+    logbook_sheet_df = sheet_lookup(logbook_sheet_df)
+    sheet_columns = [
+        c for c in logbook_sheet_df.columns if c not in (SHEET_KEY, "flight_date")
+    ]
+    frames = {
+        name: lookup.rename_axis("code").reset_index(name="dev_id")
+        for name, lookup in lookups.items()
+    }
+    frames["entries"] = keys_df
+    frames["sheets"] = logbook_sheet_df.assign(
+        sheet_idx=np.arange(len(logbook_sheet_df))
+    )
+
+    with _connect(frames) as con:
+        ids_df = con.execute(
+            f"""
+            SELECT
+                e.row_idx,
+                ac.dev_id AS aircraft_id,
+                cu.dev_id AS flight_type_id,
+                pic.dev_id AS pilot_id,
+                sic.dev_id AS copilot_id,
+                dep.dev_id AS departure_id,
+                arr.dev_id AS arrival_id
+                {"".join(f', s."{c}"' for c in sheet_columns)}
+            FROM entries e
+            LEFT JOIN aircraft_detail ac ON ac.code = e.ac
+            LEFT JOIN customer cu ON cu.code = e.customer
+            LEFT JOIN pilot pic ON pic.code = e.pic
+            LEFT JOIN pilot sic ON sic.code = e.sic
+            LEFT JOIN airport dep ON dep.code = e."from"
+            LEFT JOIN airport arr ON arr.code = e."to"
+            LEFT JOIN sheets s
+                ON s.{SHEET_KEY} = e.{SHEET_KEY}
+            ORDER BY e.row_idx, s.sheet_idx
+            """
+        ).df()
+        unresolved = con.execute(
+            """
+            SELECT DISTINCT code FROM (
+                SELECT "from" AS code FROM entries
+                UNION ALL
+                SELECT "to" FROM entries
+            ) c
+            WHERE code IS NOT NULL AND code NOT IN (SELECT code FROM airport)
+            """
+        ).fetchall()
+
+    rows = ids_df["row_idx"].to_numpy()
+    new_logbook_df = entries_df.iloc[rows].reset_index(drop=True)
+    for column in ["aircraft_id", "flight_type_id", "pilot_id", "copilot_id"]:
+        new_logbook_df[column] = _like_pandas_ids(ids_df[column])
+    # resolve_airport_codes always yields float ids
+    for column in ["departure_id", "arrival_id"]:
+        new_logbook_df[column] = ids_df[column].astype("float64")
+    for column in sheet_columns:
+        new_logbook_df[column] = _like_pandas_ids(ids_df[column]).to_numpy()
+    sheet_columns.remove(SHEET_SERIAL)
+    new_logbook_df = confirm_sheets(new_logbook_df, sheet_columns)
+    return new_logbook_df, {code for (code,) in unresolved}
@@ -0,0 +1,308 @@
+import functools
+import operator
+import pandas as pd
+from src.config.settings import settings
+from src.db.connections import db_manager
+from src.db.pg_copy import read_sql_copy
+from src.metrics import frame_nbytes, record_bytes_fetched, record_round_trips
+from src.pipelines.keys import SHEET_PARTS, format_serials, with_sheet_keys
+from src.pipelines.watermark import build_date_filter
+
+# Columns of public.raw_flight_log that the transforms actually use.
+RAW_FLIGHT_LOG_COLUMNS = [
+    # Sheet key and aggregates
+    "year",
+    "ac",
+    "fl_serial",
+    "date",
+    "start",
+    "end",
+    "hours",
+    "landings",
+    # Entry dimension lookups and notes
+    "pic",
+    "sic",
+    "from",
+    "to",
+    "dep",
+    "arr",
+    "customer",
+    # Entry measures renamed in transform_entry_data
+    "adult",
+    "child",
+    "infant",
+    "crew",
+    "kg",
+    "fuel_return",
+    "refuelling",
+    # Loaded into itxda_logbook_entry under their own name, when present
+    "total_weight_kg",
+    "take_off_utc",
+    "land_utc",
+    "block_on_utc",
+    "block_off_utc",
+    "taxi_time",
+    "eng1_cycle",
+    "eng2_cycle",
+    "tach_time",
+    "fuel_depart",
+    "refuel_before_departure",
+    "refuel_after_arrival",
+    "verified_by_id",
+]
+
+
+def add_sheet_keys(raw_logbook_df):
+    # The transforms join on the sheet key; formatted_serial_number is only
+    # built where it is loaded or shown
+    return with_sheet_keys(raw_logbook_df)
+
+
+def add_formatted_serial_number(raw_logbook_df):
+    return add_sheet_keys(
+        raw_logbook_df.assign(formatted_serial_number=format_serials)
+    )
+
+
+@functools.cache
+def get_raw_flight_log_columns():
+    # Project only the wanted columns that really exist in the source table
+    query = """
+    SELECT column_name
+    FROM information_schema.columns
+    WHERE table_schema = 'public' AND table_name = 'raw_flight_log'
+    """
+    available = set(
+        pd.read_sql(query, db_manager.get_postgres_engine())["column_name"]
+    )
+    return tuple(c for c in RAW_FLIGHT_LOG_COLUMNS if c in available)
+
+
+def build_raw_flight_log_query(
+    since=None, until=None, order_by_sheet=False, aircraft=None
+):
+    columns = ", ".join(f'"{c}"' for c in get_raw_flight_log_columns())
+    query = f"""
+    SELECT {columns}
+    FROM public.raw_flight_log
+    WHERE {build_date_filter(since, until)}
+    """
+    if aircraft is not None:
+        escaped = aircraft.replace("'", "''")
+        query += f"AND ac = '{escaped}'\n"
+    if order_by_sheet:
+        query += "ORDER BY year, ac, fl_serial\n"
+    return query
+
+
+def read_postgres(query, backend=None):
+    """
+    Reads `query` from Postgres with `backend` ("read_sql" or "copy"),
+    defaulting to EXTRACT_BACKEND.
+    """
+    engine = db_manager.get_postgres_engine()
+    if (backend or settings.EXTRACT_BACKEND) == "copy":
+        # Counts the bytes of the COPY output itself
+        return read_sql_copy(query, engine)
+    df = pd.read_sql(query, engine)
+    record_bytes_fetched(frame_nbytes(df))
+    return df
+
+
+def get_raw_flight_logs(since=None, until=None, backend=None, aircraft=None):
+    query = build_raw_flight_log_query(since, until, aircraft=aircraft)
+    return add_sheet_keys(read_postgres(query, backend))
+
+
+def get_raw_flight_log_aircraft(since=None, until=None):
+    # Registrations with flights in the window, e.g. to partition a backfill
+    query = f"""
+    SELECT DISTINCT ac
+    FROM public.raw_flight_log
+    WHERE {build_date_filter(since, until)} AND ac IS NOT NULL
+    ORDER BY ac
+    """
+    return read_postgres(query)["ac"].tolist()
+
+
+def _sheet_key_values(formatted_serials):
+    # (year, ac, fl_serial) row literals of `formatted_serials` for an IN list
+    keys = []
+    for serial in formatted_serials:
+        year, ac, fl_serial = serial.split("_", 2)
+        keys.append(
+            "('{}', '{}', '{}')".format(
+                *(part.replace("'", "''") for part in (year, ac, fl_serial))
+            )
+        )
+    return keys
+
+
+def get_raw_flight_log_serials(formatted_serials):
+    """
+    Returns which of `formatted_serials` still have rows in raw_flight_log,
+    whatever their date.
+    """
+    keys = _sheet_key_values(formatted_serials)
+    present = set()
+    for start in range(0, len(keys), settings.DEDUP_CHUNK_SIZE):
+        query = f"""
+        SELECT DISTINCT year, ac, fl_serial
+        FROM public.raw_flight_log
+        WHERE (year::text, ac::text, fl_serial::text)
+              IN ({", ".join(keys[start : start + settings.DEDUP_CHUNK_SIZE])})
+        """
+        present.update(format_serials(read_postgres(query)))
+    return present
+
+
+def get_raw_flight_logs_of_sheets(
+    formatted_serials, since=None, until=None, exclude=None
+):
+    """
+    Returns the legs of `formatted_serials` (at least one) dated in [since,
+    until), minus those inside the (since, until) window `exclude`: e.g. the
+    legs a backfill month doesn't have of the sheets straddling its edges.
+    """
+    keys = _sheet_key_values(formatted_serials)
+    frames = []
+    for start in range(0, len(keys), settings.DEDUP_CHUNK_SIZE):
+        query = build_raw_flight_log_query(since, until)
+        query += (
+            "AND (year::text, ac::text, fl_serial::text) "
+            f"IN ({', '.join(keys[start : start + settings.DEDUP_CHUNK_SIZE])})\n"
+        )
+        if exclude is not None:
+            query += f"AND NOT ({build_date_filter(*exclude)})\n"
+        frames.append(read_postgres(query))
+    frames = [df for df in frames if not df.empty] or frames[:1]
+    return add_sheet_keys(pd.concat(frames, ignore_index=True))
+
+
+def _stream_read_sql(query, chunk_size):
+    engine = db_manager.get_postgres_engine()
+    with engine.connect().execution_options(
+        stream_results=True, max_row_buffer=chunk_size
+    ) as connection:
+        for chunk in pd.read_sql(query, connection, chunksize=chunk_size):
+            # Each chunk is one FETCH on the server-side cursor
+            record_round_trips()
+            record_bytes_fetched(frame_nbytes(chunk))
+            yield chunk
+
+
+def iter_raw_flight_logs(since=None, until=None, chunk_size=None, backend=None):
+    """
+    Streams raw_flight_log in chunks of about `chunk_size` rows, so peak
+    memory doesn't grow with the extract window. With the read_sql backend
+    rows come through a server-side cursor; with copy, one COPY is parsed
+    chunk by chunk while it streams in.
+
+    Rows are ordered by sheet and every leg of a sheet is kept in the same
+    chunk (the trailing sheet of each chunk is carried over to the next), so
+    per-sheet aggregations stay correct when applied chunk by chunk.
+    """
+    query = build_raw_flight_log_query(since, until, order_by_sheet=True)
+    chunks = read_postgres_chunks(query, chunk_size, backend)
+    yield from regroup_by_sheet(add_sheet_keys(c) for c in chunks)
+
+
+def read_postgres_chunks(query, chunk_size=None, backend=None):
+    # Streams `query` in chunks of about `chunk_size` rows with `backend`
+    chunk_size = chunk_size or settings.EXTRACT_CHUNK_SIZE
+    if (backend or settings.EXTRACT_BACKEND) == "copy":
+        return read_sql_copy(
+            query, db_manager.get_postgres_engine(), chunksize=chunk_size
+        )
+    return _stream_read_sql(query, chunk_size)
+
+
+def regroup_by_sheet(chunks):
+    """
+    Re-chunks sheet-ordered `chunks` so every leg of a sheet lands in the
+    same chunk: the trailing sheet of each chunk is carried over to the next.
+    """
+    carry = None
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+
+        last = chunk.iloc[-1]
+        is_last_sheet = functools.reduce(
+            operator.and_, (chunk[part].eq(last[part]) for part in SHEET_PARTS)
+        )
+        carry = chunk[is_last_sheet]
+        if not is_last_sheet.all():
+            yield chunk[~is_last_sheet].reset_index(drop=True)
+
+    if carry is not None and not carry.empty:
+        yield carry.reset_index(drop=True)
+
+
+def build_sheet_aggregate_query(since=None, until=None):
+    # Postgres version of logbook_sheet.aggregate_sheets, key split included
+    return f"""
+    SELECT
+        formatted_serial_number,
+        min("date") AS flight_date,
+        min("start") AS hobbs_start,
+        max("end") AS hobbs_end,
+        coalesce(sum(hours), 0) AS total_flight_hours_decimal,
+        coalesce(sum(landings), 0) AS total_legs,
+        split_part(formatted_serial_number, '_', 2) AS aircraft_registration,
+        split_part(formatted_serial_number, '_', 3) AS raw_serial_number
+    FROM (
+        SELECT
+            year::text || '_' || ac::text || '_' || fl_serial::text
+                AS formatted_serial_number,
+            "date", "start", "end", hours, landings
+        FROM public.raw_flight_log
+        WHERE {build_date_filter(since, until)}
+    ) AS legs
+    WHERE formatted_serial_number IS NOT NULL
+    GROUP BY formatted_serial_number
+    ORDER BY formatted_serial_number
+    """
+
+
+def get_sheet_aggregates(since=None, until=None, backend=None):
+    """
+    Returns one row per logbook sheet with flights in the window, aggregated
+    by Postgres: the columns of logbook_sheet.aggregate_sheets, without
+    transferring the individual legs.
+    """
+    return read_postgres(build_sheet_aggregate_query(since, until), backend)
+
+
+def iter_sheet_aggregates(since=None, until=None, chunk_size=None, backend=None):
+    # Sheets are complete rows, so chunks need no regrouping
+    yield from read_postgres_chunks(
+        build_sheet_aggregate_query(since, until), chunk_size, backend
+    )
+
+
+# Reference dimensions, also checksummed as-is by the dimension cache
+AIRCRAFT_DETAIL_QUERY = (
+    "SELECT aircraft_registration, dev_id FROM analytics.aircraft_detail"
+)
+PILOT_QUERY = "SELECT distinct on(name) name, dev_id, id as p_id FROM analytics.pilot"
+AIRPORT_QUERY = "SELECT distinct dev_id, iata_code, icao_code FROM analytics.airport"
+CUSTOMER_QUERY = "SELECT customer, dev_id FROM analytics.customer"
+
+
+def get_aircraft_details(backend=None):
+    return read_postgres(AIRCRAFT_DETAIL_QUERY, backend)
+
+
+def get_pilots(backend=None):
+    return read_postgres(PILOT_QUERY, backend)
+
+
+def get_airports(backend=None):
+    return read_postgres(AIRPORT_QUERY, backend)
+
+
+def get_customers(backend=None):
+    return read_postgres(CUSTOMER_QUERY, backend)
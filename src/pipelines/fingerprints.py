@@ -0,0 +1,188 @@
+import os
+import tempfile
+
+import duckdb
+import numpy as np
+import pandas as pd
+from src.pipelines.extract import RAW_FLIGHT_LOG_COLUMNS
+from src.pipelines.keys import first_of_sheets, with_serials
+from src.pipelines.state import state_path
+
+STORE_FILE = os.path.join("fingerprints", "raw_flight_log.parquet")
+STORE_COLUMNS = ["formatted_serial_number", "flight_date", "fingerprint"]
+
+
+def _canonical(values):
+    # The same value hashes the same whatever dtype the extract (backend,
+    # staging, compact_dtypes) gave it: numbers as float64, the rest as
+    # objects with None for missing.
+    if pd.api.types.is_bool_dtype(values) or pd.api.types.is_numeric_dtype(values):
+        return values.astype("float64")
+    return values.astype(object).where(values.notna(), None)
+
+
+def row_fingerprints(raw_logbook_df):
+    """
+    Returns a uint64 content hash of every row of `raw_logbook_df`, over the
+    raw_flight_log columns it has.
+    """
+    columns = [c for c in RAW_FLIGHT_LOG_COLUMNS if c in raw_logbook_df.columns]
+    canonical = pd.DataFrame(
+        {column: _canonical(raw_logbook_df[column]) for column in columns}
+    )
+    return pd.util.hash_pandas_object(canonical, index=False).to_numpy()
+
+
+def sheet_fingerprints(raw_logbook_df):
+    """
+    Returns one row per formatted_serial_number: the earliest leg date
+    (YYYY-MM-DD) and a fingerprint of all its legs. Legs are summed modulo
+    2**64, so the fingerprint doesn't depend on their order.
+    """
+    sheets, codes, sheet_codes = first_of_sheets(raw_logbook_df)
+    grouped = pd.DataFrame(
+        {
+            "sheet": codes,
+            "date": raw_logbook_df["date"].to_numpy(),
+            "fingerprint": row_fingerprints(raw_logbook_df),
+        }
+    ).groupby("sheet", sort=False)
+    fingerprints = grouped.agg(
+        flight_date=("date", "min"), fingerprint=("fingerprint", "sum")
+    ).reindex(sheet_codes)
+    # The serial is formatted once per sheet
+    fingerprints["formatted_serial_number"] = (
+        with_serials(sheets)["formatted_serial_number"].astype(object).to_numpy()
+    )
+    fingerprints["flight_date"] = pd.to_datetime(
+        fingerprints["flight_date"]
+    ).dt.strftime("%Y-%m-%d")
+    # Legs without a serial aren't a sheet
+    fingerprints = fingerprints[fingerprints["formatted_serial_number"].notna()]
+    return fingerprints[STORE_COLUMNS].reset_index(drop=True)
+
+
+def diff_fingerprints(current, stored, since=None):
+    """
+    Compares the `current` sheet fingerprints of an extract against the
+    `stored` ones and returns the keys that were `inserted`, `changed` and
+    `deleted`.
+
+    A stored sheet starting before `since` only had part of its legs
+    extracted, so it is neither compared nor reported as deleted.
+    """
+    stored = stored.set_index("formatted_serial_number")
+    if since is not None:
+        partial = stored.index[stored["flight_date"] < since]
+        stored = stored.drop(partial)
+        current = current[~current["formatted_serial_number"].isin(partial)]
+
+    keys = current["formatted_serial_number"]
+    known = keys.isin(stored.index).to_numpy()
+    stored_fingerprints = stored["fingerprint"].reindex(keys[known]).to_numpy()
+    changed = current["fingerprint"].to_numpy()[known] != stored_fingerprints
+    return {
+        "inserted": keys[~known].to_numpy(),
+        "changed": keys[known][changed].to_numpy(),
+        "deleted": stored.index[~stored.index.isin(keys)].to_numpy(),
+    }
+
+
+class FingerprintStore:
+    """
+    The sheet fingerprints of everything loaded so far, in a single Parquet
+    file under PIPELINE_STATE_DIR that DuckDB queries in place, so a run
+    only reads the keys it extracted.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+
+    def _path(self):
+        # Resolved late so PIPELINE_STATE_DIR can change after import
+        return self.path or state_path(STORE_FILE)
+
+    def _query(self, sql, **frames):
+        if not os.path.exists(self._path()):
+            return pd.DataFrame(
+                {
+                    "formatted_serial_number": pd.Series(dtype=object),
+                    "flight_date": pd.Series(dtype=object),
+                    "fingerprint": pd.Series(dtype=np.uint64),
+                }
+            )
+        with duckdb.connect() as con:
+            for name, frame in frames.items():
+                con.register(name, frame)
+            return con.execute(
+                sql.format(store=f"read_parquet('{self._path()}')")
+            ).df()
+
+    def lookup(self, serials):
+        keys = pd.DataFrame(
+            {"formatted_serial_number": pd.unique(pd.Series(serials, dtype=object))}
+        )
+        return self._query(
+            "SELECT s.* FROM {store} AS s JOIN keys USING (formatted_serial_number)",
+            keys=keys,
+        )
+
+    def window(self, since, until):
+        condition = f"flight_date < '{until}'"
+        if since is not None:
+            condition = f"flight_date >= '{since}' AND {condition}"
+        return self._query(f"SELECT * FROM {{store}} WHERE {condition}")
+
+    def save(self, upserts, deleted=()):
+        """
+        Replaces the fingerprints of `upserts` (sheet_fingerprints rows) and
+        drops the `deleted` keys, rewriting the file atomically.
+        """
+        path = self._path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        dropped = pd.DataFrame(
+            {
+                "formatted_serial_number": pd.concat(
+                    [
+                        upserts["formatted_serial_number"].astype(object),
+                        pd.Series(list(deleted), dtype=object),
+                    ],
+                    ignore_index=True,
+                )
+            }
+        )
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        try:
+            with duckdb.connect() as con:
+                con.register("upserts", upserts[STORE_COLUMNS])
+                con.register("dropped", dropped)
+                kept = (
+                    f"""
+                    SELECT * FROM read_parquet('{path}')
+                    WHERE formatted_serial_number NOT IN (
+                        SELECT formatted_serial_number FROM dropped
+                    )
+                    UNION ALL
+                    """
+                    if os.path.exists(path)
+                    else ""
+                )
+                con.execute(
+                    f"""
+                    COPY (
+                        {kept}
+                        SELECT formatted_serial_number, flight_date, fingerprint
+                        FROM upserts
+                        ORDER BY flight_date
+                    ) TO '{tmp_path}' (FORMAT parquet)
+                    """
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+fingerprint_store = FingerprintStore()
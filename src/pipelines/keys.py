@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+
+# Integer stand-in for formatted_serial_number in the groupbys, dedup
+# checks and sheet lookups; the string is only built where it is loaded or
+# shown.
+SHEET_KEY = "sheet_key"
+# The raw_flight_log columns a formatted_serial_number is made of
+SHEET_PARTS = ["year", "ac", "fl_serial"]
+# A looked-up sheet's own serial, to confirm the match on SHEET_KEY
+SHEET_SERIAL = "sheet_serial"
+
+
+def format_serials(df):
+    # The formatted_serial_number of every row of `df`, from its parts
+    return (
+        df["year"].astype(str)
+        + "_"
+        + df["ac"].astype(object)
+        + "_"
+        + df["fl_serial"].astype(object)
+    )
+
+
+def with_serials(df):
+    # `df` with its formatted_serial_number, built unless already there
+    if "formatted_serial_number" in df.columns:
+        return df
+    return df.assign(formatted_serial_number=format_serials)
+
+
+def _hash_parts(year, ac, fl_serial):
+    # Years hash as float64, so 2024 (raw) and "2024" (parsed) agree
+    parts = pd.DataFrame(
+        {
+            "year": pd.to_numeric(year, errors="coerce").astype("float64"),
+            "ac": ac,
+            "fl_serial": fl_serial,
+        }
+    )
+    return pd.util.hash_pandas_object(parts, index=False).to_numpy()
+
+
+def encode_sheet_keys(serials):
+    """
+    Returns the uint64 sheet key of every formatted_serial_number in
+    `serials`: a hash of its (year, ac, fl_serial) parts, so a sheet gets
+    the same key from the raw columns as from its string (MySQL probes,
+    the fingerprint store) without a shared dictionary. Keys are not
+    exact; isin_sheets and confirm_sheets check every match against the
+    serial itself.
+    """
+    values = pd.Series(np.asarray(serials, dtype=object), dtype=object)
+    if values.empty:
+        return np.empty(0, dtype=np.uint64)
+    parts = values.str.split("_", n=2, expand=True).reindex(columns=range(3))
+    return _hash_parts(parts[0], parts[1], parts[2])
+
+
+def sheet_keys(df):
+    # The sheet keys of `df`: the extract's, or hashed from its parts, or
+    # from its serials when it has only those
+    if SHEET_KEY in df.columns:
+        return df[SHEET_KEY].to_numpy()
+    if all(part in df.columns for part in SHEET_PARTS):
+        return _hash_parts(*(df[part] for part in SHEET_PARTS))
+    return encode_sheet_keys(df["formatted_serial_number"])
+
+
+def with_sheet_keys(df):
+    if SHEET_KEY in df.columns:
+        return df
+    return df.assign(**{SHEET_KEY: sheet_keys(df)})
+
+
+def _sheet_codes(df):
+    # An exact code per distinct sheet of `df`, from its parts or serials
+    if "formatted_serial_number" in df.columns:
+        return pd.factorize(df["formatted_serial_number"])[0]
+    return df.groupby(SHEET_PARTS, sort=False, observed=True, dropna=False).ngroup()
+
+
+def first_of_sheets(df):
+    # The first row of every distinct sheet of `df` and each row's sheet code
+    codes = np.asarray(_sheet_codes(df))
+    first = ~pd.Series(codes).duplicated().to_numpy()
+    return df[first], codes, codes[first]
+
+
+def sheets_by_serial(agg_df):
+    """
+    Returns sheets aggregated per SHEET_PARTS (as columns) with their
+    formatted_serial_number first instead, sorted on it, the aircraft
+    registration and raw serial split back out of it. Those without a
+    serial (no ac or fl_serial) are dropped.
+    """
+    serials = format_serials(agg_df)
+    agg_df = agg_df.drop(columns=SHEET_PARTS)
+    agg_df.insert(0, "formatted_serial_number", serials.to_numpy())
+    agg_df = (
+        agg_df[agg_df["formatted_serial_number"].notna()]
+        .sort_values("formatted_serial_number")
+        .reset_index(drop=True)
+    )
+    parts = agg_df["formatted_serial_number"].str.split("_", expand=True)
+    agg_df["aircraft_registration"] = parts[1]
+    agg_df["raw_serial_number"] = parts[2]
+    return agg_df
+
+
+def isin_sheets(df, serials):
+    """
+    Boolean mask of the rows of `df` whose sheet is one of `serials`. Rows
+    are matched on the sheet key, then each matched sheet is confirmed by
+    its serial, formatted once per sheet.
+    """
+    matched = pd.Series(sheet_keys(df), index=df.index).isin(
+        encode_sheet_keys(serials)
+    )
+    if not matched.any():
+        return matched
+    sheets, codes, sheet_codes = first_of_sheets(df[matched])
+    confirmed = with_serials(sheets)["formatted_serial_number"].isin(
+        pd.Series(serials, dtype=object)
+    )
+    matched[matched] = np.isin(codes, sheet_codes[confirmed.to_numpy()])
+    return matched
+
+
+def unique_serials(df):
+    # The distinct formatted_serial_numbers of `df`, formatted once per sheet
+    sheets = first_of_sheets(df)[0]
+    return with_serials(sheets)["formatted_serial_number"]
+
+
+def sheet_lookup(logbook_sheet_df):
+    """
+    Returns the sheets keyed for a merge on SHEET_KEY, with their serial as
+    SHEET_SERIAL for confirm_sheets. Raises ValueError if two different
+    sheets share a key.
+    """
+    lookup = with_sheet_keys(logbook_sheet_df).rename(
+        columns={"formatted_serial_number": SHEET_SERIAL}
+    )
+    pairs = lookup[[SHEET_KEY, SHEET_SERIAL]].drop_duplicates()
+    if pairs[SHEET_KEY].duplicated().any():
+        raise ValueError("Sheet key collision between different serials")
+    return lookup
+
+
+def confirm_sheets(df, columns):
+    """
+    Returns `df`, merged with a sheet_lookup, without the sheet `columns`
+    of the rows whose sheet only shares their key (they are left empty, as
+    when no sheet matches) and without SHEET_SERIAL.
+    """
+    collided = df[SHEET_SERIAL].notna() & df[SHEET_SERIAL].ne(
+        df["formatted_serial_number"]
+    )
+    df = df.drop(columns=SHEET_SERIAL)
+    if collided.any():
+        df.loc[collided, list(columns)] = np.nan
+    return df
@@ -1,74 +1,118 @@
 import pandas as pd
 import numpy as np
-from datetime import date
+from src.db.bulk import bulk_insert, bulk_insert_returning_ids, column_arrays
 from src.db.connections import db_manager
+from src.db.transactions import (
+    ids_exist,
+    iter_frame_chunks,
+    run_in_transaction,
+    run_stage,
+)
+from src.db.queries import (
+    derived_table,
+    execute_in_chunks,
+    fetch_existing_rows,
+    fetch_in_chunks,
+    iter_chunks,
+    rows_to_frame,
+)
 from src.config.settings import settings
+from src.pipelines import duckdb_engine, logbook_sheet
+from src.pipelines.context import PipelineRunContext
+from src.pipelines.dimensions import build_lookups, resolve_airport_codes
+from src.pipelines.keys import (
+    SHEET_KEY,
+    SHEET_SERIAL,
+    confirm_sheets,
+    isin_sheets,
+    sheet_lookup,
+    unique_serials,
+    with_serials,
+    with_sheet_keys,
+)
+from src.pipelines.parallel import run_concurrently
+from src.pipelines.watermark import commit_watermark
+
+PIPELINE_NAME = "logbook_entry"
+
+
+def fetch_logbook_sheets(candidate_serials):
+    with db_manager.mysql_connection() as conn:
+        with conn.cursor() as cursor:
+            return fetch_existing_rows(
+                cursor,
+                "itxda_logbook_sheet",
+                "formatted_serial_number",
+                candidate_serials,
+                ["id", "formatted_serial_number", "flight_date"],
+            ).rename(columns={"id": "logsheet_id"})
 
 
-def get_postgres_data():
-    engine = db_manager.get_postgres_engine()
-    last_week = (date.today() - pd.DateOffset(days=8)).strftime("%Y-%m-%d")
-
-    raw_logbook_query = f"""
-    SELECT *
-    FROM public.raw_flight_log
-    WHERE date < '{last_week}'
-    """
-    raw_logbook_df = pd.read_sql(raw_logbook_query, engine).assign(
-        formatted_serial_number=lambda x: x["year"].astype(str)
-        + "_"
-        + x["ac"]
-        + "_"
-        + x["fl_serial"]
-    )
-
-    aircraft_df = pd.read_sql("SELECT * FROM analytics.aircraft_detail", engine)
-    pilot_df = pd.read_sql(
-        "SELECT distinct on(name) name, dev_id, id as p_id FROM analytics.pilot", engine
-    )
-    airport_df = pd.read_sql(
-        "SELECT distinct dev_id, iata_code, icao_code FROM analytics.airport", engine
-    )
-    customer_df = pd.read_sql("SELECT * FROM analytics.customer", engine)
-
-    return raw_logbook_df, aircraft_df, pilot_df, airport_df, customer_df
-
-
-def get_mysql_data(conn):
-    read_logbook_sheet_query = "SELECT id as logsheet_id, formatted_serial_number, flight_date FROM itxda_logbook_sheet"
-    logbook_sheet_df = pd.read_sql_query(read_logbook_sheet_query, conn)
-
-    existing_flight_query = """
-    SELECT DISTINCT formatted_serial_number
-    FROM itxda_logbook_entry
-    """
+def fetch_existing_entries(candidate_serials):
     # Note: The original notebook joined with logbook_sheet, but here we can just check logbook_entry directly if formatted_serial_number is there.
     # However, the notebook query was:
     # SELECT DISTINCT ls.formatted_serial_number FROM itxda_logbook_entry AS le JOIN itxda_logbook_sheet AS ls ON le.logsheet_id = ls.id
     # This implies formatted_serial_number is in logbook_sheet, not logbook_entry (or at least that's where they trusted it from).
     # But later in the notebook: "get_data_query = 'SELECT distinct formatted_serial_number FROM itxda_logbook_entry'"
     # So I will use the simpler query from the function `get_db_data` in the notebook.
-
-    existing_flight_df = pd.read_sql_query(existing_flight_query, conn)
-    return logbook_sheet_df, existing_flight_df
+    with db_manager.mysql_connection() as conn:
+        with conn.cursor() as cursor:
+            return fetch_existing_rows(
+                cursor,
+                "itxda_logbook_entry",
+                "formatted_serial_number",
+                candidate_serials,
+                ["formatted_serial_number"],
+            )
 
 
-def map_airport_codes(df, source_col, target_col, airport_ref_df):
-    result = df.copy()
-    icao_matches = df.merge(
-        airport_ref_df[["icao_code", "dev_id"]],
-        how="left",
-        left_on=source_col,
-        right_on="icao_code",
-    )
-    iata_matches = df.merge(
-        airport_ref_df[["iata_code", "dev_id"]],
-        how="left",
-        left_on=source_col,
-        right_on="iata_code",
+def delete_entries(cursor, serials):
+    """
+    Deletes the entries of `serials` with their schedules and schedule links
+    (schedule id == entry id), in the caller's transaction, and refreshes the
+    flight_pilot_schedule days of their pilots. Returns the deleted entry
+    ids.
+    """
+    entry_ids = rows_to_frame(
+        fetch_in_chunks(
+            cursor,
+            "SELECT id FROM itxda_logbook_entry WHERE formatted_serial_number IN ({placeholders})",
+            list(serials),
+            settings.DEDUP_CHUNK_SIZE,
+        ),
+        ["id"],
+    )["id"].astype("int64")
+    ids = entry_ids.tolist()
+    print(f"Deleting {len(ids)} entries of {len(serials)} sheets...")
+    pilot_days_df = fetch_pilot_days(cursor, ids)
+    for query in [
+        "DELETE FROM itxda_entry_x_schedule WHERE log_entry_id IN ({placeholders})",
+        "DELETE FROM itxda_schedule WHERE id IN ({placeholders})",
+        "DELETE FROM itxda_logbook_entry WHERE id IN ({placeholders})",
+    ]:
+        execute_in_chunks(cursor, query, ids, settings.DEDUP_CHUNK_SIZE)
+    # Their days now start with another flight, or not at all
+    refresh_pilot_days(cursor, pilot_days_df)
+    return entry_ids.to_numpy()
+
+
+def get_mysql_data(candidate_serials, logbook_sheet_df=None, existing_flight_df=None):
+    """
+    Returns `(logbook_sheet_df, existing_flight_df)` for `candidate_serials`,
+    fetching whichever wasn't handed over. Both probes run concurrently,
+    each on its own pooled connection.
+    """
+    tasks = {}
+    # The sheet stage hands over the sheets it resolved when both run together
+    if logbook_sheet_df is None:
+        tasks["logbook_sheet_df"] = lambda: fetch_logbook_sheets(candidate_serials)
+    if existing_flight_df is None:
+        tasks["existing_flight_df"] = lambda: fetch_existing_entries(candidate_serials)
+    results = run_concurrently(tasks) if tasks else {}
+    return (
+        results.get("logbook_sheet_df", logbook_sheet_df),
+        results.get("existing_flight_df", existing_flight_df),
     )
-    result[target_col] = icao_matches["dev_id"].combine_first(iata_matches["dev_id"])
-    return result
 
 
 def build_note(row):
@@ -86,25 +130,107 @@ def build_note(row):
     return ";".join(parts) if parts else np.nan
 
 
-def timedelta_to_hhmmss(col, accumulate_days: bool = True):
+def build_notes(df):
+    """
+    Columnar equivalent of `df.apply(build_note, axis=1)`: each part is added
+    with a mask over the whole frame instead of a Python call per row.
+    """
+    departure_missing = df["departure_id"].isna().to_numpy()
+    arrival_missing = df["arrival_id"].isna().to_numpy()
+    parts = [
+        (departure_missing, "dep_code=", "from"),
+        (departure_missing, "dep_name=", "dep"),
+        (arrival_missing, "arr_code=", "to"),
+        (arrival_missing, "arr_name=", "arr"),
+        (df["pilot_id"].isna().to_numpy(), "pilot=", "pic"),
+        (
+            (df["copilot_id"].isna() & df["sic"].notna()).to_numpy(),
+            "copilot=",
+            "sic",
+        ),
+    ]
+
+    notes = np.full(len(df), "", dtype=object)
+    for mask, prefix, column in parts:
+        if mask.any():
+            values = df[column].to_numpy(dtype=object)[mask]
+            notes[mask] += ";" + prefix + np.array(list(map(str, values)), dtype=object)
+
+    has_notes = notes != ""
+    result = np.full(len(df), np.nan, dtype=object)
+    result[has_notes] = [note[1:] for note in notes[has_notes]]
+    return pd.Series(result, index=df.index, dtype=object)
+
+
+_TWO_DIGITS = np.array([f"{i:02d}" for i in range(100)], dtype=object)
+
+
+def _zero_pad(values):
+    in_table = (values >= 0) & (values < 100)
+    padded = _TWO_DIGITS[np.where(in_table, values, 0)]
+    if not in_table.all():
+        padded[~in_table] = [f"{v:02d}" for v in values[~in_table]]
+    return padded
+
+
+def timedelta_to_hhmmss(col, accumulate_days: bool = True, keep_missing=False):
+    # Missing or unparseable values become "00:00:00", or None with
+    # `keep_missing` so they load as NULL
     s = pd.to_timedelta(col, errors="coerce")
-    if accumulate_days:
-        total_secs = s.dt.total_seconds().fillna(0).astype(int)
-        hours = total_secs // 3600
-        mins = (total_secs % 3600) // 60
-        secs = total_secs % 60
-    else:
-        total_secs = (s.dt.total_seconds() % 86400).fillna(0).astype(int)
-        hours = total_secs // 3600
-        mins = (total_secs % 3600) // 60
-        secs = total_secs % 60
-    return (
-        hours.map(lambda x: f"{int(x):02d}")
-        + ":"
-        + mins.map(lambda x: f"{int(x):02d}")
-        + ":"
-        + secs.map(lambda x: f"{int(x):02d}")
+    total_secs = s.dt.total_seconds()
+    if not accumulate_days:
+        total_secs = total_secs % 86400
+    total_secs = total_secs.fillna(0).astype(int).to_numpy()
+
+    hours = _zero_pad(total_secs // 3600)
+    mins = _zero_pad((total_secs % 3600) // 60)
+    secs = _zero_pad(total_secs % 60)
+    formatted = pd.Series(
+        hours + ":" + mins + ":" + secs, index=s.index, name=s.name, dtype=object
     )
+    if keep_missing:
+        formatted = formatted.where(s.notna().to_numpy(), None)
+    return formatted
+
+
+def _map_ids(keys, ids):
+    # On a categorical (see compact_dtypes) Series.map looks up each category
+    # once, but keeps the result categorical when every key resolves.
+    mapped = keys.map(ids)
+    if isinstance(mapped.dtype, pd.CategoricalDtype):
+        mapped = pd.Series(mapped.to_numpy(), index=mapped.index)
+    return mapped
+
+
+def resolve_entry_ids(entries_df, lookups, logbook_sheet_df):
+    """
+    Adds the dimension ids (aircraft, flight type, pilots, airports) and the
+    logbook sheet columns to `entries_df`. Returns `(df, unresolved airport
+    codes)`.
+    """
+    # Map aircraft, customer/flight type and pilots
+    aircraft_ids = lookups["aircraft_detail"]
+    customer_ids = lookups["customer"]
+    pilot_ids = lookups["pilot"]
+    new_logbook_df = entries_df.assign(
+        aircraft_id=_map_ids(entries_df["ac"], aircraft_ids),
+        flight_type_id=_map_ids(entries_df["customer"], customer_ids),
+        pilot_id=_map_ids(entries_df["pic"], pilot_ids),
+        copilot_id=_map_ids(entries_df["sic"], pilot_ids),
+    )
+
+    # Map airports (ICAO, then IATA) for both ends of the leg in one lookup
+    unresolved_airports = resolve_airport_codes(
+        new_logbook_df,
+        {"from": "departure_id", "to": "arrival_id"},
+        lookups["airport"],
+    )
+
+    # Merge with logbook sheet
+    sheets = sheet_lookup(logbook_sheet_df).drop(columns=["flight_date"])
+    new_logbook_df = new_logbook_df.merge(sheets, how="left", on=SHEET_KEY)
+    sheet_columns = sheets.columns.difference([SHEET_KEY, SHEET_SERIAL])
+    return confirm_sheets(new_logbook_df, sheet_columns), unresolved_airports
 
 
 def transform_entry_data(
@@ -115,65 +241,42 @@ def transform_entry_data(
     pilot_df,
     airport_df,
     logbook_sheet_df,
+    lookups=None,
 ):
-    existing_serials = set(existing_flight_df["formatted_serial_number"].unique())
-    input_raw_logbook_df = raw_logbook_df[
-        ~raw_logbook_df["formatted_serial_number"].isin(existing_serials)
-    ].copy()
+    # `lookups` are the key -> dev_id Series precomputed by the dimension
+    # cache; built here from the frames when called on its own.
+    if lookups is None:
+        lookups = build_lookups(
+            {
+                "aircraft_detail": aircraft_df,
+                "customer": customer_df,
+                "pilot": pilot_df,
+                "airport": airport_df,
+            }
+        )
+
+    raw_logbook_df = with_sheet_keys(raw_logbook_df)
+    # Only the new legs get the serial they are loaded with
+    input_raw_logbook_df = with_serials(
+        raw_logbook_df[
+            ~isin_sheets(raw_logbook_df, existing_flight_df["formatted_serial_number"])
+        ]
+    ).copy()
 
     print(f"New flights found: {len(input_raw_logbook_df)}")
     if input_raw_logbook_df.empty:
         return pd.DataFrame()
 
-    new_logbook_df = input_raw_logbook_df.copy()
-
-    # Map aircraft
-    new_logbook_df = new_logbook_df.merge(
-        aircraft_df[["aircraft_registration", "dev_id"]],
-        how="left",
-        left_on="ac",
-        right_on="aircraft_registration",
-    ).rename({"dev_id": "aircraft_id"}, axis=1)
-
-    # Map customer/flight type
-    new_logbook_df = new_logbook_df.merge(
-        customer_df[["dev_id", "customer"]], how="left", on="customer"
-    ).rename({"dev_id": "flight_type_id"}, axis=1)
-
-    # Map pilots
-    new_logbook_df = (
-        new_logbook_df.merge(
-            pilot_df[["name", "dev_id"]],
-            how="left",
-            left_on="pic",
-            right_on="name",
-            suffixes=("", "_pic"),
+    if settings.TRANSFORM_ENGINE == "duckdb":
+        new_logbook_df, unresolved_airports = duckdb_engine.resolve_entry_ids(
+            input_raw_logbook_df, lookups, logbook_sheet_df
         )
-        .rename({"dev_id": "pilot_id"}, axis=1)
-        .drop(columns=["name"], errors="ignore")
-        .merge(
-            pilot_df[["name", "dev_id"]],
-            how="left",
-            left_on="sic",
-            right_on="name",
-            suffixes=("", "_sic"),
+    else:
+        new_logbook_df, unresolved_airports = resolve_entry_ids(
+            input_raw_logbook_df, lookups, logbook_sheet_df
         )
-        .rename({"dev_id": "copilot_id"}, axis=1)
-        .drop(columns=["name"], errors="ignore")
-    )
-
-    # Map airports
-    new_logbook_df = map_airport_codes(
-        new_logbook_df, "from", "departure_id", airport_df
-    )
-    new_logbook_df = map_airport_codes(new_logbook_df, "to", "arrival_id", airport_df)
-
-    # Merge with logbook sheet
-    new_logbook_df = new_logbook_df.merge(
-        logbook_sheet_df,
-        how="left",
-        on="formatted_serial_number",
-    ).drop(columns=["flight_date"])
+    if unresolved_airports:
+        print(f"Unresolved airport codes: {sorted(unresolved_airports, key=str)}")
 
     # Rename columns
     new_logbook_df.rename(
@@ -200,15 +303,70 @@ def transform_entry_data(
         created_by_user_id=settings.DATA_ANALYST_USER_ID,
     )
 
-    new_logbook_df["notes"] = new_logbook_df.apply(build_note, axis=1)
+    new_logbook_df["notes"] = build_notes(new_logbook_df)
 
     return new_logbook_df
 
 
-def load_entries_and_schedules(new_logbook_df):
+def _delete_replaced_entries(serials):
+    if len(serials) and not settings.IS_DEBUGGING:
+        run_in_transaction(lambda cursor: delete_entries(cursor, serials))
+
+
+def _load_entry_chunk(cursor, insert_entry_df, replace_serials):
+    replaced = insert_entry_df["formatted_serial_number"].unique()
+    replaced = replaced[pd.Series(replaced).isin(replace_serials).to_numpy()]
+    if len(replaced):
+        run_stage(cursor, "replaced", lambda: delete_entries(cursor, replaced))
+
+    entry_ids = run_stage(
+        cursor,
+        "entries",
+        lambda: bulk_insert_returning_ids(cursor, "itxda_logbook_entry", insert_entry_df),
+    )
+
+    # Schedules are built from the rows just inserted, keyed by the
+    # captured entry ids (schedule id == entry id).
+    schedule_values_df = build_schedules(insert_entry_df, entry_ids)
+    run_stage(
+        cursor,
+        "schedules",
+        lambda: bulk_insert(cursor, "itxda_schedule", schedule_values_df),
+    )
+
+    # Link table
+    # Since id == id, we just insert (id, id)
+    entry_schedule_df = pd.DataFrame(
+        {"log_entry_id": entry_ids, "schedule_id": entry_ids}
+    )
+    run_stage(
+        cursor,
+        "links",
+        lambda: bulk_insert(cursor, "itxda_entry_x_schedule", entry_schedule_df),
+    )
+    if settings.INCREMENTAL_POST_PROCESS:
+        run_stage(
+            cursor, "post_process", lambda: post_process_rows(cursor, entry_ids)
+        )
+    return entry_ids
+
+
+def load_entries_and_schedules(new_logbook_df, replace_serials=()):
+    """
+    Inserts the entries of `new_logbook_df` with their schedules and
+    schedule links, and returns the entry ids.
+
+    Entries are committed in transactions of about LOAD_COMMIT_ROWS rows,
+    each holding whole sheets with their schedules and links, so an
+    interrupted load never leaves an entry without its schedule and the
+    next run's dedup picks up exactly the sheets that are missing. The
+    previous entries of `replace_serials` are deleted in the transaction
+    that inserts their replacements.
+    """
     if new_logbook_df.empty:
         print("No new entries to load.")
-        return
+        _delete_replaced_entries(replace_serials)
+        return np.empty(0, dtype=np.int64)
 
     logbook_df_columns = [
         "raw_serial_number",
@@ -266,149 +424,199 @@ def load_entries_and_schedules(new_logbook_df):
     )
     insert_entry_df["fuel_uplift"] = insert_entry_df["fuel_uplift"].fillna(0)
 
-    insert_entry_query = f"INSERT INTO itxda_logbook_entry ({', '.join(insert_columns)}) VALUES ({', '.join(['%s'] * len(insert_columns))})"
-    insert_entry_values = (
-        insert_entry_df.replace({pd.NA: None, np.nan: None}).to_numpy().tolist()
+    if settings.IS_DEBUGGING:
+        print(f"Skipping insert of {len(insert_entry_df)} entries.")
+        return np.empty(0, dtype=np.int64)
+
+    # Replaced sheets none of whose corrected legs can be loaded
+    loaded_serials = set(insert_entry_df["formatted_serial_number"])
+    _delete_replaced_entries(
+        [s for s in replace_serials if s not in loaded_serials]
     )
+    if insert_entry_df.empty:
+        print("Skipping insert of 0 entries.")
+        return np.empty(0, dtype=np.int64)
 
-    with db_manager.mysql_connection() as conn:
-        with conn.cursor() as cursor:
-            if not settings.IS_DEBUGGING:
-                print(
-                    f"Inserting {len(insert_entry_values)} entries into itxda_logbook_entry..."
-                )
-                cursor.executemany(insert_entry_query, insert_entry_values)
-                conn.commit()
-
-            # Now handle schedules
-            # We need to fetch the IDs of the inserted entries.
-            # The notebook does this by querying the latest created entries.
-            # "SELECT * FROM itxda_logbook_entry WHERE DATE(created) = (SELECT MAX(DATE(created)) FROM itxda_logbook_entry)"
-            # This is risky if other processes are inserting, but I'll follow the notebook logic for now.
-
-            entry_data_query = """
-            SELECT * FROM itxda_logbook_entry
-            WHERE DATE(created) = (
-                SELECT MAX(DATE(created)) FROM itxda_logbook_entry
-            )
-            """
-            test_entry_df = pd.read_sql(entry_data_query, conn)
+    print(
+        f"Inserting {len(insert_entry_df)} entries with their schedules "
+        "into itxda_logbook_entry..."
+    )
+    entry_ids = [
+        run_in_transaction(
+            lambda cursor, chunk=chunk: _load_entry_chunk(
+                cursor, chunk, replace_serials
+            ),
+            verify=lambda cursor, ids: ids_exist(cursor, "itxda_logbook_entry", ids),
+        )
+        for chunk in iter_frame_chunks(insert_entry_df, key="formatted_serial_number")
+    ]
+    return np.concatenate(entry_ids)
+
+
+def build_schedules(insert_entry_df, entry_ids):
+    schedule_source_df = insert_entry_df.reindex(
+        columns=[
+            "flight_date",
+            "take_off_utc",
+            "land_utc",
+            "flight_hours_decimal",
+            "flight_type_id",
+            "departure_id",
+            "arrival_id",
+            "aircraft_id",
+            "pilot_id",
+            "copilot_id",
+            "notes",
+        ]
+    ).assign(id=entry_ids)
+
+    # Raw times arrive as time objects or strings, not the timedeltas a
+    # MySQL TIME column reads back as, so go through their text form. A time
+    # that is missing or can't be parsed stays NULL rather than midnight.
+    for column in ["take_off_utc", "land_utc"]:
+        schedule_source_df[column] = timedelta_to_hhmmss(
+            schedule_source_df[column].astype("string"), keep_missing=True
+        )
 
-            if test_entry_df.empty:
-                print("No entries found after insertion.")
-                return
+    schedule_columns = [
+        "id",
+        "flight_date_lt",
+        "etd_utc",
+        "eta_utc",
+        "flight_time_decimal",
+        "flight_type_id",
+        "departure_id",
+        "arrival_id",
+        "aircraft_id",
+        "pilot_id",
+        "copilot_id",
+        "notes",
+    ]
+
+    return schedule_source_df.rename(
+        columns={
+            "flight_date": "flight_date_lt",
+            "take_off_utc": "etd_utc",
+            "land_utc": "eta_utc",
+            "flight_hours_decimal": "flight_time_decimal",
+        }
+    )[schedule_columns]
 
-            test_entry_df["take_off_utc"] = timedelta_to_hhmmss(
-                test_entry_df["take_off_utc"]
-            )
-            test_entry_df["land_utc"] = timedelta_to_hhmmss(test_entry_df["land_utc"])
-
-            insert_schedule_df = (
-                test_entry_df[
-                    [
-                        "id",
-                        "flight_date",
-                        "take_off_utc",
-                        "land_utc",
-                        "flight_hours_decimal",
-                        "flight_type_id",
-                        "departure_id",
-                        "arrival_id",
-                        "aircraft_id",
-                        "pilot_id",
-                        "copilot_id",
-                        "notes",
-                    ]
-                ]
-                .copy()
-                .rename(
-                    columns={
-                        "flight_date": "flight_date_lt",
-                        "take_off_utc": "etd_utc",
-                        "land_utc": "eta_utc",
-                        "flight_hours_decimal": "flight_time_decimal",
-                    }
-                )
-            )
 
-            schedule_columns = [
-                "id",
-                "flight_date_lt",
-                "etd_utc",
-                "eta_utc",
-                "flight_time_decimal",
-                "flight_type_id",
-                "departure_id",
-                "arrival_id",
-                "aircraft_id",
-                "pilot_id",
-                "copilot_id",
-                "notes",
-            ]
-
-            schedule_insert_sql = f"""
-            INSERT INTO itxda_schedule ({", ".join(schedule_columns)})
-            VALUES ({", ".join(["%s"] * len(schedule_columns))})
+def run_post_process_updates(entry_ids=None, sheet_ids=None):
+    """
+    Without ids every update sweeps its whole table. Given `entry_ids` and
+    `sheet_ids` (schedule ids equal entry ids), the updates only touch those
+    rows, committed every LOAD_COMMIT_ROWS ids (see post_process_rows).
+    Every update can be redone, so each transaction is simply retried on a
+    deadlock or lost connection.
+    """
+    if entry_ids is None and sheet_ids is None:
+        queries = [
             """
+            UPDATE itxda_schedule AS is2
+            LEFT JOIN flight_airport dep_fa ON dep_fa.id = is2.departure_id AND dep_fa.tz_offset IS NOT NULL
+            LEFT JOIN flight_airport arr_fa ON arr_fa.id = is2.arrival_id AND arr_fa.tz_offset IS NOT NULL
+            SET
+                is2.etd_lt = SEC_TO_TIME(MOD(TIME_TO_SEC(is2.etd_utc) + dep_fa.tz_offset * 3600, 86400)),
+                is2.eta_lt = SEC_TO_TIME(MOD(TIME_TO_SEC(is2.eta_utc) + arr_fa.tz_offset * 3600, 86400))
+            WHERE (is2.etd_utc IS NOT NULL OR is2.eta_utc IS NOT NULL)
+              AND (is2.etd_lt IS NULL or is2.eta_lt IS NULL)
+              AND (is2.departure_id IS NOT NULL or is2.arrival_id IS NOT NULL);
+            """,
+            "UPDATE itxda_logbook_entry SET is_locked = 1 WHERE is_locked != 1;",
+            """
+            UPDATE itxda_schedule ixs
+            JOIN flight_airport fa ON fa.id = ixs.departure_id
+            SET ixs.base_id = fa.base, ixs.area_id = fa.area;
+            """,
+            "UPDATE itxda_logbook_sheet ils SET is_verified = 1 WHERE ils.is_verified != 1;",
+            "UPDATE itxda_logbook_entry ile SET is_verified = 1 WHERE ile.is_verified != 1;",
+            "UPDATE itxda_schedule is2 SET flight_status_id = 1;",
+        ]
+
+        for q in queries:
+            run_in_transaction(lambda cursor, q=q: cursor.execute(q))
+        run_in_transaction(rebuild_flight_pilot_schedule)
+        return
 
-            schedule_values_df = insert_schedule_df[schedule_columns]
-            insert_schedule_values = (
-                schedule_values_df.replace({pd.NA: None, np.nan: None})
-                .to_numpy()
-                .tolist()
-            )
+    entry_ids = () if entry_ids is None else entry_ids
+    sheet_ids = () if sheet_ids is None else sheet_ids
+    for chunk in iter_chunks(entry_ids, settings.LOAD_COMMIT_ROWS):
+        run_in_transaction(
+            lambda cursor, chunk=chunk: post_process_rows(cursor, entry_ids=chunk)
+        )
+    for chunk in iter_chunks(sheet_ids, settings.LOAD_COMMIT_ROWS):
+        run_in_transaction(
+            lambda cursor, chunk=chunk: post_process_rows(cursor, sheet_ids=chunk)
+        )
 
-            if not settings.IS_DEBUGGING:
-                print(f"Inserting {len(insert_schedule_values)} schedules...")
-                cursor.executemany(schedule_insert_sql, insert_schedule_values)
-                conn.commit()
 
-                # Link table
-                entry_schedule_insert_sql = """
-                INSERT INTO itxda_entry_x_schedule (log_entry_id, schedule_id)
-                VALUES (%s, %s)
+# The post-load updates of the entries and schedules of given entry ids
+# (schedule id == entry id)
+SCOPED_POST_PROCESS_QUERIES = [
+    """
+    UPDATE itxda_schedule AS is2
+    LEFT JOIN flight_airport dep_fa ON dep_fa.id = is2.departure_id AND dep_fa.tz_offset IS NOT NULL
+    LEFT JOIN flight_airport arr_fa ON arr_fa.id = is2.arrival_id AND arr_fa.tz_offset IS NOT NULL
+    SET
+        is2.etd_lt = SEC_TO_TIME(MOD(TIME_TO_SEC(is2.etd_utc) + dep_fa.tz_offset * 3600, 86400)),
+        is2.eta_lt = SEC_TO_TIME(MOD(TIME_TO_SEC(is2.eta_utc) + arr_fa.tz_offset * 3600, 86400))
+    WHERE is2.id IN ({placeholders})
+      AND (is2.etd_utc IS NOT NULL OR is2.eta_utc IS NOT NULL)
+      AND (is2.etd_lt IS NULL or is2.eta_lt IS NULL)
+      AND (is2.departure_id IS NOT NULL or is2.arrival_id IS NOT NULL);
+    """,
+    "UPDATE itxda_logbook_entry SET is_locked = 1 WHERE id IN ({placeholders}) AND is_locked != 1;",
+    """
+    UPDATE itxda_schedule ixs
+    JOIN flight_airport fa ON fa.id = ixs.departure_id
+    SET ixs.base_id = fa.base, ixs.area_id = fa.area
+    WHERE ixs.id IN ({placeholders});
+    """,
+    "UPDATE itxda_logbook_entry ile SET is_verified = 1 WHERE ile.id IN ({placeholders}) AND ile.is_verified != 1;",
+    "UPDATE itxda_schedule is2 SET flight_status_id = 1 WHERE is2.id IN ({placeholders});",
+]
+
+
+def post_process_rows(cursor, entry_ids=(), sheet_ids=()):
+    """
+    The post-load updates of the entries `entry_ids`, their schedules and
+    pilot days, and of the sheets `sheet_ids`, in the caller's transaction.
+    With INCREMENTAL_POST_PROCESS the loads run it in the transaction that
+    inserts the rows, so a committed row is always post-processed.
+    """
+    entry_ids = [int(i) for i in entry_ids]
+    for query in SCOPED_POST_PROCESS_QUERIES:
+        execute_in_chunks(cursor, query, entry_ids, settings.DEDUP_CHUNK_SIZE)
+    logbook_sheet.verify_sheets(cursor, sheet_ids)
+    if entry_ids:
+        refresh_flight_pilot_schedule(cursor, entry_ids)
+
+
+def has_unprocessed_rows():
+    # Entries or sheets a failed run loaded but never post-processed
+    with db_manager.mysql_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
                 """
-                # Since id == id, we just insert (id, id)
-                entry_schedule_values = [
-                    (x, x) for x in insert_schedule_df["id"].values
-                ]
-                cursor.executemany(entry_schedule_insert_sql, entry_schedule_values)
-                conn.commit()
-
-            run_post_process_updates(cursor, conn)
-
-
-def run_post_process_updates(cursor, conn):
-    queries = [
-        """
-        UPDATE itxda_schedule AS is2
-        LEFT JOIN flight_airport dep_fa ON dep_fa.id = is2.departure_id AND dep_fa.tz_offset IS NOT NULL
-        LEFT JOIN flight_airport arr_fa ON arr_fa.id = is2.arrival_id AND arr_fa.tz_offset IS NOT NULL
-        SET
-            is2.etd_lt = SEC_TO_TIME(MOD(TIME_TO_SEC(is2.etd_utc) + dep_fa.tz_offset * 3600, 86400)),
-            is2.eta_lt = SEC_TO_TIME(MOD(TIME_TO_SEC(is2.eta_utc) + arr_fa.tz_offset * 3600, 86400))
-        WHERE (is2.etd_utc IS NOT NULL OR is2.eta_utc IS NOT NULL)
-          AND (is2.etd_lt IS NULL or is2.eta_lt IS NULL)
-          AND (is2.departure_id IS NOT NULL or is2.arrival_id IS NOT NULL);
-        """,
-        "UPDATE itxda_logbook_entry SET is_locked = 1 WHERE is_locked != 1;",
-        """
-        UPDATE itxda_schedule ixs
-        JOIN flight_airport fa ON fa.id = ixs.departure_id
-        SET ixs.base_id = fa.base, ixs.area_id = fa.area;
-        """,
-        "UPDATE itxda_logbook_sheet ils SET is_verified = 1 WHERE ils.is_verified != 1;",
-        "UPDATE itxda_logbook_entry ile SET is_verified = 1 WHERE ile.is_verified != 1;",
-        "UPDATE itxda_schedule is2 SET flight_status_id = 1;",
-    ]
+                SELECT
+                    EXISTS (SELECT 1 FROM itxda_logbook_entry WHERE is_locked != 1)
+                    OR EXISTS (SELECT 1 FROM itxda_logbook_sheet WHERE is_verified != 1)
+                    AS pending
+                """
+            )
+            row = cursor.fetchone()
+    return bool(row["pending"] if isinstance(row, dict) else row[0])
 
-    for q in queries:
-        cursor.execute(q)
-    conn.commit()
 
-    # Complex insert for flight_pilot_schedule
-    cursor.execute("TRUNCATE TABLE flight_pilot_schedule;")
-    conn.commit()
+def rebuild_flight_pilot_schedule(cursor):
+    # Complex insert for flight_pilot_schedule. DELETE rather than TRUNCATE,
+    # which commits on its own: until the caller commits, other sessions
+    # still see the previous rows and a failure leaves them in place.
+    run_stage(
+        cursor, "clear", lambda: cursor.execute("DELETE FROM flight_pilot_schedule;")
+    )
 
     update_flight_pilot_schedule_query = """
     INSERT INTO flight_pilot_schedule (pilot, duty_date, base, status, notes, created)
@@ -442,28 +650,229 @@ def run_post_process_updates(cursor, conn):
             AND fps.duty_date = u.flight_date_lt
       );
     """
-    cursor.execute(update_flight_pilot_schedule_query)
-    conn.commit()
+    run_stage(
+        cursor, "rebuild", lambda: cursor.execute(update_flight_pilot_schedule_query)
+    )
 
 
-def run_logbook_entry_pipeline():
-    print("Running Logbook Entry Pipeline...")
-    raw_logs, aircraft_df, pilot_df, airport_df, customer_df = get_postgres_data()
+def refresh_flight_pilot_schedule(cursor, schedule_ids):
+    """
+    Incremental counterpart of rebuild_flight_pilot_schedule for the
+    (pilot, duty_date) pairs touched by `schedule_ids`. Runs in the caller's
+    transaction.
+    """
+    refresh_pilot_days(cursor, fetch_pilot_days(cursor, schedule_ids))
 
-    with db_manager.mysql_connection() as conn:
-        logbook_sheet_df, existing_flight_df = get_mysql_data(conn)
 
+def fetch_pilot_days(cursor, schedule_ids):
+    # The distinct (pilot, duty_date) pairs flown, as pilot or copilot, by
+    # the schedules `schedule_ids`
+    touched_df = rows_to_frame(
+        fetch_in_chunks(
+            cursor,
+            """
+            SELECT pilot_id, copilot_id, flight_date_lt
+            FROM itxda_schedule
+            WHERE id IN ({placeholders})
+            """,
+            [int(i) for i in schedule_ids],
+            settings.DEDUP_CHUNK_SIZE,
+        ),
+        ["pilot_id", "copilot_id", "flight_date_lt"],
+    )
+    return (
+        touched_df.melt(id_vars="flight_date_lt", value_name="pilot")
+        .dropna(subset=["pilot", "flight_date_lt"])
+        .rename(columns={"flight_date_lt": "duty_date"})[["pilot", "duty_date"]]
+        .astype({"pilot": "int64"})
+        .drop_duplicates()
+    )
+
+
+def refresh_pilot_days(cursor, pairs_df):
+    """
+    Recomputes the first departure of the day for the (pilot, duty_date)
+    pairs of `pairs_df`, then updates the existing rows' base, inserts the
+    missing ones and deletes those left without a departure. The rest of the
+    table is left as is and is never empty.
+    """
+    if pairs_df.empty:
+        return
+
+    pilots = pairs_df["pilot"].unique().tolist()
+    first_departure_rows = []
+    for dates in iter_chunks(pairs_df["duty_date"].unique(), settings.DEDUP_CHUNK_SIZE):
+        pilot_placeholders = ", ".join(["%s"] * len(pilots))
+        date_placeholders = ", ".join(["%s"] * len(dates))
+        cursor.execute(
+            f"""
+            SELECT u.pilot, u.flight_date_lt AS duty_date, u.base_id AS base
+            FROM (
+                SELECT
+                    p.pilot,
+                    p.flight_date_lt,
+                    p.base_id,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY p.pilot, p.flight_date_lt
+                        ORDER BY p.etd_lt ASC
+                    ) AS rn
+                FROM (
+                    SELECT pilot_id AS pilot, flight_date_lt, etd_lt, base_id
+                    FROM itxda_schedule
+                    WHERE pilot_id IN ({pilot_placeholders})
+                      AND flight_date_lt IN ({date_placeholders})
+                      AND etd_lt IS NOT NULL
+                    UNION ALL
+                    SELECT copilot_id AS pilot, flight_date_lt, etd_lt, base_id
+                    FROM itxda_schedule
+                    WHERE copilot_id IN ({pilot_placeholders})
+                      AND flight_date_lt IN ({date_placeholders})
+                      AND etd_lt IS NOT NULL
+                ) p
+            ) u
+            WHERE u.rn = 1
+            """,
+            [*pilots, *dates, *pilots, *dates],
+        )
+        first_departure_rows.extend(cursor.fetchall())
+
+    # The pilot/date IN lists over-select; keep only the touched pairs
+    first_departure_df = rows_to_frame(
+        first_departure_rows, ["pilot", "duty_date", "base"]
+    ).merge(pairs_df, on=["pilot", "duty_date"])
+    first_departure_df["base"] = first_departure_df["base"].astype("Int64")
+    values = column_arrays(first_departure_df)
+
+    for chunk in iter_chunks(list(zip(*values)), settings.BULK_INSERT_BATCH_SIZE):
+        derived_sql, params = derived_table(chunk, ["pilot", "duty_date", "base"])
+        cursor.execute(
+            f"""
+            UPDATE flight_pilot_schedule fps
+            JOIN ({derived_sql}) v
+              ON v.pilot = fps.pilot AND v.duty_date = fps.duty_date
+            SET fps.base = v.base
+            """,
+            params,
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO flight_pilot_schedule (pilot, duty_date, base, status, notes, created)
+            SELECT v.pilot, v.duty_date, v.base, 2, NULL, CURRENT_TIMESTAMP
+            FROM ({derived_sql}) v
+            WHERE NOT EXISTS (
+                SELECT 1
+                FROM flight_pilot_schedule fps
+                WHERE fps.pilot = v.pilot
+                  AND fps.duty_date = v.duty_date
+            )
+            """,
+            params,
+        )
+
+    # Days whose flights were all deleted, or no longer have a departure time
+    gone_df = pairs_df.merge(
+        first_departure_df[["pilot", "duty_date"]], how="left", indicator=True
+    )
+    gone_df = gone_df[gone_df["_merge"] == "left_only"][["pilot", "duty_date"]]
+    for chunk in iter_chunks(
+        list(zip(*column_arrays(gone_df))), settings.BULK_INSERT_BATCH_SIZE
+    ):
+        derived_sql, params = derived_table(chunk, ["pilot", "duty_date"])
+        cursor.execute(
+            f"""
+            DELETE fps FROM flight_pilot_schedule fps
+            JOIN ({derived_sql}) v
+              ON v.pilot = fps.pilot AND v.duty_date = fps.duty_date
+            """,
+            params,
+        )
+
+
+def process_logbook_entry_chunk(
+    raw_logs,
+    context,
+    logbook_sheet_df=None,
+    existing_flight_df=None,
+    changed_serials=(),
+):
+    """
+    Transforms and loads the entries of one chunk of raw flight logs,
+    recording the ids of the inserted entries on the context. Entries of
+    `changed_serials` are replaced.
+    """
+    with context.metrics.stage(PIPELINE_NAME, "extract") as metrics:
+        logbook_sheet_df, existing_flight_df = get_mysql_data(
+            unique_serials(raw_logs), logbook_sheet_df, existing_flight_df
+        )
+        metrics.add(rows_out=len(existing_flight_df))
+    if len(changed_serials):
+        existing_flight_df = existing_flight_df[
+            ~isin_sheets(existing_flight_df, changed_serials)
+        ]
+
+    with context.metrics.stage(PIPELINE_NAME, "transform") as metrics:
         new_logbook_df = transform_entry_data(
             raw_logs,
             existing_flight_df,
-            aircraft_df,
-            customer_df,
-            pilot_df,
-            airport_df,
+            context.get_aircraft_details(),
+            context.get_customers(),
+            context.get_pilots(),
+            context.get_airports(),
             logbook_sheet_df,
+            context.get_lookups(),
         )
+        metrics.add(rows_in=len(raw_logs), rows_out=len(new_logbook_df))
+
+    with context.metrics.stage(PIPELINE_NAME, "load") as metrics:
+        entry_ids = load_entries_and_schedules(new_logbook_df, changed_serials)
+        metrics.add(rows_in=len(new_logbook_df), rows_out=len(entry_ids))
 
-        load_entries_and_schedules(new_logbook_df)
+    context.record_inserted_ids("itxda_logbook_entry", entry_ids)
+    context.record_progress(
+        PIPELINE_NAME, new_entries=len(new_logbook_df), inserted=len(entry_ids)
+    )
+
+
+def finish_post_processing(inserted):
+    """
+    With INCREMENTAL_POST_PROCESS off, sweeps every table once `inserted`
+    rows were loaded or a failed run left rows unprocessed. Otherwise every
+    load transaction already post-processed its own rows.
+    """
+    if settings.INCREMENTAL_POST_PROCESS or settings.IS_DEBUGGING:
+        return
+    if inserted or has_unprocessed_rows():
+        run_post_process_updates()
+
+
+def finish_logbook_entry_pipeline(context):
+    inserted = len(context.get_inserted_ids("itxda_logbook_entry")) + len(
+        context.get_inserted_ids("itxda_logbook_sheet")
+    )
+    with context.metrics.stage(PIPELINE_NAME, "post_process") as metrics:
+        finish_post_processing(inserted)
+        metrics.add(rows_in=inserted)
+
+    # Debug runs skip the inserts, so they must not move the watermark either.
+    if not settings.IS_DEBUGGING:
+        commit_watermark(PIPELINE_NAME, context.until)
+
+
+def run_logbook_entry_pipeline(context=None):
+    print("Running Logbook Entry Pipeline...")
+    if context is None:
+        context = PipelineRunContext.for_pipelines(PIPELINE_NAME)
+    print(
+        f"Extracting raw flight logs from {context.since or 'the beginning'} to {context.until}"
+    )
+    context.prefetch()
+    try:
+        for raw_logs in context.iter_raw_flight_logs():
+            process_logbook_entry_chunk(raw_logs, context, context.logbook_sheet_df)
+    finally:
+        context.cancel_prefetch()
+
+    finish_logbook_entry_pipeline(context)
     print("Logbook Entry Pipeline Finished.")
 
 
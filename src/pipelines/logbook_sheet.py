@@ -1,58 +1,50 @@
+import numpy as np
 import pandas as pd
-from datetime import date
+from src.db.bulk import bulk_insert_returning_ids, column_arrays
 from src.db.connections import db_manager
+from src.db.transactions import ids_exist, iter_frame_chunks, run_in_transaction
+from src.db.queries import (
+    derived_table,
+    execute_in_chunks,
+    fetch_existing_rows,
+    iter_chunks,
+)
 from src.config.settings import settings
+from src.pipelines import duckdb_engine
+from src.pipelines.context import PipelineRunContext
+from src.pipelines.dimensions import build_lookups
+from src.pipelines.keys import SHEET_PARTS, isin_sheets, sheets_by_serial
+from src.pipelines.watermark import commit_watermark
 import pymysql
 
+PIPELINE_NAME = "logbook_sheet"
 
-def get_raw_flight_logs():
-    last_week = (date.today() - pd.DateOffset(days=8)).strftime("%Y-%m-%d")
-    query = f"""
-    SELECT *
-    FROM public.raw_flight_log
-    WHERE date < '{last_week}'
-    """
-    return pd.read_sql(query, db_manager.get_postgres_engine())
 
+def aggregate_sheets(raw_logbook_df):
+    # Aggregate on the serial's parts; the string is built once per sheet
+    agg_df = raw_logbook_df.groupby(
+        SHEET_PARTS, sort=False, observed=True, dropna=False
+    ).agg(
+        flight_date=("date", "min"),
+        hobbs_start=("start", "min"),
+        hobbs_end=("end", "max"),
+        total_flight_hours_decimal=("hours", "sum"),
+        total_legs=("landings", "sum"),
+    )
+    return sheets_by_serial(agg_df.reset_index())
 
-def get_aircraft_details():
-    query = """
-    SELECT *
-    FROM analytics.aircraft_detail
-    """
-    return pd.read_sql(query, db_manager.get_postgres_engine())
 
+def transform_logbook_data(raw_logbook_df, aircraft_df, aircraft_ids=None):
+    if settings.TRANSFORM_ENGINE == "duckdb":
+        agg_df = duckdb_engine.aggregate_sheets(raw_logbook_df)
+    else:
+        agg_df = aggregate_sheets(raw_logbook_df)
+    return build_logbook_sheets(agg_df, aircraft_df, aircraft_ids)
 
-def transform_logbook_data(raw_logbook_df, aircraft_df):
-    # Add formatted_serial_number
-    raw_logbook_df["formatted_serial_number"] = (
-        raw_logbook_df["year"].astype(str)
-        + "_"
-        + raw_logbook_df["ac"]
-        + "_"
-        + raw_logbook_df["fl_serial"]
-    )
-
-    # Aggregate
-    agg_df = (
-        raw_logbook_df.groupby("formatted_serial_number")
-        .agg(
-            flight_date=("date", "min"),
-            hobbs_start=("start", "min"),
-            hobbs_end=("end", "max"),
-            total_flight_hours_decimal=("hours", "sum"),
-            total_legs=("landings", "sum"),
-        )
-        .reset_index()
-    )
 
-    # Extract aircraft registration and raw serial number
-    agg_df["aircraft_registration"] = agg_df["formatted_serial_number"].str.split(
-        "_", expand=True
-    )[1]
-    agg_df["raw_serial_number"] = agg_df["formatted_serial_number"].str.split(
-        "_", expand=True
-    )[2]
+def build_logbook_sheets(agg_df, aircraft_df, aircraft_ids=None):
+    # Shapes one aggregated row per sheet, however it was aggregated, into
+    # itxda_logbook_sheet columns
 
     # Prepare final dataframe structure
     logbook_df_columns = [
@@ -76,82 +68,224 @@ def transform_logbook_data(raw_logbook_df, aircraft_df):
         "formatted_serial_number",
     ]
 
-    logbook_df = pd.DataFrame(columns=logbook_df_columns)
-    logbook_df = pd.concat([logbook_df, agg_df], ignore_index=True, sort=False)
+    # Columns the aggregation doesn't produce are left empty (object NaN);
+    # the aggregated ones keep their dtypes
+    extra_columns = [c for c in agg_df.columns if c not in logbook_df_columns]
+    logbook_df = agg_df.reindex(columns=logbook_df_columns + extra_columns)
+    logbook_df = logbook_df.reset_index(drop=True)
+    empty_columns = logbook_df.columns.difference(agg_df.columns)
+    logbook_df[empty_columns] = logbook_df[empty_columns].astype(object)
 
     logbook_df["total_flight_hours_decimal"] = (
         logbook_df["total_flight_hours_decimal"].astype(float).round(3)
     )
 
-    # Merge aircraft details
-    logbook_df = logbook_df.merge(
-        aircraft_df[["aircraft_registration", "dev_id"]],
-        how="left",
-        on="aircraft_registration",
-    ).rename({"dev_id": "aircraft_id"}, axis=1)
+    # Map aircraft details
+    if aircraft_ids is None:
+        aircraft_ids = build_lookups({"aircraft_detail": aircraft_df})[
+            "aircraft_detail"
+        ]
+    logbook_df["aircraft_id"] = logbook_df["aircraft_registration"].map(aircraft_ids)
 
     return logbook_df
 
 
 def filter_new_records(cursor, new_data_df):
-    get_data_query = "SELECT distinct id, flight_date, formatted_serial_number FROM itxda_logbook_sheet"
-    cursor.execute(get_data_query)
-    existing_records = cursor.fetchall()
-
-    # existing_records is a list of dicts because of DictCursor
-    existing_serials = {
-        record["formatted_serial_number"] for record in existing_records
-    }
+    existing_sheets_df = fetch_existing_rows(
+        cursor,
+        "itxda_logbook_sheet",
+        "formatted_serial_number",
+        new_data_df["formatted_serial_number"],
+        ["id", "flight_date", "formatted_serial_number"],
+    ).rename(columns={"id": "logsheet_id"})
 
-    mask = ~new_data_df["formatted_serial_number"].isin(existing_serials)
+    mask = ~isin_sheets(new_data_df, existing_sheets_df["formatted_serial_number"])
 
-    print(f"Existing records count: {len(existing_records)}")
+    print(f"Existing records count: {len(existing_sheets_df)}")
     print(f"New records count: {len(new_data_df[mask])}")
 
-    return new_data_df[mask]
+    return new_data_df[mask], existing_sheets_df
 
 
-def load_logbook_sheets(logbook_df):
-    insert_columns = [
-        "flight_date",
-        "hobbs_start",
-        "hobbs_end",
-        "total_flight_hours_decimal",
-        "total_legs",
-        "raw_serial_number",
-        "formatted_serial_number",
-        "aircraft_id",
-    ]
+SHEET_COLUMNS = [
+    "flight_date",
+    "hobbs_start",
+    "hobbs_end",
+    "total_flight_hours_decimal",
+    "total_legs",
+    "raw_serial_number",
+    "formatted_serial_number",
+    "aircraft_id",
+]
+
+
+def update_logbook_sheets(cursor, sheets_df):
+    """
+    Overwrites the columns of the sheets in `sheets_df` that are already in
+    itxda_logbook_sheet, matched on formatted_serial_number, so they keep
+    their ids.
+    """
+    columns = sheets_df.columns.tolist()
+    assignments = ", ".join(
+        f"ils.{c} = v.{c}" for c in columns if c != "formatted_serial_number"
+    )
+    rows = list(zip(*column_arrays(sheets_df)))
+    for chunk in iter_chunks(rows, settings.BULK_INSERT_BATCH_SIZE):
+        derived_sql, params = derived_table(chunk, columns)
+        cursor.execute(
+            f"""
+            UPDATE itxda_logbook_sheet ils
+            JOIN ({derived_sql}) v
+              ON v.formatted_serial_number = ils.formatted_serial_number
+            SET {assignments}
+            """,
+            params,
+        )
+
+
+def delete_logbook_sheets(cursor, serials):
+    print(f"Deleting {len(serials)} records from itxda_logbook_sheet...")
+    execute_in_chunks(
+        cursor,
+        "DELETE FROM itxda_logbook_sheet WHERE formatted_serial_number IN ({placeholders})",
+        list(serials),
+        settings.DEDUP_CHUNK_SIZE,
+    )
+
 
-    insert_df = logbook_df[insert_columns].copy()
+def verify_sheets(cursor, sheet_ids):
+    # The sheets' post-load update, in the caller's transaction
+    execute_in_chunks(
+        cursor,
+        "UPDATE itxda_logbook_sheet ils SET is_verified = 1 "
+        "WHERE ils.id IN ({placeholders}) AND ils.is_verified != 1;",
+        [int(i) for i in sheet_ids],
+        settings.DEDUP_CHUNK_SIZE,
+    )
+
+
+def _insert_sheet_chunk(cursor, chunk):
+    sheet_ids = bulk_insert_returning_ids(cursor, "itxda_logbook_sheet", chunk)
+    if settings.INCREMENTAL_POST_PROCESS:
+        verify_sheets(cursor, sheet_ids)
+    return sheet_ids
+
+
+def load_logbook_sheets(logbook_df, changed_serials=()):
+    """
+    Inserts the sheets of `logbook_df` that aren't in itxda_logbook_sheet
+    yet, committed every LOAD_COMMIT_ROWS sheets; existing ones listed in
+    `changed_serials` are updated in place. Returns `(every sheet of
+    logbook_df with its id, inserted ids)`.
+    """
+    insert_df = logbook_df[SHEET_COLUMNS].copy()
     insert_df = insert_df.assign(
         hobbs_start=insert_df["hobbs_start"].astype(float).round(3),
         hobbs_end=insert_df["hobbs_end"].astype(float).round(3),
     )
 
-    insert_query = f"INSERT INTO itxda_logbook_sheet ({', '.join(insert_columns)}) VALUES ({', '.join(['%s'] * len(insert_columns))})"
-
     with db_manager.mysql_connection() as conn:
         with conn.cursor() as cursor:
-            new_records_df = filter_new_records(cursor, insert_df)
+            new_records_df, existing_sheets_df = filter_new_records(cursor, insert_df)
+
+    if len(changed_serials):
+        update_df = insert_df[
+            isin_sheets(insert_df, changed_serials)
+            & isin_sheets(insert_df, existing_sheets_df["formatted_serial_number"])
+        ]
+        if not update_df.empty:
+            print(f"Updating {len(update_df)} changed records in itxda_logbook_sheet...")
+            run_in_transaction(lambda cursor: update_logbook_sheets(cursor, update_df))
+
+    if new_records_df.empty:
+        print("No new records to insert into itxda_logbook_sheet.")
+        return existing_sheets_df, np.empty(0, dtype=np.int64)
+
+    print(f"Inserting {len(new_records_df)} records into itxda_logbook_sheet...")
+    sheet_ids = np.concatenate(
+        [
+            run_in_transaction(
+                lambda cursor, chunk=chunk: _insert_sheet_chunk(cursor, chunk),
+                verify=lambda cursor, ids: ids_exist(cursor, "itxda_logbook_sheet", ids),
+            )
+            for chunk in iter_frame_chunks(new_records_df)
+        ]
+    )
+    print("Insertion complete.")
+
+    inserted_sheets_df = pd.DataFrame(
+        {
+            "logsheet_id": sheet_ids,
+            "formatted_serial_number": new_records_df["formatted_serial_number"].to_numpy(),
+            "flight_date": new_records_df["flight_date"].to_numpy(),
+        }
+    )
+
+    # Every sheet the entry stage may need to link to: the ones that were
+    # already there plus the ones just inserted.
+    logbook_sheet_df = pd.concat(
+        [existing_sheets_df, inserted_sheets_df], ignore_index=True
+    )
+    return logbook_sheet_df, sheet_ids
 
-            new_data = list(new_records_df.itertuples(index=False, name=None))
 
-            if new_data:
-                print(f"Inserting {len(new_data)} records into itxda_logbook_sheet...")
-                cursor.executemany(insert_query, new_data)
-                conn.commit()
-                print("Insertion complete.")
-            else:
-                print("No new records to insert into itxda_logbook_sheet.")
+def process_logbook_sheet_chunk(raw_logs, context, changed_serials=()):
+    with context.metrics.stage(PIPELINE_NAME, "transform") as metrics:
+        processed_data = transform_logbook_data(
+            raw_logs,
+            context.get_aircraft_details(),
+            context.get_lookups()["aircraft_detail"],
+        )
+        metrics.add(rows_in=len(raw_logs), rows_out=len(processed_data))
+    return _load_processed_sheets(processed_data, context, changed_serials)
+
+
+def process_sheet_aggregate_chunk(agg_df, context):
+    # Same as process_logbook_sheet_chunk, for sheets Postgres aggregated
+    with context.metrics.stage(PIPELINE_NAME, "transform") as metrics:
+        processed_data = build_logbook_sheets(
+            agg_df,
+            context.get_aircraft_details(),
+            context.get_lookups()["aircraft_detail"],
+        )
+        metrics.add(rows_in=len(agg_df), rows_out=len(processed_data))
+    return _load_processed_sheets(processed_data, context)
 
 
-def run_logbook_sheet_pipeline():
+def _load_processed_sheets(processed_data, context, changed_serials=()):
+    with context.metrics.stage(PIPELINE_NAME, "load") as metrics:
+        logbook_sheet_df, sheet_ids = load_logbook_sheets(
+            processed_data, changed_serials
+        )
+        metrics.add(rows_in=len(processed_data), rows_out=len(sheet_ids))
+
+    context.record_inserted_ids("itxda_logbook_sheet", sheet_ids)
+    context.record_progress(
+        PIPELINE_NAME, sheets=len(processed_data), inserted=len(sheet_ids)
+    )
+    return logbook_sheet_df
+
+
+def run_logbook_sheet_pipeline(context=None):
     print("Running Logbook Sheet Pipeline...")
-    raw_logs = get_raw_flight_logs()
-    aircraft_details = get_aircraft_details()
-    processed_data = transform_logbook_data(raw_logs, aircraft_details)
-    load_logbook_sheets(processed_data)
+    if context is None:
+        context = PipelineRunContext.for_pipelines(PIPELINE_NAME)
+    print(
+        f"Extracting raw flight logs from {context.since or 'the beginning'} to {context.until}"
+    )
+    if settings.SHEET_PUSHDOWN:
+        # Only one row per sheet leaves Postgres
+        logbook_sheet_dfs = [
+            process_sheet_aggregate_chunk(agg_df, context)
+            for agg_df in context.iter_sheet_aggregates()
+        ]
+    else:
+        logbook_sheet_dfs = [
+            process_logbook_sheet_chunk(raw_logs, context)
+            for raw_logs in context.iter_raw_flight_logs()
+        ]
+    context.logbook_sheet_df = pd.concat(logbook_sheet_dfs, ignore_index=True)
+    commit_watermark(PIPELINE_NAME, context.until)
     print("Logbook Sheet Pipeline Finished.")
 
 
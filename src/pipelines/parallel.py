@@ -0,0 +1,50 @@
+import contextvars
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from src.config.settings import settings
+
+
+def submit_all(tasks, max_workers=None):
+    """
+    Starts every task of `tasks` (name -> zero-argument callable) on a
+    bounded thread pool of EXTRACT_MAX_WORKERS threads and returns
+    name -> Future. The pool goes away once its tasks are done.
+
+    Each task runs in a copy of the caller's context, so the metrics stage
+    active at submission still applies in the worker thread.
+    """
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, max_workers or settings.EXTRACT_MAX_WORKERS),
+        thread_name_prefix="extract",
+    )
+    try:
+        return {
+            name: executor.submit(contextvars.copy_context().run, task)
+            for name, task in tasks.items()
+        }
+    finally:
+        executor.shutdown(wait=False)
+
+
+def cancel_all(futures):
+    # Only tasks that haven't started can be cancelled; running ones finish
+    for future in futures.values():
+        future.cancel()
+
+
+def gather(futures):
+    """
+    Waits for every future of `futures` (name -> Future) and returns
+    name -> result. On the first failure the tasks that haven't started yet
+    are cancelled and the error is re-raised.
+    """
+    done, _ = wait(futures.values(), return_when=FIRST_EXCEPTION)
+    for future in done:
+        if not future.cancelled() and future.exception() is not None:
+            cancel_all(futures)
+            raise future.exception()
+    return {name: future.result() for name, future in futures.items()}
+
+
+def run_concurrently(tasks, max_workers=None):
+    """Runs `tasks` concurrently and returns name -> result (see gather)."""
+    return gather(submit_all(tasks, max_workers))
@@ -0,0 +1,76 @@
+from src.config.settings import settings
+from src.pipelines.changes import ChangeTracker
+from src.pipelines.context import PipelineRunContext
+from src.pipelines import logbook_entry, logbook_sheet
+from src.pipelines.keys import unique_serials
+from src.pipelines.parallel import cancel_all, gather, submit_all
+from src.pipelines.watermark import commit_watermark
+
+
+def new_run_context():
+    return PipelineRunContext.for_pipelines(
+        logbook_sheet.PIPELINE_NAME, logbook_entry.PIPELINE_NAME
+    )
+
+
+def run_all_pipelines(context=None):
+    """
+    Runs the sheet and entry pipelines in a single pass over raw_flight_log:
+    each extracted chunk goes through the sheet stage and then straight
+    through the entry stage, which links to the sheets just resolved.
+
+    Independent reads overlap: the reference dimensions load while the first
+    chunk is extracted, and the entry stage's probe of existing entries runs
+    while the sheet stage transforms and loads the same chunk.
+
+    With DETECT_CHANGES, sheets corrected at the source since they were
+    loaded are updated and their entries replaced, and deleted ones are
+    removed (see ChangeTracker).
+    """
+    if context is None:
+        context = new_run_context()
+    print(
+        f"Extracting raw flight logs from {context.since or 'the beginning'} to {context.until}"
+    )
+
+    if settings.SHEET_PUSHDOWN:
+        # The entry stage needs every leg, so the sheets are aggregated from them
+        print("SHEET_PUSHDOWN only applies to the standalone sheet pipeline.")
+    changes = ChangeTracker(context) if settings.DETECT_CHANGES else None
+    context.set_stage("extract")
+    context.prefetch()
+    try:
+        for raw_logs in context.iter_raw_flight_logs():
+            context.record_progress("extract", chunks=1, rows=len(raw_logs))
+            changed_serials = () if changes is None else changes.diff_chunk(raw_logs)
+            serials = unique_serials(raw_logs)
+            with context.metrics.stage(logbook_entry.PIPELINE_NAME, "extract"):
+                existing_entries = submit_all(
+                    {"entries": lambda: logbook_entry.fetch_existing_entries(serials)}
+                )
+            try:
+                context.set_stage(logbook_sheet.PIPELINE_NAME)
+                logbook_sheet_df = logbook_sheet.process_logbook_sheet_chunk(
+                    raw_logs, context, changed_serials
+                )
+                with context.metrics.stage(logbook_entry.PIPELINE_NAME, "extract"):
+                    existing_flight_df = gather(existing_entries)["entries"]
+            finally:
+                cancel_all(existing_entries)
+
+            context.set_stage(logbook_entry.PIPELINE_NAME)
+            logbook_entry.process_logbook_entry_chunk(
+                raw_logs, context, logbook_sheet_df, existing_flight_df, changed_serials
+            )
+            context.set_stage("extract")
+    finally:
+        context.cancel_prefetch()
+
+    if changes is not None:
+        context.set_stage("changes")
+        changes.finish()
+    commit_watermark(logbook_sheet.PIPELINE_NAME, context.until)
+    context.set_stage("post_process")
+    logbook_entry.finish_logbook_entry_pipeline(context)
+    context.set_stage("done")
+    return context
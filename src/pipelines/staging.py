@@ -0,0 +1,296 @@
+import fcntl
+import os
+import shutil
+import uuid
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timedelta
+
+import duckdb
+import pandas as pd
+from src.config.settings import settings
+from src.pipelines import extract
+from src.pipelines.state import (
+    file_lock,
+    read_json_state,
+    state_path,
+    write_json_state,
+)
+from src.pipelines.watermark import build_date_filter, get_last_commit_time
+
+STAGING_DIR = "staging"
+MANIFEST_FILE = os.path.join(STAGING_DIR, "manifest.json")
+MANIFEST_LOCK = os.path.join(STAGING_DIR, "manifest.lock")
+FETCH_LOCK = ".lock"
+
+# DuckDB returns this many rows per vector
+DUCKDB_VECTOR_SIZE = 2048
+
+
+def _fetch_dir(fetch_id):
+    return state_path(STAGING_DIR, "raw_flight_log", fetch_id)
+
+
+def _covers(fetch, since, until):
+    if fetch["until"] < until:
+        return False
+    return fetch["since"] is None or (since is not None and fetch["since"] <= since)
+
+
+def _is_current(fetch, last_commit):
+    # A fetch taken before the last successful run may hold rows that were
+    # corrected at the source since, which that run's lookback re-read.
+    return (
+        last_commit is None
+        or datetime.fromisoformat(fetch["fetched_at"]) > last_commit
+    )
+
+
+def staging_enabled():
+    """
+    Whether extracts go through the staging cache. Change detection needs
+    the current state of every sheet, so it always reads Postgres.
+    """
+    return settings.STAGING_ENABLED and not settings.DETECT_CHANGES
+
+
+def _restore_dtypes(df, dtypes):
+    # Parquet has no "object of datetime.date" type: dates come back as
+    # datetime64 and missing strings as NA, unlike the Postgres extract.
+    for column, dtype in dtypes.items():
+        if dtype != "object" or column not in df.columns:
+            continue
+        values = df[column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = values.dt.date
+        df[column] = values.astype(object).where(values.notna(), None)
+    return df
+
+
+class _FetchWriter:
+    """
+    Writes one extraction as Parquet partitioned by flight month. Staging
+    is only a cache: if a chunk can't be written, the fetch is dropped and
+    the pipeline carries on with the data it already has.
+    """
+
+    def __init__(self, since, until):
+        self.id = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.since = since
+        self.until = until
+        self.path = _fetch_dir(self.id)
+        self.rows = 0
+        self.dtypes = None
+        self.failed = False
+
+    def write(self, chunk):
+        if self.failed:
+            return
+        if self.dtypes is None:
+            self.dtypes = {column: str(dtype) for column, dtype in chunk.dtypes.items()}
+        if chunk.empty:
+            return
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with duckdb.connect() as con:
+                con.register("chunk", chunk)
+                con.execute(
+                    f"""
+                    COPY (SELECT *, strftime(date, '%Y-%m') AS month FROM chunk)
+                    TO '{self.path}'
+                    (FORMAT parquet, PARTITION_BY (month),
+                     FILENAME_PATTERN 'part-{{uuid}}', APPEND)
+                    """
+                )
+            self.rows += len(chunk)
+        except Exception as e:
+            print(f"Staging raw_flight_log failed, not caching this extract: {e}")
+            self.discard()
+
+    def discard(self):
+        self.failed = True
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def publish(self):
+        if self.failed:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        fetch = {
+            "id": self.id,
+            "since": self.since,
+            "until": self.until,
+            "rows": self.rows,
+            "dtypes": self.dtypes or {},
+            "fetched_at": datetime.now().isoformat(),
+        }
+        with file_lock(state_path(MANIFEST_LOCK), fcntl.LOCK_EX):
+            manifest = read_json_state(MANIFEST_FILE, {"fetches": []})
+            manifest["fetches"].append(fetch)
+            write_json_state(MANIFEST_FILE, _sweep(manifest))
+        print(f"Staged {self.rows} raw_flight_log rows as fetch {self.id}.")
+
+
+def _sweep(manifest):
+    """
+    Drops fetches past STAGING_RETENTION_HOURS, skipping any a run is still
+    reading, plus directories of writers that never published. Call with
+    the manifest lock held.
+    """
+    cutoff = datetime.now() - timedelta(hours=settings.STAGING_RETENTION_HOURS)
+    kept = []
+    for fetch in manifest["fetches"]:
+        if datetime.fromisoformat(fetch["fetched_at"]) >= cutoff:
+            kept.append(fetch)
+            continue
+        path = _fetch_dir(fetch["id"])
+        if not os.path.isdir(path):
+            continue
+        try:
+            lock_path = os.path.join(path, FETCH_LOCK)
+            with file_lock(lock_path, fcntl.LOCK_EX | fcntl.LOCK_NB):
+                shutil.rmtree(path, ignore_errors=True)
+        except BlockingIOError:
+            kept.append(fetch)
+
+    published = {fetch["id"] for fetch in kept}
+    root = state_path(STAGING_DIR, "raw_flight_log")
+    for fetch_id in os.listdir(root) if os.path.isdir(root) else []:
+        path = os.path.join(root, fetch_id)
+        modified = datetime.fromtimestamp(os.path.getmtime(path))
+        if fetch_id not in published and modified < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+    manifest["fetches"] = kept
+    return manifest
+
+
+def _fetch_chunks(result, vectors):
+    while True:
+        chunk = result.fetch_df_chunk(vectors)
+        if chunk.empty:
+            return
+        yield chunk
+
+
+class RawFlightLogStaging:
+    """
+    Local Parquet copy of extracted raw_flight_log windows.
+
+    Every Postgres extraction is written as one fetch: Parquet files
+    partitioned by flight month, listed in a manifest with the (since,
+    until) window they cover once fully written. A later run whose window
+    falls inside a staged fetch reads it from disk instead of Postgres, e.g.
+    the replay after a failed MySQL load. Rows before the extract cutoff can
+    still be corrected at the source, so a fetch is only reused until the
+    next watermark commit: after a successful run, the following one reads
+    its lookback window from Postgres again.
+
+    Runs and processes can share the directory: the manifest is updated
+    under an exclusive file lock, and a run holds a shared lock on the fetch
+    it reads so the retention sweep never deletes it underneath.
+    """
+
+    def fetches(self):
+        with file_lock(state_path(MANIFEST_LOCK), fcntl.LOCK_SH):
+            return read_json_state(MANIFEST_FILE, {"fetches": []})["fetches"]
+
+    @contextmanager
+    def _pinned(self, since, until):
+        # The newest fetch covering the window, locked against the sweep
+        with ExitStack() as stack:
+            with file_lock(state_path(MANIFEST_LOCK), fcntl.LOCK_SH):
+                manifest = read_json_state(MANIFEST_FILE, {"fetches": []})
+                last_commit = get_last_commit_time()
+                covering = [
+                    f
+                    for f in manifest["fetches"]
+                    if _covers(f, since, until) and _is_current(f, last_commit)
+                ]
+                fetch = covering[-1] if covering else None
+                if fetch is not None:
+                    lock_path = os.path.join(_fetch_dir(fetch["id"]), FETCH_LOCK)
+                    stack.enter_context(file_lock(lock_path, fcntl.LOCK_SH))
+            yield fetch
+
+    def _query(self, fetch, since, until, order_by_sheet=False):
+        files = os.path.join(_fetch_dir(fetch["id"]), "*", "*.parquet")
+        month_filter = f"month <= '{until[:7]}'"
+        if since is not None:
+            month_filter = f"month >= '{since[:7]}' AND {month_filter}"
+        query = f"""
+        SELECT * EXCLUDE (month)
+        FROM read_parquet(
+            '{files}',
+            hive_partitioning = true,
+            hive_types = {{'month': VARCHAR}},
+            union_by_name = true
+        )
+        WHERE {month_filter} AND {build_date_filter(since, until)}
+        """
+        if order_by_sheet:
+            query += "ORDER BY year, ac, fl_serial\n"
+        return query
+
+    def _empty(self, fetch):
+        return pd.DataFrame(
+            {c: pd.Series(dtype=dtype) for c, dtype in fetch["dtypes"].items()}
+        )
+
+    def _read(self, fetch, since, until):
+        if fetch["rows"] == 0:
+            return self._empty(fetch)
+        with duckdb.connect() as con:
+            df = con.execute(self._query(fetch, since, until)).df()
+        return _restore_dtypes(df, fetch["dtypes"])
+
+    def _iter(self, fetch, since, until, chunk_size):
+        if fetch["rows"] == 0:
+            return
+        vectors = max(1, chunk_size // DUCKDB_VECTOR_SIZE)
+        with duckdb.connect() as con:
+            result = con.execute(self._query(fetch, since, until, True))
+            yield from extract.regroup_by_sheet(
+                _restore_dtypes(chunk, fetch["dtypes"])
+                for chunk in _fetch_chunks(result, vectors)
+            )
+
+    def read_staged(self, since, until):
+        """Returns the staged window, or None when no fetch covers it."""
+        with self._pinned(since, until) as fetch:
+            return None if fetch is None else self._read(fetch, since, until)
+
+    def get_raw_flight_logs(self, since=None, until=None):
+        with self._pinned(since, until) as fetch:
+            if fetch is not None:
+                print(f"Reading raw_flight_log from staged fetch {fetch['id']}.")
+                return self._read(fetch, since, until)
+
+        raw_logbook_df = extract.get_raw_flight_logs(since, until)
+        writer = _FetchWriter(since, until)
+        writer.write(raw_logbook_df)
+        writer.publish()
+        return raw_logbook_df
+
+    def iter_raw_flight_logs(self, since=None, until=None, chunk_size=None):
+        chunk_size = chunk_size or settings.EXTRACT_CHUNK_SIZE
+        with self._pinned(since, until) as fetch:
+            if fetch is not None:
+                print(f"Reading raw_flight_log from staged fetch {fetch['id']}.")
+                yield from self._iter(fetch, since, until, chunk_size)
+                return
+
+        writer = _FetchWriter(since, until)
+        try:
+            for chunk in extract.iter_raw_flight_logs(since, until, chunk_size):
+                writer.write(chunk)
+                yield chunk
+        except BaseException:
+            writer.discard()
+            raise
+        writer.publish()
+
+    def sweep(self):
+        with file_lock(state_path(MANIFEST_LOCK), fcntl.LOCK_EX):
+            manifest = read_json_state(MANIFEST_FILE, {"fetches": []})
+            write_json_state(MANIFEST_FILE, _sweep(manifest))
+
+
+raw_staging = RawFlightLogStaging()
@@ -0,0 +1,49 @@
+import fcntl
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+from src.config.settings import settings
+
+
+def state_path(*parts):
+    return os.path.join(settings.PIPELINE_STATE_DIR, *parts)
+
+
+@contextmanager
+def file_lock(path, mode=fcntl.LOCK_EX):
+    # Holds an flock on `path`, which processes sharing the directory see
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def read_json_state(name, default=None):
+    path = state_path(name)
+    if not os.path.exists(path):
+        return {} if default is None else default
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_json_state(name, data):
+    """
+    Writes a JSON state file atomically so a crash mid-write never leaves a
+    truncated file behind for the next run.
+    """
+    path = state_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2, default=str)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
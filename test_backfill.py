@@ -0,0 +1,193 @@
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_dimensions, generate_raw_flight_log
+from src.pipelines import backfill, logbook_entry
+from src.pipelines.dimensions import build_lookups
+from src.pipelines.extract import add_formatted_serial_number
+
+DIMENSIONS = generate_dimensions(seed=4)
+LOOKUPS = build_lookups(DIMENSIONS)
+RAW = add_formatted_serial_number(generate_raw_flight_log(1_000, DIMENSIONS, seed=4))
+
+
+class FakeExtract:
+    """Stands in for the Postgres extract and records what was read."""
+
+    def __init__(self, raw=RAW):
+        self.raw = raw
+        self.reads = []
+
+    def _in_window(self, since, until):
+        dates = self.raw["date"].astype(str)
+        return (dates >= since) & (dates < until)
+
+    def get_raw_flight_logs(self, since, until, aircraft=None):
+        self.reads.append((since, until, aircraft))
+        in_window = self._in_window(since, until)
+        if aircraft is not None:
+            in_window &= self.raw["ac"] == aircraft
+        return self.raw[in_window].reset_index(drop=True)
+
+    def get_raw_flight_logs_of_sheets(self, serials, since, until, exclude):
+        in_window = self._in_window(since, until) & ~self._in_window(*exclude)
+        in_window &= self.raw["formatted_serial_number"].isin(serials)
+        return self.raw[in_window].reset_index(drop=True)
+
+    def get_raw_flight_log_aircraft(self, since, until):
+        return sorted(self.raw["ac"].unique())
+
+
+class FakeDimensionCache:
+    def get(self, name):
+        return DIMENSIONS[name]
+
+    def get_lookup(self, name):
+        return LOOKUPS[name]
+
+
+@pytest.fixture
+def backfill_env(mysql_standin, monkeypatch):
+    """
+    Returns `open(raw)`, which backs the backfill with a FakeExtract of `raw`
+    and a fresh stand-in and returns both.
+    """
+
+    def open_env(raw=RAW):
+        fake = FakeExtract(raw)
+        monkeypatch.setattr(backfill, "extract", fake)
+        monkeypatch.setattr(backfill, "dimension_cache", FakeDimensionCache())
+        return fake, mysql_standin()
+
+    return open_env
+
+
+def run(*args, **kwargs):
+    backfill.run_backfill(*args, workers=1, **kwargs)
+
+
+def test_month_partitions_cover_the_range():
+    partitions = backfill.month_partitions("2023-11-15", "2024-02-10")
+    assert [(p["key"], p["since"], p["until"]) for p in partitions] == [
+        ("2023-11", "2023-11-15", "2023-12-01"),
+        ("2023-12", "2023-12-01", "2024-01-01"),
+        ("2024-01", "2024-01-01", "2024-02-01"),
+        ("2024-02", "2024-02-01", "2024-02-10"),
+    ]
+
+
+def test_backfill_loads_every_partition_once(backfill_env, without_post_process):
+    fake, standin = backfill_env()
+    run("2019-01-01", "2026-01-01", "ac")
+    in_range = RAW["date"].astype(str) < "2026-01-01"
+    assert standin.count("itxda_logbook_entry") == in_range.sum()
+    assert standin.count("itxda_logbook_sheet") == RAW[in_range][
+        "formatted_serial_number"
+    ].nunique()
+    unlinked = standin._conn.execute(
+        "SELECT count(*) FROM itxda_logbook_entry WHERE logsheet_id IS NULL"
+    ).fetchone()[0]
+    assert unlinked == 0
+
+    # Everything is checkpointed; --restart finds it all loaded already
+    fake.reads.clear()
+    run("2019-01-01", "2026-01-01", "ac")
+    assert fake.reads == []
+    run("2019-01-01", "2026-01-01", "ac", restart=True)
+    assert standin.count("itxda_logbook_entry") == in_range.sum()
+
+
+def test_interrupted_backfill_resumes(backfill_env, monkeypatch, without_post_process):
+    fake, standin = backfill_env()
+    load_partition = backfill.load_partition
+    loads = []
+
+    def failing_load(sheets, entries):
+        loads.append(len(sheets))
+        if len(loads) == 3:
+            raise RuntimeError("connection lost")
+        return load_partition(sheets, entries)
+
+    monkeypatch.setattr(backfill, "load_partition", failing_load)
+    with pytest.raises(RuntimeError):
+        run("2020-01-01", "2020-07-01", "month")
+    assert len(fake.reads) == 3
+
+    monkeypatch.setattr(backfill, "load_partition", load_partition)
+
+    fake.reads.clear()
+    run("2020-01-01", "2020-07-01", "month")
+    assert [since for since, _, _ in fake.reads] == [
+        "2020-03-01",
+        "2020-04-01",
+        "2020-05-01",
+        "2020-06-01",
+    ]
+    dates = RAW["date"].astype(str)
+    in_range = (dates >= "2020-01-01") & (dates < "2020-07-01")
+    assert standin.count("itxda_logbook_entry") == in_range.sum()
+
+
+def test_partition_failing_to_post_process_is_loaded_again(backfill_env, monkeypatch):
+    fake, standin = backfill_env()
+    post_process_rows = logbook_entry.post_process_rows
+    calls = []
+
+    def failing_post_process(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 3:
+            raise RuntimeError("connection lost")
+        return post_process_rows(*args, **kwargs)
+
+    monkeypatch.setattr(logbook_entry, "post_process_rows", failing_post_process)
+    with pytest.raises(RuntimeError):
+        run("2020-01-01", "2020-07-01", "month")
+    monkeypatch.setattr(logbook_entry, "post_process_rows", post_process_rows)
+    run("2020-01-01", "2020-07-01", "month")
+
+    dates = RAW["date"].astype(str)
+    in_range = (dates >= "2020-01-01") & (dates < "2020-07-01")
+    assert standin.count("itxda_logbook_entry") == in_range.sum()
+    unprocessed = standin._conn.execute(
+        "SELECT count(*) FROM itxda_logbook_entry WHERE is_locked != 1"
+    ).fetchone()[0]
+    assert unprocessed == 0
+
+
+def straddling_raw():
+    # Moves the last leg of every multi-leg sheet of 2021 to the next month
+    raw = RAW.copy()
+    legs = raw.groupby("formatted_serial_number")["date"].transform("size")
+    last = ~raw.duplicated("formatted_serial_number", keep="last")
+    moved = last & (legs > 1) & (raw["date"].astype(str).str[:4] == "2021")
+    next_month = pd.to_datetime(raw.loc[moved, "date"]) + pd.offsets.MonthBegin()
+    raw.loc[moved, "date"] = next_month.dt.date.to_numpy()
+    return raw, raw.loc[moved, "formatted_serial_number"]
+
+
+def loaded_sheets(standin):
+    return pd.read_sql(
+        "SELECT formatted_serial_number, total_legs, hobbs_start, hobbs_end, "
+        "total_flight_hours_decimal, flight_date FROM itxda_logbook_sheet "
+        "ORDER BY formatted_serial_number",
+        standin._conn,
+    )
+
+
+def test_month_partitions_keep_straddling_sheets_whole(
+    backfill_env, without_post_process
+):
+    raw, straddling = straddling_raw()
+    assert len(straddling) > 0
+    _, standin = backfill_env(raw)
+    run("2021-01-01", "2022-06-01", "ac")
+    by_aircraft = loaded_sheets(standin)
+    _, standin = backfill_env(raw)
+    run("2021-01-01", "2022-06-01", "month")
+    by_month = loaded_sheets(standin)
+    entries = standin.count("itxda_logbook_entry")
+
+    pd.testing.assert_frame_equal(by_month, by_aircraft)
+    assert by_month["formatted_serial_number"].isin(straddling).sum() == len(straddling)
+    dates = raw["date"].astype(str)
+    assert entries == ((dates >= "2021-01-01") & (dates < "2022-06-01")).sum()
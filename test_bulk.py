@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.config.settings import settings
+from src.db.bulk import bulk_insert, bulk_insert_returning_ids
+from src.db.queries import fetch_existing_rows
+
+# Typed like the MySQL columns, which coerce "7" and 7.0 into an INT
+SCRATCH_TABLE = """
+    CREATE TABLE scratch (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        notes TEXT, code TEXT, pilot_id INTEGER, legs INTEGER,
+        hours REAL, is_refueled INTEGER, flight_date TEXT
+    )
+"""
+
+
+def tricky_rows():
+    notes = ["a,b", 'say "hi"', "NULL", "", None, "two\nlines", "back\\slash", "é"]
+    rows = len(notes)
+    return pd.DataFrame(
+        {
+            "notes": notes,
+            "code": ["7", "007", "1.50", "NULL", "N", None, '"', ","],
+            "pilot_id": [513.0, np.nan, 2.0, 4.0, np.nan, 6.0, 7.0, 8.0],
+            "legs": pd.array([1, None, 3, 4, 5, None, 7, 8], dtype="Int64"),
+            "hours": [1.5, 0.25, np.nan, 2.0, 3.75, 0.1, 12.0, 1e-3],
+            "is_refueled": [True, False] * (rows // 2),
+            "flight_date": pd.date_range("2024-03-01", periods=rows).date,
+        },
+        # Not a RangeIndex, as after filtering the entries
+        index=[4, 4, 9, 1, 0, 2, 8, 3],
+    )
+
+
+@pytest.fixture
+def load_scratch(mysql_standin):
+    def load(df, mode):
+        standin = mysql_standin()
+        standin._conn.execute(SCRATCH_TABLE)
+        with standin.cursor() as cursor:
+            written = bulk_insert(cursor, "scratch", df, mode=mode, batch_size=3)
+        assert written == len(df)
+        return standin.contents("scratch")
+
+    return load
+
+
+def test_infile_loads_the_same_values_as_insert(load_scratch):
+    df = tricky_rows()
+    inserted = load_scratch(df, "insert")
+    assert inserted.equals(load_scratch(df, "infile"))
+    assert len(inserted) == len(df)
+    # Only real NAs are NULL: the strings "NULL" and "" stay strings
+    assert inserted["notes"].isna().sum() == 1
+    assert {"NULL", ""} <= set(inserted["notes"])
+    assert "NULL" in set(inserted["code"])
+    assert load_scratch(df.iloc[:0], "infile").empty
+
+
+def test_infile_loads_the_same_entries_as_insert(
+    mysql_standin, entries, load_entries, monkeypatch
+):
+    tables = {}
+    for mode in ["insert", "infile"]:
+        monkeypatch.setattr(settings, "BULK_LOAD_MODE", mode)
+        standin = mysql_standin()
+        load_entries(standin.as_mysql_connection, entries)
+        tables[mode] = [
+            standin.contents(table)
+            for table in ["itxda_schedule", "itxda_entry_x_schedule"]
+        ]
+
+    for inserted, loaded in zip(tables["insert"], tables["infile"]):
+        assert len(inserted) > 0
+        # The stand-in's columns are untyped: the CSV's 513 for 513.0
+        pd.testing.assert_frame_equal(loaded, inserted, check_dtype=False)
+
+
+def sheet_rows(entries):
+    return entries.drop_duplicates("formatted_serial_number")[
+        ["raw_serial_number", "formatted_serial_number", "aircraft_id"]
+    ]
+
+
+def test_returned_ids_match_the_ids_read_back(mysql_standin, entries):
+    standin = mysql_standin()
+    with standin.cursor() as cursor:
+        # Ids no longer start at 1 and have a gap where rows were deleted
+        sheets = sheet_rows(entries)
+        bulk_insert(cursor, "itxda_logbook_sheet", sheets.iloc[:40])
+        cursor.execute("DELETE FROM itxda_logbook_sheet WHERE id > 30")
+        new_sheets = sheets.iloc[40:]
+        ids = bulk_insert_returning_ids(
+            cursor, "itxda_logbook_sheet", new_sheets, batch_size=7
+        )
+        # Baseline: read the ids back by serial
+        read_back = fetch_existing_rows(
+            cursor,
+            "itxda_logbook_sheet",
+            "formatted_serial_number",
+            new_sheets["formatted_serial_number"],
+            ["id", "formatted_serial_number"],
+        )
+
+    expected = (
+        read_back.set_index("formatted_serial_number")["id"]
+        .loc[new_sheets["formatted_serial_number"]]
+        .to_numpy()
+    )
+    assert len(new_sheets) % 7 and ids.min() == 41
+    np.testing.assert_array_equal(ids, expected)
+
+
+class SteppedCursor:
+    """Allocates ids like MySQL with auto_increment_increment = 3."""
+
+    def __init__(self):
+        self.next_id = 10
+        self.lastrowid = None
+
+    def execute(self, query, params=None):
+        self.rows = [{"step": 3}]
+        if query.startswith("INSERT"):
+            self.lastrowid = self.next_id
+            self.next_id += 3 * query.count("(%s")
+
+    def fetchone(self):
+        return self.rows[0]
+
+
+def test_returned_ids_follow_auto_increment_increment(entries):
+    sheets = sheet_rows(entries).iloc[:10]
+    ids = bulk_insert_returning_ids(
+        SteppedCursor(), "itxda_logbook_sheet", sheets, batch_size=4
+    )
+    np.testing.assert_array_equal(ids, 10 + 3 * np.arange(10))
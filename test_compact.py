@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import generate_dimensions, generate_raw_flight_log
+from src.metrics import frame_nbytes
+from src.pipelines.compact import compact_dtypes
+from src.pipelines.dimensions import build_lookups
+from src.pipelines.extract import add_formatted_serial_number
+from src.pipelines.logbook_entry import transform_entry_data
+from src.pipelines.logbook_sheet import transform_logbook_data
+
+DIMENSIONS = generate_dimensions(seed=3)
+LOOKUPS = build_lookups(DIMENSIONS)
+RAW = add_formatted_serial_number(generate_raw_flight_log(5_000, DIMENSIONS, seed=3))
+
+
+def transform(raw):
+    sheets = transform_logbook_data(
+        raw, DIMENSIONS["aircraft_detail"], LOOKUPS["aircraft_detail"]
+    )
+    logbook_sheet_df = pd.DataFrame(
+        {
+            "logsheet_id": np.arange(1, len(sheets) + 1),
+            "formatted_serial_number": sheets["formatted_serial_number"],
+            "flight_date": sheets["flight_date"],
+        }
+    )
+    entries = transform_entry_data(
+        raw,
+        pd.DataFrame({"formatted_serial_number": []}),
+        DIMENSIONS["aircraft_detail"],
+        DIMENSIONS["customer"],
+        DIMENSIONS["pilot"],
+        DIMENSIONS["airport"],
+        logbook_sheet_df,
+        LOOKUPS,
+    )
+    return sheets, entries
+
+
+def test_compact_dtypes_shrinks_frame_and_keeps_values():
+    raw = RAW.copy()
+    compacted = compact_dtypes(raw)
+    pd.testing.assert_frame_equal(raw, RAW)
+    assert frame_nbytes(compacted) < frame_nbytes(raw) / 2
+
+    assert compacted["pic"].dtype == compacted["sic"].dtype == "category"
+    assert compacted["pic"].cat.categories.equals(compacted["sic"].cat.categories)
+    assert compacted["formatted_serial_number"].dtype == object
+    assert compacted["adult"].dtype == np.int8
+    assert compacted["landings"].dtype == RAW["landings"].dtype
+    for column in RAW.columns:
+        assert compacted[column].astype(object).equals(RAW[column].astype(object))
+
+
+def test_compact_dtypes_nullable_ids():
+    raw = RAW.head(3).assign(verified_by_id=[4.0, np.nan, 7.0])
+    ids = compact_dtypes(raw)["verified_by_id"]
+    assert ids.dtype == "Int64"
+    assert ids.isna().tolist() == [False, True, False]
+
+
+def test_transforms_give_same_values_on_compacted_frames():
+    sheets, entries = transform(RAW)
+    compact_sheets, compact_entries = transform(compact_dtypes(RAW))
+    pd.testing.assert_frame_equal(compact_sheets, sheets)
+    for column in ["aircraft_id", "flight_type_id", "departure_id", "arrival_id"]:
+        assert compact_entries[column].dtype == entries[column].dtype
+    pd.testing.assert_frame_equal(
+        compact_entries.astype(object).where(compact_entries.notna(), None),
+        entries.astype(object).where(entries.notna(), None),
+    )
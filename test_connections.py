@@ -0,0 +1,112 @@
+import pymysql
+import pytest
+
+from benchmarks.standin import StandInConnection
+from src.config.settings import settings
+from src.db import connections
+from src.db.connections import DatabaseManager, MySQLConnectionPool
+
+
+class FakeTunnel:
+    """Stands in for SSHTunnelForwarder and records every start."""
+
+    started = []
+
+    def __init__(self, *args, **kwargs):
+        self.is_active = False
+        self.tunnel_is_up = {}
+        self.local_bind_port = 40000 + len(FakeTunnel.started)
+
+    def start(self):
+        self.is_active = True
+        self.tunnel_is_up = {("127.0.0.1", self.local_bind_port): True}
+        FakeTunnel.started.append(self)
+
+    def check_tunnels(self):
+        pass
+
+    def stop(self):
+        self.is_active = False
+
+
+@pytest.fixture
+def tunneled_manager(monkeypatch, tmp_path):
+    """
+    A DatabaseManager going through a fake SSH tunnel to stand-in
+    connections that share one SQLite file. Yields the manager, the path
+    and the list of connections opened.
+    """
+    path = str(tmp_path / "itxda.sqlite")
+    opened = []
+
+    def connect(**kwargs):
+        assert kwargs["port"] == FakeTunnel.started[-1].local_bind_port
+        opened.append(StandInConnection(path))
+        return opened[-1]
+
+    monkeypatch.setattr(settings, "IS_TESTING", False)
+    monkeypatch.setattr(connections, "SSHTunnelForwarder", FakeTunnel)
+    monkeypatch.setattr(connections, "InstrumentedMySQLConnection", connect)
+    FakeTunnel.started = []
+    manager = DatabaseManager()
+    yield manager, path, opened
+    manager.close()
+
+
+TABLES = ["itxda_logbook_entry", "itxda_schedule", "itxda_entry_x_schedule"]
+
+
+def test_pooled_connections_load_like_a_single_connection(
+    tunneled_manager, mysql_standin, entries, load_entries
+):
+    # Baseline: one connection handed to every transaction
+    standin = mysql_standin()
+    load_entries(standin.as_mysql_connection, entries)
+    expected = [standin.contents(table) for table in TABLES]
+
+    manager, path, opened = tunneled_manager
+    load_entries(manager.mysql_connection, entries)
+    # Every transaction reused the same tunnel and pooled connection
+    assert len(FakeTunnel.started) == 1
+    assert len(opened) == 1
+    database = mysql_standin(path)
+    loaded = [database.contents(table) for table in TABLES]
+    for expected_df, loaded_df in zip(expected, loaded):
+        assert len(loaded_df) > 0
+        assert loaded_df.equals(expected_df)
+
+
+def test_dropped_tunnel_and_dead_connections_are_replaced(tunneled_manager):
+    manager, path, opened = tunneled_manager
+    with manager.mysql_connection() as conn:
+        first = conn
+    with manager.mysql_connection() as conn:
+        assert conn is first
+
+    # A connection-level error keeps the connection out of the pool
+    with pytest.raises(pymysql.err.OperationalError):
+        with manager.mysql_connection() as conn:
+            raise pymysql.err.OperationalError(2013, "Lost connection")
+    assert not first.open
+
+    # An idle connection that died meanwhile fails its ping
+    with manager.mysql_connection() as conn:
+        second = conn
+    second.close()
+    manager.tunnel.tunnel_is_up = {("127.0.0.1", 0): False}
+    with manager.mysql_connection() as conn:
+        assert conn is opened[-1] and conn is not second
+    assert len(opened) == 3
+    assert len(FakeTunnel.started) == 2
+    assert not FakeTunnel.started[0].is_active
+
+
+def test_pool_is_bounded():
+    pool = MySQLConnectionPool(StandInConnection, max_size=1, timeout=0.05)
+    conn = pool.checkout()
+    with pytest.raises(TimeoutError):
+        pool.checkout()
+    pool.release(conn)
+    assert pool.checkout() is conn
+    pool.release(conn)
+    pool.close()
@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_dimensions, generate_raw_flight_log
+from src.pipelines import dimensions, logbook_entry
+from src.pipelines.dimensions import DimensionCache, build_lookup, build_lookups
+
+
+class FakePostgres:
+    """Stands in for Postgres: serves one aircraft table and counts reads."""
+
+    def __init__(self):
+        self.table = pd.DataFrame(
+            {"aircraft_registration": ["PKVVA", "PKVVB"], "dev_id": [1, 2]}
+        )
+        self.loads = 0
+        self.signature_checks = 0
+
+    def read_sql(self, query):
+        if "md5(" in query:
+            self.signature_checks += 1
+            return pd.DataFrame(
+                {"row_count": [len(self.table)], "checksum": [str(self.table.values)]}
+            )
+        self.loads += 1
+        return self.table.copy()
+
+
+@pytest.fixture
+def make_cache(monkeypatch):
+    def make(ttl_seconds):
+        fake = FakePostgres()
+        monkeypatch.setattr(dimensions, "_read_sql", fake.read_sql)
+        return DimensionCache(ttl_seconds=ttl_seconds), fake
+
+    return make
+
+
+def test_cache_serves_within_ttl(make_cache):
+    cache, fake = make_cache(ttl_seconds=3600)
+    cache.get("aircraft_detail")
+    cache.get("aircraft_detail")
+    assert fake.loads == 1
+    assert fake.signature_checks == 1
+    assert cache.stats()["aircraft_detail"] == {
+        "hits": 1,
+        "misses": 1,
+        "revalidations": 0,
+    }
+
+
+def test_cache_revalidates_and_reloads_on_change(make_cache):
+    cache, fake = make_cache(ttl_seconds=0)
+    cache.get("aircraft_detail")
+    cache.get("aircraft_detail")
+    assert fake.loads == 1
+    assert cache.stats()["aircraft_detail"]["revalidations"] == 1
+
+    fake.table.loc[2] = ["PKVVC", 3]
+    assert cache.get_lookup("aircraft_detail")["PKVVC"] == 3
+    assert fake.loads == 2
+
+
+def test_build_lookup_keeps_first_value_per_key():
+    df = pd.DataFrame({"name": ["a", "b", "a", None], "dev_id": [1, 2, 3, 4]})
+    assert build_lookup(df, "name", "dev_id").to_dict() == {"a": 1, "b": 2}
+
+
+def test_duplicate_dimension_keys_dont_duplicate_entries():
+    frames = generate_dimensions(seed=3)
+    raw = generate_raw_flight_log(300, frames, seed=3)
+    aircraft = frames["aircraft_detail"]
+    # Every registration listed again under another dev_id
+    frames["aircraft_detail"] = pd.concat(
+        [aircraft, aircraft.assign(dev_id=aircraft["dev_id"] + 1000)],
+        ignore_index=True,
+    )
+    entries = logbook_entry.transform_entry_data(
+        raw,
+        pd.DataFrame({"formatted_serial_number": []}),
+        frames["aircraft_detail"],
+        frames["customer"],
+        frames["pilot"],
+        frames["airport"],
+        pd.DataFrame(
+            {"logsheet_id": [], "formatted_serial_number": [], "flight_date": []}
+        ),
+        build_lookups(frames),
+    )
+    assert len(entries) == len(raw)
+    first_ids = aircraft.set_index("aircraft_registration")["dev_id"]
+    assert (entries["aircraft_id"] == entries["ac"].map(first_ids)).all()
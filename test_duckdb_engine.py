@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_dimensions, generate_raw_flight_log
+from src.config.settings import settings
+from src.pipelines.dimensions import build_lookups
+from src.pipelines.extract import add_formatted_serial_number
+from src.pipelines.logbook_entry import transform_entry_data
+from src.pipelines.logbook_sheet import transform_logbook_data
+
+
+@pytest.fixture
+def run_transforms(monkeypatch, capsys):
+    """Runs both transforms on `engine` and returns their frames and output."""
+
+    def run(engine, raw, dimensions, lookups):
+        monkeypatch.setattr(settings, "TRANSFORM_ENGINE", engine)
+        capsys.readouterr()
+        sheets = transform_logbook_data(
+            raw, dimensions["aircraft_detail"], lookups["aircraft_detail"]
+        )
+        # Leave a few sheets out so some entries get no logsheet_id
+        logbook_sheet_df = pd.DataFrame(
+            {
+                "logsheet_id": np.arange(1, len(sheets) + 1),
+                "formatted_serial_number": sheets["formatted_serial_number"],
+                "flight_date": sheets["flight_date"],
+            }
+        ).iloc[3:]
+        existing = pd.DataFrame(
+            {"formatted_serial_number": raw["formatted_serial_number"].iloc[:20]}
+        )
+        entries = transform_entry_data(
+            raw,
+            existing,
+            dimensions["aircraft_detail"],
+            dimensions["customer"],
+            dimensions["pilot"],
+            dimensions["airport"],
+            logbook_sheet_df,
+            lookups,
+        )
+        return sheets, entries, capsys.readouterr().out
+
+    return run
+
+
+def test_duckdb_engine_matches_pandas(run_transforms):
+    dimensions = generate_dimensions(seed=1)
+    lookups = build_lookups(dimensions)
+    raw = add_formatted_serial_number(generate_raw_flight_log(5_000, dimensions, 1))
+
+    pandas_sheets, pandas_entries, pandas_output = run_transforms(
+        "pandas", raw, dimensions, lookups
+    )
+    duckdb_sheets, duckdb_entries, duckdb_output = run_transforms(
+        "duckdb", raw, dimensions, lookups
+    )
+    pd.testing.assert_frame_equal(duckdb_sheets, pandas_sheets)
+    pd.testing.assert_frame_equal(duckdb_entries, pandas_entries)
+    assert "Unresolved airport codes" in pandas_output
+    assert duckdb_output == pandas_output
@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_dimensions, generate_raw_flight_log
+from src.config.settings import settings
+from src.pipelines import extract, runner
+from src.pipelines.extract import add_formatted_serial_number, regroup_by_sheet
+
+DIMENSIONS = generate_dimensions(seed=9)
+# As Postgres returns it for the chunked query: ordered by sheet
+RAW = generate_raw_flight_log(1_500, DIMENSIONS, seed=9).sort_values(
+    ["year", "ac", "fl_serial"], ignore_index=True
+)
+
+
+def test_regroup_keeps_every_sheet_in_one_chunk():
+    raw = add_formatted_serial_number(RAW)
+    legs = raw.groupby("formatted_serial_number", sort=False).size()
+    long_sheet = legs[legs >= 3].index[0]
+    start = raw.index[raw["formatted_serial_number"] == long_sheet][0]
+
+    # A sheet spread over three chunks, single-row and empty chunks
+    bounds = [0, start + 1, start + 2, start + 2, start + 3, start + 4, 700, len(raw)]
+    chunks = [raw.iloc[a:b] for a, b in zip(bounds, bounds[1:])]
+    regrouped = list(regroup_by_sheet(iter(chunks)))
+
+    assert all(len(chunk) for chunk in regrouped)
+    serials = [set(chunk["formatted_serial_number"]) for chunk in regrouped]
+    assert sum(len(s) for s in serials) == len(set().union(*serials)) == len(legs)
+    pd.testing.assert_frame_equal(pd.concat(regrouped, ignore_index=True), raw)
+    assert list(regroup_by_sheet(iter([raw.iloc[:0]]))) == []
+
+
+def stream_read_sql(query, chunk_size):
+    # Server-side cursor fetches cut through sheets wherever they fall
+    for start in range(0, len(RAW), chunk_size):
+        yield RAW.iloc[start : start + chunk_size].reset_index(drop=True)
+
+
+@pytest.fixture
+def run(fake_context, mysql_standin, monkeypatch, without_post_process):
+    """Runs both pipelines on RAW streamed in `chunk_size` rows."""
+    monkeypatch.setattr(
+        extract, "get_raw_flight_log_columns", lambda: tuple(RAW.columns)
+    )
+    monkeypatch.setattr(extract, "read_postgres", lambda query, backend=None: RAW)
+    monkeypatch.setattr(extract, "_stream_read_sql", stream_read_sql)
+    context_class = fake_context(DIMENSIONS)
+
+    def run(chunk_size):
+        monkeypatch.setattr(settings, "EXTRACT_CHUNK_SIZE", chunk_size)
+        standin = mysql_standin()
+        context = runner.run_all_pipelines(context_class())
+        return context, standin.loaded()
+
+    return run
+
+
+def test_streamed_chunks_load_the_same_rows_as_one_extract(run):
+    _, whole = run(chunk_size=0)
+    context, streamed = run(chunk_size=25)
+    assert context.progress["extract"]["chunks"] > 30
+    assert len(whole["itxda_logbook_sheet"]) > 0
+    assert len(whole["itxda_logbook_entry"]) > 0
+    for table, df in streamed.items():
+        assert df.equals(whole[table]), table
@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_dimensions, generate_raw_flight_log
+from src.config.settings import settings
+from src.pipelines import changes, logbook_sheet, runner
+from src.pipelines.compact import compact_dtypes
+from src.pipelines.dimensions import build_lookups
+from src.pipelines.extract import add_formatted_serial_number
+from src.pipelines.fingerprints import (
+    FingerprintStore,
+    diff_fingerprints,
+    sheet_fingerprints,
+)
+
+DIMENSIONS = generate_dimensions(seed=5)
+LOOKUPS = build_lookups(DIMENSIONS)
+RAW = add_formatted_serial_number(generate_raw_flight_log(2_000, DIMENSIONS, seed=5))
+
+
+def fingerprints(*rows):
+    return pd.DataFrame(
+        rows, columns=["formatted_serial_number", "flight_date", "fingerprint"]
+    ).astype({"fingerprint": np.uint64})
+
+
+def test_sheet_fingerprints_ignore_dtypes_and_leg_order():
+    expected = sheet_fingerprints(RAW).set_index("formatted_serial_number")
+    shuffled = compact_dtypes(RAW.sample(frac=1, random_state=0))
+    actual = sheet_fingerprints(shuffled).set_index("formatted_serial_number")
+    pd.testing.assert_frame_equal(actual.loc[expected.index], expected)
+
+    corrected = RAW.copy()
+    corrected.loc[0, "adult"] += 1
+    changed = sheet_fingerprints(corrected).set_index("formatted_serial_number")
+    differs = changed["fingerprint"] != expected["fingerprint"]
+    assert differs[differs].index.tolist() == [RAW.at[0, "formatted_serial_number"]]
+
+
+def test_diff_fingerprints():
+    current = fingerprints(
+        ("new", "2024-01-05", 1),
+        ("same", "2024-01-05", 2),
+        ("fixed", "2024-01-06", 3),
+        ("cut", "2024-01-01", 4),
+    )
+    stored = fingerprints(
+        ("same", "2024-01-05", 2),
+        ("fixed", "2024-01-06", 30),
+        ("cut", "2023-12-31", 40),
+        ("gone", "2024-01-07", 5),
+        ("old", "2023-12-30", 6),
+    )
+    diff = diff_fingerprints(current, stored, since="2024-01-01")
+    assert diff["inserted"].tolist() == ["new"]
+    assert diff["changed"].tolist() == ["fixed"]
+    assert diff["deleted"].tolist() == ["gone"]
+
+
+def test_fingerprint_store_round_trip(tmp_path):
+    store = FingerprintStore(str(tmp_path / "fp.parquet"))
+    assert store.lookup(["a"]).empty
+    store.save(
+        fingerprints(("a", "2024-01-01", 2**64 - 1), ("b", "2024-02-01", 2))
+    )
+    store.save(fingerprints(("c", "2024-03-01", 3), ("a", "2024-01-02", 1)), ["b"])
+    assert store.lookup(["a", "b", "x"]).values.tolist() == [["a", "2024-01-02", 1]]
+    window = store.window("2024-01-01", "2024-03-01")
+    assert window["formatted_serial_number"].tolist() == ["a"]
+    assert store.window(None, "2025-01-01")["fingerprint"].dtype == np.uint64
+
+
+@pytest.fixture
+def run_changes(fake_context, mysql_standin, monkeypatch):
+    """
+    Runs both pipelines with change detection on a fresh stand-in. Sheet
+    updates are recorded in `updates` instead of being written, and `run(raw)`
+    returns the run's context.
+    """
+    monkeypatch.setattr(settings, "DETECT_CHANGES", True)
+    monkeypatch.setattr(settings, "EXTRACT_CHUNK_SIZE", 300)
+    standin = mysql_standin()
+    updates = []
+    monkeypatch.setattr(
+        logbook_sheet, "update_logbook_sheets", lambda cursor, df: updates.append(df)
+    )
+
+    class FakeExtract:
+        present = set()
+
+        def get_raw_flight_log_serials(self, serials):
+            return self.present & set(serials)
+
+    fake_extract = FakeExtract()
+    monkeypatch.setattr(changes, "extract", fake_extract)
+
+    def run(raw):
+        fake_extract.present = set(raw["formatted_serial_number"])
+        context = fake_context(DIMENSIONS, raw)(until="2030-01-01")
+        return runner.run_all_pipelines(context)
+
+    return standin, updates, run
+
+
+def entry_rows(standin, serial):
+    return standin._conn.execute(
+        "SELECT pax_adult FROM itxda_logbook_entry WHERE formatted_serial_number = ?",
+        (serial,),
+    ).fetchall()
+
+
+def test_corrected_and_deleted_sheets_reach_mysql(run_changes, without_post_process):
+    standin, updates, run = run_changes
+    loadable = RAW["customer"].map(LOOKUPS["customer"]).notna()
+    run(RAW)
+    entries = standin.count("itxda_logbook_entry")
+    sheets = standin.count("itxda_logbook_sheet")
+    assert entries == loadable.sum()
+    assert updates == []
+
+    serials = RAW.loc[loadable, "formatted_serial_number"].unique()
+    fixed, gone = serials[0], serials[1]
+    corrected = RAW[RAW["formatted_serial_number"] != gone].copy()
+    fixed_legs = corrected["formatted_serial_number"] == fixed
+    corrected.loc[fixed_legs, "adult"] = 99
+    corrected.loc[fixed_legs, "hours"] += 1
+
+    context = run(corrected)
+    assert context.progress["changes"] == {"inserted": 0, "changed": 1, "deleted": 1}
+    assert len(updates) == 1
+    assert updates[0]["formatted_serial_number"].tolist() == [fixed]
+    assert np.isclose(
+        updates[0]["total_flight_hours_decimal"].iat[0],
+        corrected.loc[fixed_legs, "hours"].sum(),
+    )
+    assert entry_rows(standin, fixed) == [(99,)] * (fixed_legs & loadable).sum()
+    assert entry_rows(standin, gone) == []
+    assert standin.count("itxda_logbook_entry") == loadable[corrected.index].sum()
+    assert standin.count("itxda_logbook_sheet") == sheets - 1
+    assert standin.count("itxda_schedule") == standin.count("itxda_logbook_entry")
+
+    # Nothing changed since: the next run only compares
+    context = run(corrected)
+    assert context.progress["changes"] == {"inserted": 0, "changed": 0, "deleted": 0}
+    assert len(updates) == 1
+
+
+def test_deleted_and_corrected_sheets_refresh_pilot_days(run_changes):
+    standin, updates, run = run_changes
+    standin.seed_airports(DIMENSIONS)
+    run(RAW)
+    before = standin.pilot_days()
+    assert len(before) > 0
+    pd.testing.assert_frame_equal(before, standin.rebuilt_pilot_days())
+
+    # One sheet disappears, another is handed over to a different pilot
+    serials = RAW["formatted_serial_number"].unique()
+    fixed, gone = serials[0], serials[1]
+    corrected = RAW[RAW["formatted_serial_number"] != gone].copy()
+    fixed_legs = corrected["formatted_serial_number"] == fixed
+    same_days = corrected[corrected["date"].isin(corrected.loc[fixed_legs, "date"])]
+    pilots = DIMENSIONS["pilot"]["name"]
+    idle = pilots[~pilots.isin(same_days["pic"]) & ~pilots.isin(same_days["sic"])]
+    corrected.loc[fixed_legs, "pic"] = idle.iat[0]
+
+    run(corrected)
+    after = standin.pilot_days()
+    pd.testing.assert_frame_equal(after, standin.rebuilt_pilot_days())
+    dropped = before.merge(after, how="left", indicator=True)["_merge"] == "left_only"
+    assert dropped.any()
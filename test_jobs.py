@@ -0,0 +1,126 @@
+import threading
+import warnings
+
+import pytest
+
+from starlette.exceptions import StarletteDeprecationWarning
+
+with warnings.catch_warnings():
+    # Starlette's TestClient warns about the httpx version it runs on
+    warnings.simplefilter("ignore", StarletteDeprecationWarning)
+    from fastapi.testclient import TestClient
+
+from src.api import main
+from src.api.jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, PipelineJobManager
+from src.config.settings import settings
+from src.pipelines.context import PipelineRunContext
+
+
+def make_manager(run):
+    return PipelineJobManager(
+        run=run, new_context=lambda: PipelineRunContext(until="2024-01-01")
+    )
+
+
+def test_triggers_coalesce_while_a_job_is_in_flight():
+    release = threading.Event()
+
+    def run(context):
+        context.record_progress("extract", chunks=1, rows=10)
+        release.wait(5)
+
+    manager = make_manager(run)
+    first, created = manager.submit()
+    second, created_again = manager.submit()
+    assert created and not created_again
+    assert second is first
+    assert first.coalesced_triggers == 1
+
+    release.set()
+    manager.shutdown()
+    job = manager.get(first.id).to_dict()
+    assert job["status"] == SUCCEEDED
+    assert job["stages"]["extract"] == {"chunks": 1, "rows": 10}
+
+
+def test_new_job_after_the_previous_one_finished():
+    def run(context):
+        raise RuntimeError("boom")
+
+    manager = make_manager(run)
+    first, _ = manager.submit()
+    manager._executor.submit(lambda: None).result()
+    second, created = manager.submit()
+    manager.shutdown()
+    assert created and second is not first
+    assert first.status == FAILED and first.error == "boom"
+
+
+def test_jobs_of_two_processes_never_run_at_once():
+    # Each manager stands for an API process sharing PIPELINE_STATE_DIR
+    running = []
+    overlapped = []
+    release = threading.Event()
+
+    def run(context):
+        running.append(1)
+        overlapped.append(len(running) > 1)
+        release.wait(5)
+        running.pop()
+
+    managers = [make_manager(run), make_manager(run)]
+    first, _ = managers[0].submit()
+    second, _ = managers[1].submit()
+    assert not second.wait(0.2)
+    assert {first.status, second.status} == {RUNNING, QUEUED}
+
+    release.set()
+    for manager in managers:
+        manager.shutdown()
+    assert first.status == second.status == SUCCEEDED
+    assert overlapped == [False, False]
+
+
+@pytest.fixture
+def call_afl(monkeypatch):
+    """Calls /afl with a job manager running `run` and returns the response."""
+    monkeypatch.setattr(settings, "SECRET_KEY", "secret")
+    key = main.caesar_cipher("secret", settings.CAESAR_SHIFT)
+
+    def call(run, wait):
+        manager = make_manager(run)
+        monkeypatch.setattr(main, "job_manager", manager)
+        try:
+            return TestClient(main.app).get(
+                f"/afl?wait={wait}", headers={"X-Key": key}
+            )
+        finally:
+            manager.shutdown()
+
+    return call
+
+
+def test_afl_waiting_for_a_failed_job_returns_its_error(call_afl):
+    def run(context):
+        raise RuntimeError("boom")
+
+    response = call_afl(run, wait=5)
+    assert response.status_code == 500
+    body = response.json()
+    assert body["status"] == "failed" and body["job"]["status"] == FAILED
+    assert body["detail"] == "boom" and body["job"]["error"] == "boom"
+    assert body["job_id"] == body["job"]["job_id"]
+
+
+def test_afl_returns_the_outcome_only_when_the_job_finished_in_time(call_afl):
+    release = threading.Event()
+    response = call_afl(lambda context: None, wait=5)
+    assert response.status_code == 200
+    assert response.json()["status"] == "success"
+
+    threading.Timer(0.2, release.set).start()
+    response = call_afl(lambda context: release.wait(5), wait=0.05)
+    assert response.status_code == 202
+    body = response.json()
+    assert body["status"] == "accepted"
+    assert body["job"]["status"] in (QUEUED, RUNNING)
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.pipelines.extract import add_sheet_keys
+from src.pipelines.keys import (
+    SHEET_KEY,
+    SHEET_SERIAL,
+    confirm_sheets,
+    encode_sheet_keys,
+    isin_sheets,
+    sheet_lookup,
+    unique_serials,
+)
+from src.pipelines.logbook_sheet import aggregate_sheets
+
+
+def make_raw():
+    dates = ["2024-05-02", "2024-05-01", "2024-05-01", "2025-01-01", "2025-01-02"]
+    return add_sheet_keys(
+        pd.DataFrame(
+            {
+                "year": [2024, 2024, 2024, 2025, 2025],
+                "ac": ["PK-A", "PK-A", "PK-B", "PK-A", None],
+                "fl_serial": ["1", "1", "7", "1", "3"],
+                "date": pd.to_datetime(dates).date,
+                "start": [1.0, 0.5, 3.0, 9.0, 4.0],
+                "end": [1.5, 1.0, 4.0, 9.5, 5.0],
+                "hours": [0.5, 0.5, 1.0, 0.5, 1.0],
+                "landings": [1, 1, 2, 1, 1],
+            }
+        )
+    )
+
+
+def test_sheet_keys_match_across_frames():
+    raw = make_raw()
+    assert raw[SHEET_KEY].dtype == np.uint64
+    assert "formatted_serial_number" not in raw.columns
+    # MySQL only hands back the strings; they must encode to the same keys
+    existing = pd.Series(["2024_PK-B_7", "2023_PK-B_7"])
+    assert isin_sheets(raw, existing).tolist() == [False, False, True, False, False]
+    assert encode_sheet_keys(["2024_PK-A_1"])[0] == raw[SHEET_KEY].iat[0]
+    # Compacted parts hash the same
+    compacted = raw.drop(columns=SHEET_KEY).astype({"year": "int16", "ac": "category"})
+    assert (add_sheet_keys(compacted)[SHEET_KEY] == raw[SHEET_KEY]).all()
+    assert unique_serials(raw.iloc[:4]).tolist() == [
+        "2024_PK-A_1",
+        "2024_PK-B_7",
+        "2025_PK-A_1",
+    ]
+
+
+def test_key_collisions_are_not_matches():
+    raw = make_raw()
+    # Give the PK-A sheet of 2024 the key of another serial
+    raw[SHEET_KEY] = raw[SHEET_KEY].where(
+        raw["ac"].ne("PK-A") | raw["year"].ne(2024), encode_sheet_keys(["2023_X_9"])[0]
+    )
+    assert not isin_sheets(raw, ["2023_X_9"]).any()
+    assert isin_sheets(raw, ["2023_X_9", "2024_PK-A_1"]).tolist()[:2] == [True, True]
+
+    sheets = pd.DataFrame(
+        {"formatted_serial_number": ["2023_X_9"], "logsheet_id": [5]}
+    )
+    entries = raw.assign(formatted_serial_number=["2024_PK-A_1"] * 2 + ["x"] * 3)
+    merged = entries.merge(sheet_lookup(sheets), how="left", on=SHEET_KEY)
+    assert merged[SHEET_SERIAL].notna().sum() == 2
+    confirmed = confirm_sheets(merged, ["logsheet_id"])
+    assert confirmed["logsheet_id"].isna().all()
+    assert SHEET_SERIAL not in confirmed.columns
+
+    colliding = pd.DataFrame(
+        {
+            "formatted_serial_number": ["2023_X_9", "2024_PK-A_1"],
+            SHEET_KEY: [raw[SHEET_KEY].iat[0]] * 2,
+        }
+    )
+    with pytest.raises(ValueError):
+        sheet_lookup(colliding)
+
+
+def test_aggregate_sheets_groups_on_keys():
+    agg_df = aggregate_sheets(make_raw())
+    # Legs without a serial are dropped, like a groupby on the string did
+    assert agg_df["formatted_serial_number"].tolist() == [
+        "2024_PK-A_1",
+        "2024_PK-B_7",
+        "2025_PK-A_1",
+    ]
+    first = agg_df.iloc[0]
+    assert str(first["flight_date"]) == "2024-05-01"
+    assert (first["hobbs_start"], first["hobbs_end"]) == (0.5, 1.5)
+    assert first["total_legs"] == 2
+    assert agg_df["aircraft_registration"].tolist() == ["PK-A", "PK-B", "PK-A"]
+    assert agg_df["raw_serial_number"].tolist() == ["1", "7", "1"]
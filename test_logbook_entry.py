@@ -0,0 +1,176 @@
+from datetime import time, timedelta
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.legacy import map_airport_codes
+from src.db.bulk import bulk_insert
+from src.pipelines.dimensions import build_airport_lookup, resolve_airport_codes
+from src.pipelines.logbook_entry import (
+    build_note,
+    build_notes,
+    build_schedules,
+    timedelta_to_hhmmss,
+)
+
+
+def reference_timedelta_to_hhmmss(col, accumulate_days: bool = True):
+    # The per-element implementation timedelta_to_hhmmss used to have
+    s = pd.to_timedelta(col, errors="coerce")
+    if accumulate_days:
+        total_secs = s.dt.total_seconds().fillna(0).astype(int)
+    else:
+        total_secs = (s.dt.total_seconds() % 86400).fillna(0).astype(int)
+    hours = total_secs // 3600
+    mins = (total_secs % 3600) // 60
+    secs = total_secs % 60
+    return (
+        hours.map(lambda x: f"{int(x):02d}")
+        + ":"
+        + mins.map(lambda x: f"{int(x):02d}")
+        + ":"
+        + secs.map(lambda x: f"{int(x):02d}")
+    )
+
+
+def make_entries(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+
+    def ids():
+        return pd.array(
+            np.where(rng.random(n) < 0.3, None, rng.integers(1, 500, n)), dtype="Int64"
+        )
+
+    return pd.DataFrame(
+        {
+            "departure_id": ids(),
+            "arrival_id": ids(),
+            "pilot_id": ids(),
+            "copilot_id": np.where(rng.random(n) < 0.3, np.nan, 7.0),
+            "from": rng.choice(["WAAA", "DJJ", None, "XX"], n),
+            "to": rng.choice(["WIII", "CGK", None], n),
+            "dep": rng.choice(["Halim", "Wamena", None], n),
+            "arr": rng.choice(["Merauke", np.nan], n),
+            "pic": rng.choice(["Jeremy Beck", "Anton Bozian"], n),
+            "sic": rng.choice(["Christofer Lee", None, np.nan], n),
+        },
+        index=rng.permutation(n) + 1000,
+    )
+
+
+def assert_same_notes(df):
+    expected = df.apply(build_note, axis=1)
+    actual = build_notes(df)
+    assert actual.index.equals(df.index)
+    assert actual.isna().equals(expected.isna())
+    assert (actual[actual.notna()] == expected[expected.notna()]).all()
+
+
+def test_build_notes_matches_build_note():
+    assert_same_notes(make_entries())
+
+
+def test_build_notes_without_missing_ids():
+    df = make_entries(50).assign(
+        departure_id=1, arrival_id=2, pilot_id=3, copilot_id=4
+    )
+    assert build_notes(df).isna().all()
+    assert_same_notes(df)
+
+
+def test_build_notes_empty_frame():
+    assert build_notes(make_entries(0)).empty
+
+
+def test_timedelta_to_hhmmss_matches_reference():
+    values = pd.Series(
+        [
+            timedelta(hours=1, minutes=21),
+            timedelta(days=1, hours=2, seconds=5),
+            timedelta(hours=125, minutes=59, seconds=59),
+            timedelta(seconds=-90),
+            pd.NaT,
+            "08:30:00",
+            "not a time",
+            None,
+        ],
+        index=[3, 1, 4, 1, 5, 9, 2, 6],
+        name="take_off_utc",
+        dtype=object,
+    )
+    for accumulate_days in (True, False):
+        expected = reference_timedelta_to_hhmmss(values, accumulate_days)
+        actual = timedelta_to_hhmmss(values, accumulate_days)
+        pd.testing.assert_series_equal(actual, expected, check_dtype=False)
+
+
+def test_timedelta_to_hhmmss_from_time_strings():
+    values = pd.Series([time(1, 21), None, time(23, 59, 59)]).astype("string")
+    assert timedelta_to_hhmmss(values).tolist() == ["01:21:00", "00:00:00", "23:59:59"]
+
+
+def test_schedules_keep_bad_and_missing_times_null(mysql_standin):
+    entries = pd.DataFrame(
+        {
+            "flight_date": ["2024-05-01"] * 5,
+            "take_off_utc": [time(8, 30), "", "not a time", None, "07:05:00"],
+            "land_utc": [time(9, 45), "09:3O", None, pd.NA, "xx"],
+            "flight_hours_decimal": [1.25, 1.0, 1.0, 1.0, 1.0],
+            "flight_type_id": [1] * 5,
+        },
+        dtype=object,
+    )
+    schedules = build_schedules(entries, np.arange(10, 15))
+    assert schedules["etd_utc"].tolist() == ["08:30:00", None, None, None, "07:05:00"]
+    assert schedules["eta_utc"].tolist() == ["09:45:00", None, None, None, None]
+
+    standin = mysql_standin()
+    with standin.cursor() as cursor:
+        bulk_insert(cursor, "itxda_schedule", schedules)
+    rows = standin._conn.execute(
+        "SELECT id, etd_utc, eta_utc FROM itxda_schedule ORDER BY id"
+    ).fetchall()
+    assert rows == [
+        (10, "08:30:00", "09:45:00"),
+        (11, None, None),
+        (12, None, None),
+        (13, None, None),
+        (14, "07:05:00", None),
+    ]
+
+
+def test_resolve_airport_codes_matches_reference():
+    airports = pd.DataFrame(
+        {
+            "dev_id": [1, 2, 3, 4],
+            "iata_code": ["DJJ", "CGK", None, "WAAA"],
+            "icao_code": ["WAJJ", "WIII", "WAAA", None],
+        }
+    )
+    df = make_entries()[["from", "to"]].dropna().reset_index(drop=True)
+    expected = map_airport_codes(df, "from", "departure_id", airports)
+    expected = map_airport_codes(expected, "to", "arrival_id", airports)
+
+    unresolved = resolve_airport_codes(
+        df,
+        {"from": "departure_id", "to": "arrival_id"},
+        build_airport_lookup(airports),
+    )
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+    assert unresolved == {"XX"}
+
+
+def test_resolve_airport_codes_leaves_missing_codes_unresolved():
+    # The merges used to match a missing code to an airport with a null code
+    airports = pd.DataFrame(
+        {"dev_id": [1, 2], "iata_code": ["DJJ", None], "icao_code": [None, "WAAA"]}
+    )
+    df = pd.DataFrame({"from": ["DJJ", None, np.nan], "to": ["WAAA", "XX", None]})
+    unresolved = resolve_airport_codes(
+        df, {"from": "departure_id", "to": "arrival_id"}, build_airport_lookup(airports)
+    )
+    assert df["departure_id"].tolist()[0] == 1
+    assert df["departure_id"].isna().tolist() == [False, True, True]
+    assert df["arrival_id"].tolist()[0] == 2
+    assert df["arrival_id"].isna().tolist() == [False, True, True]
+    assert unresolved == {"XX"}
@@ -0,0 +1,33 @@
+import warnings
+
+import pandas as pd
+
+from src.pipelines.logbook_sheet import aggregate_sheets, build_logbook_sheets
+
+AIRCRAFT_IDS = pd.Series({"PK-A": 10})
+
+
+def test_building_sheets_from_empty_or_all_na_aggregates_doesnt_warn():
+    raw = pd.DataFrame(
+        {
+            "year": [2024, 2024],
+            "ac": ["PK-A", "PK-B"],
+            "fl_serial": ["1", "2"],
+            "date": [None, None],
+            "start": [1.5, None],
+            "end": [2.0, None],
+            "hours": [0.5, None],
+            "landings": [1, 1],
+        }
+    )
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        for agg_df in [aggregate_sheets(raw), aggregate_sheets(raw).iloc[:0]]:
+            sheets = build_logbook_sheets(agg_df, None, AIRCRAFT_IDS)
+            assert len(sheets) == len(agg_df)
+            assert sheets["id"].dtype == object and sheets["id"].isna().all()
+
+    assert sheets.columns[:2].tolist() == ["id", "doc_img"]
+    sheets = build_logbook_sheets(aggregate_sheets(raw), None, AIRCRAFT_IDS)
+    assert sheets["aircraft_id"].tolist()[0] == 10
+    assert pd.isna(sheets["aircraft_id"].tolist()[1])
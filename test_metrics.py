@@ -0,0 +1,37 @@
+from src.metrics import MetricsRegistry, RunMetrics, record_round_trips
+from src.pipelines.parallel import run_concurrently
+
+
+def test_round_trips_follow_the_stage_into_worker_threads():
+    metrics = RunMetrics()
+    with metrics.stage("logbook_entry", "extract") as stage:
+        run_concurrently({"a": record_round_trips, "b": record_round_trips})
+        stage.add(rows_out=5)
+    record_round_trips()  # outside any stage: not attributed
+
+    extract = metrics.to_dict()["logbook_entry"]["extract"]
+    assert extract["round_trips"] == 2
+    assert extract["rows_out"] == 5
+    assert extract["calls"] == 1
+
+
+def test_iter_stage_counts_rows_of_each_step():
+    metrics = RunMetrics()
+    chunks = list(metrics.iter_stage("shared", "extract", [[1, 2], [3]]))
+    assert chunks == [[1, 2], [3]]
+    assert metrics.to_dict()["shared"]["extract"]["rows_out"] == 3
+
+
+def test_registry_renders_prometheus_counters():
+    metrics = RunMetrics()
+    with metrics.stage("logbook_sheet", "load") as stage:
+        stage.add(rows_in=10, rows_out=7)
+    registry = MetricsRegistry()
+    registry.observe_run(metrics, "succeeded")
+    registry.observe_run(metrics, "succeeded")
+
+    text = registry.render()
+    assert 'itxda_pipeline_runs_total{status="succeeded"} 2' in text
+    assert (
+        'itxda_stage_rows_out_total{pipeline="logbook_sheet",stage="load"} 14' in text
+    )
@@ -0,0 +1,34 @@
+import threading
+
+from src.pipelines.parallel import gather, run_concurrently, submit_all
+
+
+def test_run_concurrently_overlaps_tasks():
+    barrier = threading.Barrier(3, timeout=5)
+
+    def task(value):
+        barrier.wait()  # only passes if all three run at the same time
+        return value
+
+    results = run_concurrently(
+        {name: (lambda name=name: task(name)) for name in "abc"}, max_workers=3
+    )
+    assert results == {"a": "a", "b": "b", "c": "c"}
+
+
+def test_gather_raises_first_error_without_waiting_for_the_rest():
+    release = threading.Event()
+
+    def fail():
+        raise ValueError("boom")
+
+    futures = submit_all({"fail": fail, "slow": lambda: release.wait(5)})
+    try:
+        gather(futures)
+        raise AssertionError("gather should have raised")
+    except ValueError as e:
+        assert str(e) == "boom"
+        # Either still running or cancelled before it started, never awaited
+        assert futures["slow"].cancelled() or not futures["slow"].done()
+    finally:
+        release.set()
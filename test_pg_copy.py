@@ -0,0 +1,173 @@
+import contextlib
+import threading
+from datetime import date, time
+from types import SimpleNamespace
+
+import pandas as pd
+
+from src.db.pg_copy import read_sql_copy
+
+COLUMNS = [
+    ("year", 23),
+    ("ac", 1043),
+    ("date", 1082),
+    ("hours", 1700),
+    ("landings", 20),
+    ("take_off_utc", 1083),
+    ("verified", 16),
+    ("note", 25),
+]
+
+# What COPY ... (FORMAT csv, NULL '\N') sends for four rows; text values
+# starting with a backslash come escaped with another
+COPY_OUTPUT = (
+    b"2024,PK-ABC,2024-01-02,1.5,2,01:21:00,t,\"a, b\"\n"
+    b"2024,PK-ABD,2024-01-03,2,\\N,\\N,f,\"\"\n"
+    b"2023,PK-ABE,\\N,\\N,1,23:59:59.5,t,\\N\n"
+    b"2023,PK-ABF,\\N,\\N,1,\\N,f,\\\\N\n"
+)
+
+
+class FakeCursor:
+    def __init__(self, output):
+        self.output = output
+        self.executed = []
+        self.description = None
+
+    def execute(self, sql):
+        self.executed.append(sql)
+        self.description = [SimpleNamespace(name=n, type_code=o) for n, o in COLUMNS]
+
+    def close(self):
+        pass
+
+
+class Psycopg2Cursor(FakeCursor):
+    def copy_expert(self, sql, file):
+        self.executed.append(sql)
+        file.write(self.output)
+
+
+class Psycopg3Cursor(FakeCursor):
+    @contextlib.contextmanager
+    def copy(self, sql):
+        self.executed.append(sql)
+        yield [self.output[:50], self.output[50:]]
+
+
+class FakeEngine:
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.closed = False
+
+    def raw_connection(self):
+        return SimpleNamespace(cursor=lambda: self.cursor, close=self.close)
+
+    def close(self):
+        self.closed = True
+
+
+def expected_frame():
+    return pd.DataFrame(
+        {
+            "year": [2024, 2024, 2023, 2023],
+            "ac": ["PK-ABC", "PK-ABD", "PK-ABE", "PK-ABF"],
+            "date": pd.Series([date(2024, 1, 2), date(2024, 1, 3), None, None]),
+            "hours": [1.5, 2.0, None, None],
+            "landings": [2.0, None, 1.0, 1.0],
+            "take_off_utc": pd.Series(
+                [time(1, 21), None, time(23, 59, 59, 500000), None]
+            ),
+            "verified": [True, False, True, False],
+            # A real "\N" is text, not NULL
+            "note": ["a, b", "", None, "\\N"],
+        }
+    )
+
+
+def test_read_sql_copy_matches_read_sql_dtypes():
+    for cursor_class in (Psycopg2Cursor, Psycopg3Cursor):
+        engine = FakeEngine(cursor_class(COPY_OUTPUT))
+        df = read_sql_copy("SELECT * FROM public.raw_flight_log", engine)
+        pd.testing.assert_frame_equal(df, expected_frame())
+        assert engine.closed
+        copy = engine.cursor.executed[1]
+        assert copy.startswith("COPY (SELECT ")
+        assert "FROM (SELECT * FROM public.raw_flight_log) q) TO STDOUT" in copy
+        # Only the text columns are escaped
+        assert copy.count("CASE WHEN") == 2
+
+
+def test_read_sql_copy_in_chunks():
+    engine = FakeEngine(Psycopg2Cursor(COPY_OUTPUT))
+    chunks = list(read_sql_copy("SELECT 1", engine, chunksize=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2]
+    df = pd.concat(chunks, ignore_index=True)
+    assert df["date"].tolist() == expected_frame()["date"].tolist()
+
+
+def test_read_sql_copy_empty_result():
+    engine = FakeEngine(Psycopg2Cursor(b""))
+    df = read_sql_copy("SELECT 1", engine)
+    assert df.empty
+    assert list(df.columns) == [name for name, _ in COLUMNS]
+    assert list(read_sql_copy("SELECT 1", engine, chunksize=2)) == []
+
+
+class StreamingCursor(FakeCursor):
+    """psycopg2 cursor whose COPY pauses midway until `resume` is set."""
+
+    def __init__(self, rows, fail=False):
+        super().__init__(b"")
+        row = b"2024,PK-ABC,2024-01-02,1.5,2,01:21:00,t,note\n"
+        self.head = row * rows
+        self.tail = row * 10
+        self.fail = fail
+        self.resume = threading.Event()
+        self.finished = False
+
+    def copy_expert(self, sql, file):
+        file.write(self.head)
+        self.resume.wait(5)
+        if self.fail:
+            raise RuntimeError("connection lost")
+        file.write(self.tail)
+        self.finished = True
+
+
+def test_read_sql_copy_chunks_while_streaming():
+    # Enough rows for the parser to fill its buffer before the COPY pauses
+    cursor = StreamingCursor(rows=20_000)
+    engine = FakeEngine(cursor)
+    chunks = read_sql_copy("SELECT 1", engine, chunksize=1_000)
+    first = next(chunks)
+    assert len(first) == 1_000 and not cursor.finished
+    cursor.resume.set()
+    assert sum(len(chunk) for chunk in chunks) == 20_010 - 1_000
+    assert cursor.finished and engine.closed
+
+
+def test_read_sql_copy_chunks_raise_when_the_copy_fails_midway():
+    cursor = StreamingCursor(rows=20_000, fail=True)
+    engine = FakeEngine(cursor)
+    chunks = read_sql_copy("SELECT 1", engine, chunksize=1_000)
+    next(chunks)
+    cursor.resume.set()
+    rows = 1_000
+    try:
+        for chunk in chunks:
+            rows += len(chunk)
+    except RuntimeError as error:
+        assert str(error) == "connection lost"
+    else:
+        raise AssertionError("expected the COPY error")
+    assert rows < 20_000 and engine.closed
+
+
+def test_closing_the_chunks_early_ends_the_copy():
+    cursor = Psycopg2Cursor(COPY_OUTPUT * 50_000)
+    engine = FakeEngine(cursor)
+    chunks = read_sql_copy("SELECT 1", engine, chunksize=100)
+    assert len(next(chunks)) == 100
+    chunks.close()
+    assert engine.closed
@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_dimensions, generate_raw_flight_log
+from src.config.settings import settings
+from src.pipelines import logbook_entry, runner
+from src.pipelines.extract import add_formatted_serial_number
+
+DIMENSIONS = generate_dimensions(seed=5)
+RAW = add_formatted_serial_number(generate_raw_flight_log(2_000, DIMENSIONS, seed=5))
+# Three runs, each adding a random third of the sheets, so later runs land
+# on pilot days that earlier runs already filled
+SERIALS = RAW["formatted_serial_number"].unique()
+RUN_SERIALS = np.array_split(np.random.default_rng(4).permutation(SERIALS), 3)
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(settings, "EXTRACT_CHUNK_SIZE", 300)
+    # Several commit and IN-list chunks per scoped update
+    monkeypatch.setattr(settings, "LOAD_COMMIT_ROWS", 100)
+    monkeypatch.setattr(settings, "DEDUP_CHUNK_SIZE", 30)
+
+
+@pytest.fixture
+def runs(fake_context, mysql_standin, monkeypatch):
+    """
+    Loads the RUN_SERIALS one run after the other into a fresh stand-in,
+    post-processed incrementally or not, and returns `snapshot(standin)`
+    as taken after every run.
+    """
+
+    def load(incremental, snapshot):
+        monkeypatch.setattr(settings, "INCREMENTAL_POST_PROCESS", incremental)
+        standin = mysql_standin()
+        standin.seed_airports(DIMENSIONS)
+        snapshots = []
+        for serials in RUN_SERIALS:
+            raw = RAW[RAW["formatted_serial_number"].isin(serials)]
+            runner.run_all_pipelines(fake_context(DIMENSIONS, raw)())
+            snapshots.append(snapshot(standin))
+        return snapshots
+
+    return load
+
+
+def test_scoped_updates_match_the_full_sweep(runs):
+    def post_processed(standin):
+        return {
+            table: standin.contents(table)
+            for table in [
+                "itxda_logbook_sheet",
+                "itxda_logbook_entry",
+                "itxda_schedule",
+            ]
+        }
+
+    swept = runs(incremental=False, snapshot=post_processed)[-1]
+    scoped = runs(incremental=True, snapshot=post_processed)[-1]
+
+    assert len(swept["itxda_schedule"]) > 0
+    assert swept["itxda_schedule"]["etd_lt"].notna().any()
+    assert (swept["itxda_logbook_entry"]["is_locked"] == 1).all()
+    assert (swept["itxda_logbook_sheet"]["is_verified"] == 1).all()
+    for table, df in swept.items():
+        assert scoped[table].equals(df), table
+
+
+def test_refreshed_pilot_days_match_the_rebuild(runs):
+    def pilot_days(standin):
+        return standin.contents("flight_pilot_schedule", exclude=("id", "created"))
+
+    rebuilt = runs(incremental=False, snapshot=pilot_days)
+    refreshed = runs(incremental=True, snapshot=pilot_days)
+
+    assert 0 < len(rebuilt[0]) < len(rebuilt[-1])
+    # Later sheets moved the first departure of days already filled
+    moved = rebuilt[0].merge(rebuilt[-1], on=["pilot", "duty_date"])
+    assert (moved["base_x"] != moved["base_y"]).any()
+    for refreshed_df, expected in zip(refreshed, rebuilt):
+        assert refreshed_df.equals(expected)
+
+
+@pytest.mark.parametrize("dict_rows", [False, True])
+def test_pilot_days_refresh_through_either_cursor(
+    fake_context, mysql_standin, monkeypatch, dict_rows
+):
+    # The testing-mode cursor returns tuples, the production DictCursor dicts
+    monkeypatch.setattr(settings, "INCREMENTAL_POST_PROCESS", True)
+    standin = mysql_standin(dict_rows=dict_rows)
+    standin.seed_airports(DIMENSIONS)
+    runner.run_all_pipelines(fake_context(DIMENSIONS, RAW)())
+    assert len(standin.pilot_days()) > 0
+    pd.testing.assert_frame_equal(standin.pilot_days(), standin.rebuilt_pilot_days())
+
+    with standin.cursor() as cursor:
+        logbook_entry.delete_entries(cursor, SERIALS[:20])
+    standin.commit()
+    pd.testing.assert_frame_equal(standin.pilot_days(), standin.rebuilt_pilot_days())
+
+
+@pytest.fixture
+def resumed_run(fake_context, mysql_standin, monkeypatch):
+    """
+    Returns `run(incremental, fail_at)`: a run of RAW into a fresh stand-in
+    that raises once `fail_at` (a logbook_entry function) is called, after
+    what earlier chunks loaded was committed, then the run that resumes it.
+    Returns the loaded tables and pilot days, with those of a run that went
+    through as `expected`.
+    """
+    context_class = fake_context(DIMENSIONS, RAW)
+
+    def load():
+        standin = mysql_standin()
+        standin.seed_airports(DIMENSIONS)
+        return standin
+
+    def run(incremental, fail_at, calls):
+        monkeypatch.setattr(settings, "INCREMENTAL_POST_PROCESS", incremental)
+        standin = load()
+        runner.run_all_pipelines(context_class())
+        expected = standin.loaded(), standin.pilot_days()
+
+        standin = load()
+        original = getattr(logbook_entry, fail_at)
+        failing_calls = []
+
+        def failing(*args, **kwargs):
+            failing_calls.append(1)
+            if len(failing_calls) == calls:
+                raise RuntimeError("connection lost")
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(logbook_entry, fail_at, failing)
+        with pytest.raises(RuntimeError):
+            runner.run_all_pipelines(context_class())
+        assert 0 < standin.count("itxda_logbook_entry")
+        monkeypatch.setattr(logbook_entry, fail_at, original)
+        runner.run_all_pipelines(context_class())
+        return (standin.loaded(), standin.pilot_days()), expected
+
+    return run
+
+
+@pytest.mark.parametrize(
+    "incremental, fail_at, calls",
+    [
+        # Between two load transactions
+        (True, "_load_entry_chunk", 4),
+        (False, "_load_entry_chunk", 4),
+        # Everything loaded, the sweep not run
+        (False, "run_post_process_updates", 1),
+    ],
+)
+def test_resumed_run_post_processes_what_the_failed_run_committed(
+    resumed_run, incremental, fail_at, calls
+):
+    (tables, pilot_days), (expected_tables, expected_pilot_days) = resumed_run(
+        incremental, fail_at, calls
+    )
+    assert (expected_tables["itxda_logbook_entry"]["is_locked"] == 1).all()
+    for table, df in tables.items():
+        assert df.equals(expected_tables[table]), table
+    pd.testing.assert_frame_equal(pilot_days, expected_pilot_days)
@@ -0,0 +1,76 @@
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_dimensions, generate_raw_flight_log
+from src.config.settings import settings
+from src.db.queries import DEDUP_STAGING_TABLE, fetch_existing_rows
+from src.pipelines.dimensions import build_lookups
+from src.pipelines.extract import add_formatted_serial_number
+from src.pipelines.logbook_sheet import load_logbook_sheets, transform_logbook_data
+
+DIMENSIONS = generate_dimensions(seed=8)
+SHEETS = transform_logbook_data(
+    add_formatted_serial_number(generate_raw_flight_log(1_000, DIMENSIONS, seed=8)),
+    DIMENSIONS["aircraft_detail"],
+    build_lookups(DIMENSIONS)["aircraft_detail"],
+)
+MODES = ["client", "in", "staging"]
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    # Several probe chunks even for a few hundred keys
+    monkeypatch.setattr(settings, "DEDUP_CHUNK_SIZE", 7)
+
+
+def probe(cursor, keys, mode):
+    rows = fetch_existing_rows(
+        cursor,
+        "itxda_logbook_sheet",
+        "formatted_serial_number",
+        keys,
+        ["id", "formatted_serial_number"],
+        mode=mode,
+    )
+    return rows.astype({"id": "int64"}).sort_values("id").reset_index(drop=True)
+
+
+def test_dedup_modes_find_the_same_rows(mysql_standin):
+    standin = mysql_standin()
+    loaded = SHEETS.iloc[::2]
+    load_logbook_sheets(loaded)
+
+    # Present and absent keys, repeats, a NULL and a quote
+    keys = list(SHEETS["formatted_serial_number"]) * 2 + [None, "2020_PK-O'X_1"]
+    with standin.cursor() as cursor:
+        found = {mode: probe(cursor, keys, mode) for mode in MODES}
+        empty = {mode: probe(cursor, [], mode) for mode in MODES}
+        cursor.execute(
+            "SELECT count(*) AS n FROM sqlite_temp_master WHERE name = %s",
+            [DEDUP_STAGING_TABLE],
+        )
+        leftover = cursor.fetchone()["n"]
+
+    assert len(found["client"]) == len(loaded)
+    for mode in MODES:
+        pd.testing.assert_frame_equal(found[mode], found["client"])
+        assert empty[mode].empty
+        assert list(empty[mode].columns) == ["id", "formatted_serial_number"]
+    assert leftover == 0
+
+
+def test_dedup_modes_load_the_same_sheets(mysql_standin, monkeypatch):
+    tables = {}
+    for mode in MODES:
+        standin = mysql_standin()
+        monkeypatch.setattr(settings, "DEDUP_MODE", mode)
+        load_logbook_sheets(SHEETS.iloc[::3])
+        # Overlaps the first load: only the missing sheets go in
+        logbook_sheet_df, sheet_ids = load_logbook_sheets(SHEETS)
+        assert len(logbook_sheet_df) == len(SHEETS)
+        assert len(sheet_ids) == len(SHEETS) - len(SHEETS.iloc[::3])
+        tables[mode] = standin.contents("itxda_logbook_sheet")
+
+    assert len(tables["client"]) == len(SHEETS)
+    for mode in MODES:
+        assert tables[mode].equals(tables["client"])
@@ -0,0 +1,46 @@
+import pytest
+
+from benchmarks.synthetic import generate_dimensions, generate_raw_flight_log
+from src.config.settings import settings
+from src.pipelines import logbook_entry, logbook_sheet, runner
+from src.pipelines.extract import add_formatted_serial_number
+
+DIMENSIONS = generate_dimensions(seed=7)
+RAW = add_formatted_serial_number(generate_raw_flight_log(1_500, DIMENSIONS, seed=7))
+
+
+@pytest.fixture
+def context_class(fake_context, monkeypatch, without_post_process):
+    # Hold raw_flight_log in memory, the snapshot the pipelines share
+    monkeypatch.setattr(settings, "EXTRACT_CHUNK_SIZE", 0)
+    return fake_context(DIMENSIONS, RAW)
+
+
+def test_shared_snapshot_loads_the_same_rows_as_separate_runs(
+    context_class, mysql_standin
+):
+    # Baseline: each pipeline extracts on its own
+    standin = mysql_standin()
+    logbook_sheet.run_logbook_sheet_pipeline(context_class())
+    logbook_entry.run_logbook_entry_pipeline(context_class())
+    separate = standin.loaded()
+    assert context_class.extractions == 2
+
+    # Both pipelines on one context: one extraction, the sheets handed over
+    context_class.extractions = 0
+    standin = mysql_standin()
+    context = context_class()
+    logbook_sheet.run_logbook_sheet_pipeline(context)
+    assert context.logbook_sheet_df is not None
+    logbook_entry.run_logbook_entry_pipeline(context)
+    for table, df in standin.loaded().items():
+        assert df.equals(separate[table]), table
+    assert context_class.extractions == 1
+
+    # The combined run
+    context_class.extractions = 0
+    standin = mysql_standin()
+    runner.run_all_pipelines(context_class())
+    for table, df in standin.loaded().items():
+        assert df.equals(separate[table]), table
+    assert context_class.extractions == 1
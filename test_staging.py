@@ -0,0 +1,154 @@
+import os
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_dimensions, generate_raw_flight_log
+from src.config.settings import settings
+from src.pipelines import extract, staging, watermark
+from src.pipelines.extract import add_formatted_serial_number
+
+RAW = add_formatted_serial_number(
+    generate_raw_flight_log(3_000, generate_dimensions(seed=2), seed=2)
+)
+
+
+class FakeExtract:
+    """Stands in for the Postgres extract and counts reads."""
+
+    def __init__(self):
+        self.reads = 0
+        self.regroup_by_sheet = extract.regroup_by_sheet
+
+    def _window(self, since, until):
+        self.reads += 1
+        dates = RAW["date"].astype(str)
+        in_window = dates < until
+        if since is not None:
+            in_window &= dates >= since
+        return RAW[in_window].reset_index(drop=True)
+
+    def get_raw_flight_logs(self, since, until):
+        return self._window(since, until)
+
+    def iter_raw_flight_logs(self, since, until, chunk_size):
+        df = self._window(since, until).sort_values(["year", "ac", "fl_serial"])
+        chunks = (df.iloc[i : i + chunk_size] for i in range(0, len(df), chunk_size))
+        return extract.regroup_by_sheet(chunks)
+
+
+@pytest.fixture
+def make_staging(monkeypatch):
+    def make():
+        fake = FakeExtract()
+        monkeypatch.setattr(staging, "extract", fake)
+        return staging.RawFlightLogStaging(), fake
+
+    return make
+
+
+def sort_rows(df):
+    return df.sort_values(["formatted_serial_number", "start"]).reset_index(drop=True)
+
+
+def test_staged_window_is_read_back_unchanged(make_staging):
+    raw_staging, fake = make_staging()
+    first = raw_staging.get_raw_flight_logs(None, "2023-01-01")
+    assert fake.reads == 1
+
+    # A narrower window is served from the staged fetch
+    again = raw_staging.get_raw_flight_logs("2020-03-01", "2022-06-01")
+    assert fake.reads == 1
+    expected = first[
+        (first["date"].astype(str) >= "2020-03-01")
+        & (first["date"].astype(str) < "2022-06-01")
+    ]
+    pd.testing.assert_frame_equal(sort_rows(again), sort_rows(expected))
+    assert isinstance(again["date"].iat[0], type(RAW["date"].iat[0]))
+
+    # A window reaching past the staged one goes back to the source
+    raw_staging.get_raw_flight_logs("2022-01-01", "2024-01-01")
+    assert fake.reads == 2
+
+
+def test_streamed_chunks_keep_sheets_together(make_staging):
+    raw_staging, fake = make_staging()
+    streamed = list(raw_staging.iter_raw_flight_logs("2020-01-01", "2024-01-01", 500))
+    replayed = list(raw_staging.iter_raw_flight_logs("2020-01-01", "2024-01-01", 500))
+    assert fake.reads == 1
+    for chunks in (streamed, replayed):
+        serials = [set(chunk["formatted_serial_number"]) for chunk in chunks]
+        assert all(a.isdisjoint(b) for i, a in enumerate(serials) for b in serials[:i])
+    pd.testing.assert_frame_equal(
+        sort_rows(pd.concat(replayed)), sort_rows(pd.concat(streamed))
+    )
+
+
+def test_interrupted_stream_is_not_published(make_staging):
+    raw_staging, fake = make_staging()
+    chunks = raw_staging.iter_raw_flight_logs(None, "2024-01-01", 500)
+    next(chunks)
+    chunks.close()
+    assert raw_staging.fetches() == []
+    assert raw_staging.read_staged(None, "2024-01-01") is None
+
+
+def test_sweep_drops_expired_fetches(make_staging):
+    raw_staging, fake = make_staging()
+    raw_staging.get_raw_flight_logs(None, "2021-01-01")
+    fetch = raw_staging.fetches()[0]
+    manifest = {"fetches": [{**fetch, "fetched_at": "2000-01-01T00:00:00"}]}
+    staging.write_json_state(staging.MANIFEST_FILE, manifest)
+
+    # A run still reading the fetch keeps it alive
+    with raw_staging._pinned(None, "2021-01-01") as pinned:
+        assert pinned["id"] == fetch["id"]
+        raw_staging.sweep()
+        assert len(raw_staging.fetches()) == 1
+
+    raw_staging.sweep()
+    assert raw_staging.fetches() == []
+    assert not os.path.exists(staging._fetch_dir(fetch["id"]))
+
+
+def test_fetch_is_not_reused_after_a_watermark_commit(make_staging):
+    raw_staging, fake = make_staging()
+    raw_staging.get_raw_flight_logs(None, "2023-01-01")
+    fetch = raw_staging.fetches()[0]
+
+    # A failed run leaves the watermark alone, so its retry reuses the fetch
+    raw_staging.get_raw_flight_logs("2022-01-01", "2023-01-01")
+    assert fake.reads == 1
+
+    # Once a run succeeds, the next one re-reads its lookback from the source
+    manifest = {"fetches": [{**fetch, "fetched_at": "2000-01-01T00:00:00"}]}
+    staging.write_json_state(staging.MANIFEST_FILE, manifest)
+    committed = {"last_date": "2023-01-01", "updated_at": "2000-01-01T00:00:01"}
+    watermark.write_json_state(watermark.WATERMARK_FILE, {"logbook_sheet": committed})
+    raw_staging.get_raw_flight_logs("2022-01-01", "2023-01-01")
+    assert fake.reads == 2
+
+    # The fetch taken by that read is newer than the commit
+    raw_staging.get_raw_flight_logs("2022-06-01", "2023-01-01")
+    assert fake.reads == 2
+
+
+def test_fetch_taken_right_after_a_commit_is_reused(make_staging):
+    # Both in the same second: only the full timestamps tell them apart
+    raw_staging, fake = make_staging()
+    watermark.commit_watermark("logbook_sheet", "2023-01-01")
+    raw_staging.get_raw_flight_logs(None, "2023-01-01")
+    raw_staging.get_raw_flight_logs("2022-01-01", "2023-01-01")
+    assert fake.reads == 1
+
+    watermark.commit_watermark("logbook_sheet", "2023-01-01")
+    raw_staging.get_raw_flight_logs("2022-01-01", "2023-01-01")
+    assert fake.reads == 2
+
+
+def test_change_detection_bypasses_staging(monkeypatch):
+    monkeypatch.setattr(settings, "STAGING_ENABLED", True)
+    monkeypatch.setattr(settings, "DETECT_CHANGES", True)
+    assert not staging.staging_enabled()
+    monkeypatch.setattr(settings, "DETECT_CHANGES", False)
+    assert staging.staging_enabled()
@@ -0,0 +1,182 @@
+import contextlib
+
+import pandas as pd
+import pymysql
+import pytest
+
+from benchmarks.standin import StandInConnection
+from src.config.settings import settings
+from src.db.connections import db_manager
+from src.db.transactions import iter_frame_chunks, run_in_transaction, run_stage
+
+DEADLOCK = pymysql.err.OperationalError(1213, "Deadlock found")
+LOST_CONNECTION = pymysql.err.OperationalError(2013, "Lost connection")
+LOCK_WAIT_TIMEOUT = pymysql.err.OperationalError(1205, "Lock wait timeout")
+
+
+class FakeConnection:
+    """Records commits and rollbacks; fails the next commits on demand."""
+
+    def __init__(self, commit_errors=()):
+        self.commit_errors = list(commit_errors)
+        self.commits = 0
+        self.statements = []
+
+    def cursor(self):
+        return contextlib.nullcontext(self)
+
+    def execute(self, query, params=None):
+        self.statements.append(query)
+
+    def commit(self):
+        if self.commit_errors:
+            raise self.commit_errors.pop(0)
+        self.commits += 1
+
+
+@pytest.fixture
+def mysql_connection(monkeypatch):
+    """
+    Returns `route(conn)`, which serves `conn` as db_manager.mysql_connection,
+    rolled back on errors, and retries without backing off.
+    """
+    monkeypatch.setattr(settings, "LOAD_RETRY_BACKOFF_SECONDS", 0)
+
+    def route(conn):
+        @contextlib.contextmanager
+        def connection():
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+
+        conn.rollback = getattr(conn, "rollback", lambda: None)
+        monkeypatch.setattr(db_manager, "mysql_connection", connection)
+        return connection
+
+    return route
+
+
+def test_transaction_is_retried_after_deadlock(mysql_connection):
+    calls = []
+
+    def work(cursor):
+        calls.append(len(calls))
+        if len(calls) == 1:
+            raise DEADLOCK
+        return "done"
+
+    conn = FakeConnection()
+    mysql_connection(conn)
+    assert run_in_transaction(work) == "done"
+    assert calls == [0, 1]
+    assert conn.commits == 1
+
+
+def test_commit_lost_midway_is_verified_before_redoing(mysql_connection):
+    for committed, expected_calls in [(True, 1), (False, 2)]:
+        calls = []
+
+        def work(cursor):
+            calls.append(len(calls))
+            return len(calls)
+
+        def verify(cursor, result):
+            assert result == 1
+            return committed
+
+        mysql_connection(FakeConnection([LOST_CONNECTION]))
+        assert run_in_transaction(work, verify) == expected_calls
+        assert len(calls) == expected_calls
+
+
+def test_other_errors_and_exhausted_retries_are_raised(mysql_connection):
+    def fail(error):
+        def work(cursor):
+            raise error
+
+        return work
+
+    mysql_connection(FakeConnection())
+    for error, expected_calls in [
+        (pymysql.err.IntegrityError(1062, "Duplicate entry"), 1),
+        (DEADLOCK, settings.LOAD_MAX_RETRIES + 1),
+    ]:
+        calls = []
+        with pytest.raises(pymysql.err.MySQLError) as raised:
+            run_in_transaction(lambda cursor: (calls.append(1), fail(error)(cursor)))
+        assert raised.value is error
+        assert len(calls) == expected_calls
+
+
+def test_stage_is_redone_from_its_savepoint_after_lock_wait_timeout(
+    mysql_connection,
+):
+    conn = FakeConnection()
+    attempts = []
+
+    def stage():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise LOCK_WAIT_TIMEOUT
+        return "ok"
+
+    mysql_connection(conn)
+    assert run_stage(conn, "entries", stage) == "ok"
+    assert conn.statements == [
+        "SAVEPOINT entries",
+        "ROLLBACK TO SAVEPOINT entries",
+        "SAVEPOINT entries",
+        "RELEASE SAVEPOINT entries",
+    ]
+
+
+def test_frame_chunks_keep_keys_together():
+    df = pd.DataFrame({"k": list("aabbbcddddde"), "v": range(12)})
+    chunks = list(iter_frame_chunks(df, chunk_rows=4, key="k"))
+    pd.testing.assert_frame_equal(pd.concat(chunks).sort_index(), df)
+    keys = [set(chunk["k"]) for chunk in chunks]
+    assert all(a.isdisjoint(b) for i, a in enumerate(keys) for b in keys[:i])
+    assert len(chunks) > 1
+
+
+class FlakyStandIn(StandInConnection):
+    """Fails the first statements starting with `prefix` with `error`."""
+
+    def __init__(self, prefix, error, failures=1):
+        super().__init__()
+        self.prefix = prefix
+        self.error = error
+        self.failures = failures
+
+    def cursor(self):
+        cursor = super().cursor()
+        execute = cursor.execute
+
+        def flaky_execute(query, params=None):
+            if self.failures and query.lstrip().startswith(self.prefix):
+                self.failures -= 1
+                raise self.error
+            return execute(query, params)
+
+        cursor.execute = flaky_execute
+        return cursor
+
+
+def test_entries_and_schedules_commit_together_across_a_lost_connection(
+    mysql_connection, entries, load_entries
+):
+    standin = FlakyStandIn("INSERT INTO itxda_schedule", LOST_CONNECTION, failures=2)
+    entry_ids = load_entries(mysql_connection(standin), entries)
+
+    assert standin.failures == 0
+    rows = standin._conn.execute(
+        "SELECT e.id, s.id, x.schedule_id FROM itxda_logbook_entry e "
+        "JOIN itxda_schedule s ON s.id = e.id "
+        "JOIN itxda_entry_x_schedule x ON x.log_entry_id = e.id"
+    ).fetchall()
+    assert len(rows) == len(entry_ids) == standin.count("itxda_logbook_entry")
+    assert standin.count("itxda_schedule") == standin.count("itxda_entry_x_schedule")
+    assert sorted(entry_ids) == sorted(row[0] for row in rows)
+    standin.close()